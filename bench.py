@@ -0,0 +1,544 @@
+"""
+Benchmark headless cho CountdownTimer (chạy trên Qt platform "offscreen").
+
+    python bench.py                      # đủ bộ, timer chạy trọn 1 trận 03:30
+    python bench.py --quick              # bản rút gọn (~vài giây)
+    python bench.py --only display timer --out bench.json
+    python bench.py --only sim           # trận ngẫu nhiên trên thời gian ảo (kiểm timer / cue)
+
+Kết quả in ra dạng JSON: ops/sec, percentile (µs / ms) và peak RSS,
+để so sánh giữa các bản build trước khi mang exe đi sự kiện.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QT_VERSION_STR, PYQT_VERSION_STR, QTimer, QEventLoop
+
+import main
+
+
+TYPES = ("stone", "gold", "diamond")
+SIZES = {"1080p": (1920, 1080), "4K": (3840, 2160), "8K": (7680, 4320)}
+
+
+# ================== helpers ==================
+def percentile(sorted_vals: list[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, int(round(p / 100.0 * (len(sorted_vals) - 1)))))
+    return float(sorted_vals[k])
+
+
+def summarize(samples_ns: list[int], unit: str = "us") -> dict:
+    div = 1_000.0 if unit == "us" else 1_000_000.0
+    vals = sorted(v / div for v in samples_ns)
+    total_s = sum(samples_ns) / 1e9
+    return {
+        "n": len(vals),
+        "ops_per_sec": round(len(vals) / total_s, 1) if total_s > 0 else None,
+        "unit": unit,
+        "mean": round(sum(vals) / len(vals), 3) if vals else 0.0,
+        "p50": round(percentile(vals, 50), 3),
+        "p90": round(percentile(vals, 90), 3),
+        "p99": round(percentile(vals, 99), 3),
+        "max": round(vals[-1], 3) if vals else 0.0,
+    }
+
+
+def peak_rss_bytes() -> int | None:
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class PMC(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            pmc = PMC()
+            pmc.cb = ctypes.sizeof(PMC)
+            proc = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(proc, ctypes.byref(pmc), pmc.cb):
+                return int(pmc.PeakWorkingSetSize)
+        except Exception:
+            return None
+        return None
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: bytes
+    return int(rss) if sys.platform == "darwin" else int(rss) * 1024
+
+
+def pump(app: QApplication, ms: int = 0):
+    if ms <= 0:
+        app.processEvents()
+        return
+    loop = QEventLoop()
+    QTimer.singleShot(int(ms), loop.quit)
+    loop.exec()
+
+
+# ================== benchmarks ==================
+def bench_controller(n: int, seed: int) -> dict:
+    rnd = random.Random(seed)
+    c = main.MatchController()
+
+    ops = [
+        (rnd.choice((1, 2)), rnd.choice(TYPES), rnd.randint(1, 3), rnd.randint(0, 3))
+        for _ in range(n)
+    ]
+    set_count = []
+    for team, t, kho, v in ops:
+        t0 = time.perf_counter_ns()
+        c.set_count(team, t, kho, v)
+        set_count.append(time.perf_counter_ns() - t0)
+
+    compute = []
+    for i in range(n):
+        t0 = time.perf_counter_ns()
+        c.compute_score(1 + (i & 1))
+        compute.append(time.perf_counter_ns() - t0)
+
+    display = []
+    for _ in range(n):
+        t0 = time.perf_counter_ns()
+        c.get_display_scores()
+        display.append(time.perf_counter_ns() - t0)
+
+    # allowed_max: tính trực tiếp (ruleset chưa dựng bảng) vs tra StateTable, cùng chuỗi trạng thái
+    direct_rules = main.Ruleset(main.RULESET_TREASURE_HUNT_2025)
+    rules = main.Ruleset(main.RULESET_TREASURE_HUNT_2025)
+    t0 = time.perf_counter_ns()
+    table = rules.table()
+    build_ms = (time.perf_counter_ns() - t0) / 1e6
+    tally = rules.new_tally()
+    direct, lookup = [], []
+    for _team, t, kho, v in ops:
+        i = rules.cell(t, kho)
+        rules.set(tally, i, min(v, rules.allowed_max(tally, i)))
+        t0 = time.perf_counter_ns()
+        direct_rules.allowed_max(tally, i)
+        direct.append(time.perf_counter_ns() - t0)
+        t0 = time.perf_counter_ns()
+        rules.allowed_max(tally, i)
+        lookup.append(time.perf_counter_ns() - t0)
+
+    return {
+        "set_count": summarize(set_count),
+        "compute_score": summarize(compute),
+        "get_display_scores": summarize(display),
+        "allowed_max_direct": summarize(direct),
+        "allowed_max_table": summarize(lookup) if table is not None else None,
+        "state_table": {"build_ms_incl_import": round(build_ms, 2),
+                        "legal_states": len(table) if table is not None else None},
+    }
+
+
+def bench_standings(n: int, seed: int, teams: int = 32) -> dict:
+    """Xếp hạng lại sau mỗi trận (incremental) so với tính lại cả bảng từ đầu."""
+    rnd = random.Random(seed)
+    names = [f"Team {i:02d}" for i in range(teams)]
+    records = []
+    for i in range(n):
+        a, b = rnd.sample(names, 2)
+        sides = [{"score": rnd.randint(0, 300), "diamonds": rnd.randint(0, 2),
+                  "penalty_minus5": rnd.randint(0, 3), "bonus_plus5": rnd.randint(0, 1)} for _ in (1, 2)]
+        abs_winner = rnd.choice((0,) * 8 + (1, 2))
+        s1, s2 = sides[0]["score"], sides[1]["score"]
+        winner = abs_winner or (1 if s1 > s2 else 2 if s2 > s1 else 0)
+        records.append({"team1": a, "team2": b, "winner": winner, "abs_winner": abs_winner, "teams": sides})
+
+    group = main.StandingsGroup("A")
+    incremental = []
+    for r in records:
+        t0 = time.perf_counter_ns()
+        group.apply(r)
+        group.rank(r["team1"])
+        incremental.append(time.perf_counter_ns() - t0)
+
+    full = []
+    for k in range(0, n, max(1, n // 200)):
+        t0 = time.perf_counter_ns()
+        g = main.StandingsGroup("A")
+        for r in records[:k + 1]:
+            g.apply(r)
+        g.table()
+        full.append(time.perf_counter_ns() - t0)
+
+    return {"teams": teams, "matches": n,
+            "incremental_apply_rank": summarize(incremental), "full_recompute": summarize(full)}
+
+
+def bench_click(app: QApplication, n: int, seed: int) -> dict:
+    rnd = random.Random(seed)
+    c = main.MatchController()
+    win = main.ControlWindow(c)
+    win.show()
+    pump(app)
+
+    panels = (win.teamPanel1, win.teamPanel2)
+    samples = []
+    for _ in range(n):
+        panel = rnd.choice(panels)
+        block = rnd.choice(panel.blocks)
+        kho = rnd.randint(1, 3)
+        v = rnd.randint(0, 3)
+        t0 = time.perf_counter_ns()
+        block.apply_kho(kho, v)
+        samples.append(time.perf_counter_ns() - t0)
+    win.close()
+    return {"apply_kho": summarize(samples)}
+
+
+def bench_display(app: QApplication, n: int, renderer: str = "widgets") -> dict:
+    c = main.MatchController()
+    out = {}
+    for label, (w, h) in SIZES.items():
+        # cache riêng cho mỗi cửa sổ: số cold không ăn cache của lần chạy trước
+        disp = main.DisplayWindow(c, renderer=renderer, shared=main.DisplayShared())
+        disp.resize(w, h)
+
+        t0 = time.perf_counter_ns()
+        disp._fit_layout()
+        cold_ns = time.perf_counter_ns() - t0
+
+        # tick: đúng đường đi của 1 giây (onTimeText -> 1 frame), geometry giữ nguyên
+        ticks = []
+        for i in range(n):
+            t0 = time.perf_counter_ns()
+            disp.onTimeText(c._fmt(210 - (i % 211)))
+            disp._render.flush()
+            ticks.append(time.perf_counter_ns() - t0)
+
+        # frame: như tick nhưng gồm cả paint (cửa sổ phải hiện để Qt vẽ)
+        disp.show()
+        pump(app)
+        frames = []
+        for i in range(n):
+            t0 = time.perf_counter_ns()
+            disp.onTimeText(c._fmt(210 - (i % 211)))
+            disp._render.flush()
+            pump(app)
+            frames.append(time.perf_counter_ns() - t0)
+        disp.hide()
+
+        # resize storm: xen kẽ 2 kích thước lân cận
+        resizes = []
+        for i in range(max(10, n // 10)):
+            disp.resize(w - (i & 1) * 8, h - (i & 1) * 8)
+            t0 = time.perf_counter_ns()
+            disp._fit_layout()
+            resizes.append(time.perf_counter_ns() - t0)
+
+        out[label] = {
+            "size": [w, h],
+            "cold_fit_ms": round(cold_ns / 1e6, 3),
+            "tick_fit": summarize(ticks),
+            "tick_frame": summarize(frames),
+            "resize_fit": summarize(resizes),
+            "render": disp.render_stats(),
+        }
+        disp.close()
+        disp.deleteLater()
+        pump(app)
+    return out
+
+
+def bench_multi_display(app: QApplication, n: int, renderer: str, count: int = 3) -> dict:
+    """Chi phí 1 tick (emit -> frame đã vẽ) với 1 display so với `count` display cùng cỡ."""
+    c = main.MatchController()
+    out = {}
+    for k in (1, count):
+        shared = main.DisplayShared()
+        wins = [main.DisplayWindow(c, renderer=renderer, shared=shared) for _ in range(k)]
+        for disp in wins:
+            disp.resize(1920, 1080)
+            disp.show()
+        pump(app)
+        for disp in wins:
+            disp._fit_layout()
+        pump(app)
+
+        frames = []
+        for i in range(n):
+            t0 = time.perf_counter_ns()
+            c.timeTextChanged.emit(c._fmt(210 - (i % 211)))
+            for disp in wins:
+                disp._render.flush()
+            pump(app)
+            frames.append(time.perf_counter_ns() - t0)
+
+        out[f"{k}_displays"] = {"tick_frame": summarize(frames), "shared": shared.stats()}
+        for disp in wins:
+            disp.close()
+            disp.deleteLater()
+        pump(app)
+    return out
+
+
+def current_rss_bytes() -> int | None:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def bench_arenas(app: QApplication, counts: tuple[int, ...], seconds: int, renderer: str) -> dict:
+    """
+    N sân chạy cùng lúc trong 1 process (ArenaWindow), mỗi sân 1 display 960x540.
+    Đo độ trễ đổi giây của mọi sân, số lần scheduler thức dậy và RAM tăng thêm.
+    """
+    out = {}
+    for n in counts:
+        rss0 = current_rss_bytes()
+        sched = main.TickScheduler.default()
+        controllers = [main.MatchController() for _ in range(n)]
+        arenas = main.ArenaWindow(controllers, renderer=renderer)
+        arenas.show()
+        # dựng hết các tab trước khi đo (bình thường tab chỉ dựng khi mở lần đầu)
+        while not all(arenas.control(i).is_built() for i in range(n)):
+            pump(app)
+        displays = []
+        for c in controllers:
+            disp = main.DisplayWindow(c, renderer=renderer, app_shortcuts=False)
+            disp.resize(960, 540)
+            disp.show()
+            displays.append(disp)
+        pump(app, 50)
+        rss1 = current_rss_bytes()
+
+        late_ns: list[int] = []
+
+        def watch(c):
+            last = [c.seconds]
+
+            def on_time(_text: str):
+                if not c.running or c.end_epoch_ms is None or c.seconds == last[0]:
+                    return
+                last[0] = c.seconds
+                intended = c.end_epoch_ms - (c.seconds + 1) * 1000
+                late_ns.append(max(0, int((c.elapsed.elapsed() - intended) * 1_000_000)))
+            c.timeTextChanged.connect(on_time)
+
+        for c in controllers:
+            c.set_time_seconds(seconds + 1)
+            watch(c)
+        # lệch pha nhau: các sân không bắt đầu cùng 1 ms
+        for i, c in enumerate(controllers):
+            QTimer.singleShot(i * 37 % 1000, c.start)
+        wake1 = sched.wakeups
+        cpu0 = time.process_time()
+        pump(app, seconds * 1000 + 1100)
+        cpu_s = time.process_time() - cpu0
+
+        out[f"{n}_arenas"] = {
+            "second_changes": len(late_ns),
+            "lateness": summarize(late_ns, unit="ms"),
+            "scheduler_wakeups": sched.wakeups - wake1,
+            "cpu_ms_per_second": round(cpu_s * 1000 / (seconds + 1.1), 2),
+            "rss_added_bytes": (rss1 - rss0) if rss0 and rss1 else None,
+        }
+        for disp in displays:
+            disp.close()
+            disp.deleteLater()
+        arenas.close()
+        arenas.deleteLater()
+        for c in controllers:
+            c.set_time_seconds(0)
+        pump(app, 50)
+    return out
+
+
+def bench_timer(app: QApplication, match_seconds: int) -> dict:
+    c = main.MatchController()
+    c.set_time_seconds(int(match_seconds))
+
+    late_ns: list[int] = []
+    last = [c.seconds]
+
+    def on_time(_text: str):
+        if not c.running or c.end_epoch_ms is None or c.seconds == last[0]:
+            return
+        last[0] = c.seconds
+        # giây s hiển thị đúng lúc remaining vừa < (s + 1) * 1000
+        intended = c.end_epoch_ms - (c.seconds + 1) * 1000
+        late_ns.append(max(0, int((c.elapsed.elapsed() - intended) * 1_000_000)))
+
+    c.timeTextChanged.connect(on_time)
+    c.start()
+    pump(app, int(match_seconds) * 1000 + 300)
+    return {
+        "match_seconds": int(match_seconds),
+        "second_changes": len(late_ns),
+        "lateness": summarize(late_ns, unit="ms"),
+    }
+
+
+def _expected_times(script, seconds: int) -> tuple[int | None, int | None]:
+    """
+    Mô hình tham chiếu start / force_pause / resume -> (lúc hết giờ, lúc cue 3s);
+    None = chưa tới (đang pause). Cùng ms thì thao tác trong script chạy trước tick / cue.
+    """
+    remain = seconds * 1000
+    t_run = None
+    paused = False
+    cue3 = None
+    for t, action, _args in script:
+        if action == "start" and t_run is None:
+            t_run = t
+        elif action == "force_pause" and t_run is not None and not paused:
+            if t - t_run > remain:
+                break
+            if cue3 is None and remain > 4000 and t > t_run + remain - 4000:
+                cue3 = t_run + remain - 4000
+            remain -= t - t_run
+            paused = True
+        elif action == "resume" and paused:
+            t_run, paused = t, False
+    if t_run is None or paused:
+        return None, cue3
+    if cue3 is None and remain > 4000:
+        cue3 = t_run + remain - 4000
+    return t_run + remain, cue3
+
+
+def bench_sim(matches: int, seed: int, seconds: int) -> dict:
+    """
+    Trận ngẫu nhiên trên thời gian ảo (MatchSimulator), đối chiếu hết giờ / cue với mô hình
+    tham chiếu. Chạy 2 lượt cùng kịch bản: tua nhanh (fast, chỉ mốc script / cue / hết giờ)
+    và đủ tick mỗi giây (kiểm thêm đồng hồ hiển thị); 2 lượt phải ra cùng kết quả.
+    """
+    rnd = random.Random(seed)
+    scripts = [main.MatchSimulator.random_script(rnd, seconds) for _ in range(matches)]
+    errors: list[dict] = []
+    out: dict = {"matches": matches, "match_seconds": seconds}
+    first: list[dict] = []
+    for fast in (True, False):
+        virtual_ms = 0
+        t0 = time.perf_counter()
+        for m, script in enumerate(scripts):
+            sim = main.MatchSimulator(seconds, fast=fast)
+            res = sim.run(script)
+            virtual_ms += res["now_ms"]
+
+            want, want3 = _expected_times(script, seconds)
+            problems = []
+            if res["end_ms"] != want:
+                problems.append(f"end {res['end_ms']} != {want}")
+            cues = {cue: (intended, fired) for cue, intended, fired in res["cues"]}
+            if len(cues) != len(res["cues"]):
+                problems.append("cue fired twice")
+            if want is not None and cues.get("cue_end") != (want, want):
+                problems.append(f"cue_end {cues.get('cue_end')} != {want}")
+            if want3 is not None and cues.get("cue_3s") != (want3, want3):
+                problems.append(f"cue_3s {cues.get('cue_3s')} != {want3}")
+            res.pop("shown")
+            if fast:
+                first.append(res)
+            else:
+                texts = [text for _t, text in sim.shown]
+                if texts != sorted(texts, reverse=True) or (want is not None and texts[-1] != "00:00"):
+                    problems.append("clock text not monotonic")
+                if res != first[m]:
+                    problems.append("fast-forward result differs from per-second ticks")
+            if problems and len(errors) < 10:
+                errors.append({"match": m, "fast": fast, "problems": problems, "script": script})
+        wall = time.perf_counter() - t0
+        key = "fast" if fast else "per_second_ticks"
+        out[key] = {
+            "matches_per_sec": round(matches / wall, 1),
+            "speedup_vs_real_time": round(virtual_ms / 1000.0 / wall, 0),
+        }
+    out["errors"] = errors
+    return out
+
+
+def main_cli(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description="Headless benchmark for CountdownTimer")
+    ap.add_argument("--quick", action="store_true", help="ít vòng lặp + trận 5 giây")
+    ap.add_argument("--only", nargs="*", choices=("controller", "standings", "click", "display", "multi", "arenas", "timer", "sim"))
+    ap.add_argument("--renderer", nargs="*", choices=main.DisplayWindow.RENDERERS,
+                    help="renderer cho benchmark display (mặc định: cả hai)")
+    ap.add_argument("--n", type=int, default=None, help="số vòng lặp cho mỗi benchmark")
+    ap.add_argument("--match-seconds", type=int, default=None)
+    ap.add_argument("--seed", type=int, default=2025)
+    ap.add_argument("--out", default=None, help="ghi JSON ra file (mặc định: stdout)")
+    args = ap.parse_args(argv)
+
+    n = args.n or (2_000 if args.quick else 20_000)
+    match_seconds = args.match_seconds or (5 if args.quick else 3 * 60 + 30)
+    only = set(args.only or ("controller", "standings", "click", "display", "multi", "arenas", "timer", "sim"))
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    results: dict = {}
+    t_all = time.perf_counter()
+    if "controller" in only:
+        results["controller"] = bench_controller(n, args.seed)
+    if "standings" in only:
+        results["standings"] = bench_standings(max(100, n // 20), args.seed)
+    if "click" in only:
+        results["click"] = bench_click(app, max(100, n // 10), args.seed)
+    if "display" in only:
+        for renderer in (args.renderer or main.DisplayWindow.RENDERERS):
+            key = "display" if renderer == "widgets" else f"display_{renderer}"
+            results[key] = bench_display(app, max(50, n // 100), renderer)
+    if "multi" in only:
+        for renderer in (args.renderer or main.DisplayWindow.RENDERERS):
+            results[f"multi_display_{renderer}"] = bench_multi_display(app, max(50, n // 100), renderer)
+    if "arenas" in only:
+        renderer = (args.renderer or ("painted",))[0]
+        results["arenas"] = bench_arenas(app, (1, 4, 16), 3 if args.quick else 10, renderer)
+    if "timer" in only:
+        results["timer"] = bench_timer(app, match_seconds)
+    if "sim" in only:
+        results["sim"] = bench_sim(max(100, n // 10), args.seed, 3 * 60 + 30)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "qt": QT_VERSION_STR,
+            "pyqt": PYQT_VERSION_STR,
+            "platform": platform.platform(),
+            "qpa": app.platformName(),
+            "argv": argv,
+            "started": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "wall_s": round(time.perf_counter() - t_all, 3),
+        },
+        "peak_rss_bytes": peak_rss_bytes(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli(sys.argv[1:]))
@@ -1,18 +1,37 @@
+import os
 import sys
 import copy
+import json
+import math
+import time
+import heapq
+import queue
+import struct
+import bisect
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from pathlib import Path
 
+# mốc thời gian import Qt (dùng cho --profile-startup)
+_T_IMPORT_START = time.perf_counter()
+
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QDialog, QLabel, QVBoxLayout, QHBoxLayout,
     QLineEdit, QPushButton, QSizePolicy, QGridLayout, QGroupBox,
-    QFrame, QScrollArea, QSpinBox, QAbstractSpinBox, QComboBox,
-    QColorDialog,
+    QFrame, QScrollArea, QSpinBox, QAbstractSpinBox, QComboBox, QStackedLayout,
+    QStyle, QStyleOptionGroupBox, QTabWidget, QMessageBox,
 )
 from PyQt6.QtGui import (
-    QFont, QFontMetrics, QKeySequence, QShortcut, QIcon, QPalette, QColor, QGuiApplication
+    QFont, QFontMetrics, QKeySequence, QShortcut, QIcon, QPalette, QColor, QGuiApplication,
+    QPixmap, QPainter, QPainterPath, QBrush, QPen, QRegion,
+)
+from PyQt6.QtCore import (
+    Qt, QTimer, QUrl, QElapsedTimer, QObject, QEvent, QThread, QRect, QRectF, QSize, pyqtSignal,
 )
-from PyQt6.QtCore import Qt, QTimer, QUrl, QElapsedTimer, QObject, pyqtSignal
-from PyQt6.QtMultimedia import QSoundEffect
+
+# QtMultimedia / QColorDialog chỉ import khi dùng lần đầu (khởi động nhanh hơn)
+_T_IMPORT_END = time.perf_counter()
 
 
 # ================== Asset helpers ==================
@@ -27,25 +46,137 @@ def _meipass_dir() -> Path | None:
     return Path(mp) if mp else None
 
 
-def find_asset_first(name: str) -> str | None:
-    candidates: list[Path] = []
-    exe_dir = _exe_dir()
-    candidates += [exe_dir / "assets" / name, exe_dir / name]
+class AssetIndex:
+    """
+    Chỉ mục assets: mỗi thư mục gốc được quét đúng 1 lần (os.scandir),
+    tra cứu sau đó là 1 lần tra dict thay vì stat từng đường dẫn ứng viên.
 
-    cwd = Path.cwd()
-    candidates += [cwd / "assets" / name, cwd / name]
+    Thứ tự ưu tiên (gốc đứng trước thắng): exe/assets, exe, cwd/assets, cwd,
+    _MEIPASS/assets, _MEIPASS. Bản PyInstaller không đổi sau khi build nên
+    nếu có MANIFEST trong thư mục bundle thì đọc file đó thay vì quét.
+    """
 
-    mp = _meipass_dir()
-    if mp:
-        candidates += [mp / "assets" / name, mp / name]
+    MANIFEST = "manifest.json"
+    FORMAT = 1
 
-    for p in candidates:
+    def __init__(self, roots: list[Path] | None = None):
+        self._explicit_roots = roots
+        self.roots: list[Path] = []
+        self.scans = 0
+        # normcase(name) -> đường dẫn đầy đủ
+        self._files: dict[str, str] = {}
+        # gốc -> {normcase(name): đường dẫn}, giữ riêng để refresh từng gốc
+        self._by_root: dict[Path, dict[str, str]] = {}
+        self.refresh()
+
+    @staticmethod
+    def default_roots() -> list[Path]:
+        roots: list[Path] = []
+        exe_dir = _exe_dir()
+        roots += [exe_dir / "assets", exe_dir]
+        cwd = Path.cwd()
+        roots += [cwd / "assets", cwd]
+        mp = _meipass_dir()
+        if mp:
+            roots += [mp / "assets", mp]
+        return roots
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return os.path.normcase(name)
+
+    def _bundled(self, root: Path) -> bool:
+        mp = _meipass_dir()
+        return mp is not None and (root == mp or mp in root.parents)
+
+    def _scan(self, root: Path) -> dict[str, str]:
+        files: dict[str, str] = {}
+        if self._bundled(root):
+            try:
+                man = json.loads((root / self.MANIFEST).read_text(encoding="utf-8"))
+                if man.get("format") == self.FORMAT:
+                    for name in man.get("files", []):
+                        files[self._key(name)] = str(root / name)
+                    return files
+            except (OSError, ValueError, AttributeError):
+                pass
+        self.scans += 1
         try:
-            if p.exists():
-                return str(p.resolve())
-        except Exception:
+            with os.scandir(root) as it:
+                for entry in it:
+                    try:
+                        if entry.is_file():
+                            files[self._key(entry.name)] = entry.path
+                    except OSError:
+                        pass
+        except OSError:
             pass
-    return None
+        return files
+
+    def _rebuild(self):
+        merged: dict[str, str] = {}
+        # gốc ưu tiên thấp ghi trước, gốc ưu tiên cao ghi đè
+        for root in reversed(self.roots):
+            merged.update(self._by_root.get(root, {}))
+        self._files = merged
+
+    def refresh(self, root: str | Path | None = None):
+        """Quét lại (1 gốc hoặc tất cả) — dùng khi thay asset lúc đang chạy."""
+        if root is None:
+            roots: list[Path] = []
+            for r in (self._explicit_roots or self.default_roots()):
+                try:
+                    r = Path(r).resolve()
+                except OSError:
+                    continue
+                if r not in roots:
+                    roots.append(r)
+            self.roots = roots
+            self._by_root = {r: self._scan(r) for r in roots}
+        else:
+            r = Path(root).resolve()
+            if r in self._by_root:
+                self._by_root[r] = self._scan(r)
+        self._rebuild()
+
+    def find(self, name: str) -> str | None:
+        hit = self._files.get(self._key(name))
+        if hit is not None or ("/" not in name and os.sep not in name):
+            return hit
+        # tên có thư mục con: không nằm trong chỉ mục, dò theo thứ tự ưu tiên
+        for root in self.roots:
+            p = root / name
+            if p.is_file():
+                return str(p)
+        return None
+
+    def names(self) -> list[str]:
+        return sorted(Path(p).name for p in self._files.values())
+
+    @classmethod
+    def write_manifest(cls, folder: str | Path) -> Path:
+        """Ghi MANIFEST cho thư mục assets trước khi đóng gói PyInstaller."""
+        folder = Path(folder)
+        names = sorted(
+            e.name for e in os.scandir(folder) if e.is_file() and e.name != cls.MANIFEST
+        )
+        path = folder / cls.MANIFEST
+        path.write_text(json.dumps({"format": cls.FORMAT, "files": names}, indent=2), encoding="utf-8")
+        return path
+
+
+_ASSETS: AssetIndex | None = None
+
+
+def asset_index() -> AssetIndex:
+    global _ASSETS
+    if _ASSETS is None:
+        _ASSETS = AssetIndex()
+    return _ASSETS
+
+
+def find_asset_first(name: str) -> str | None:
+    return asset_index().find(name)
 
 
 # ================== Time dialog ==================
@@ -106,11 +237,18 @@ class TimeDialog(QDialog):
 
 # ================== Screen select dialog ==================
 class ScreenSelectDialog(QDialog):
-    def __init__(self, parent=None, current_index: int | None = None):
+    LAYOUT_LABELS = {
+        "full": "Đầy đủ (điểm + đồng hồ)",
+        "timer": "Chỉ đồng hồ",
+        "scores": "Chỉ bảng điểm",
+    }
+
+    def __init__(self, parent=None, current_index: int | None = None, with_layout: bool = False):
         super().__init__(parent)
         self.setWindowTitle("Chọn màn hình hiển thị")
-        self.setFixedSize(520, 190)
+        self.setFixedSize(520, 240 if with_layout else 190)
         self.selected_index: int | None = None
+        self.selected_layout = "full"
 
         root = QVBoxLayout(self)
         root.setContentsMargins(14, 12, 14, 12)
@@ -135,6 +273,14 @@ class ScreenSelectDialog(QDialog):
 
         root.addWidget(self.cb)
 
+        self.cbLayout: QComboBox | None = None
+        if with_layout:
+            self.cbLayout = QComboBox()
+            self.cbLayout.setFont(QFont("Segoe UI", 11, QFont.Weight.Bold))
+            for key, text in self.LAYOUT_LABELS.items():
+                self.cbLayout.addItem(text, key)
+            root.addWidget(self.cbLayout)
+
         hint = QLabel("Tip: Nếu có 2 màn hình, bạn có thể chọn màn hình phụ để chiếu.")
         hint.setStyleSheet("color:#444;")
         root.addWidget(hint)
@@ -158,6 +304,8 @@ class ScreenSelectDialog(QDialog):
 
     def _accept(self):
         self.selected_index = int(self.cb.currentData())
+        if self.cbLayout is not None:
+            self.selected_layout = str(self.cbLayout.currentData())
         self.accept()
 
 
@@ -251,6 +399,8 @@ class CounterControl(QWidget):
         max_v = int(max_v)
         if max_v < min_v:
             max_v = min_v
+        if (min_v, max_v) == (self._min, self._max):
+            return
 
         self._min = min_v
         self._max = max_v
@@ -271,6 +421,1269 @@ class CounterControl(QWidget):
         self.setValue(self.value() + self._step, emit_signal=True)
 
 
+# ================== Timing probe (opt-in) ==================
+class TimingProbe:
+    """
+    Ghi thời điểm dự kiến vs thực tế (ms, theo QElapsedTimer của controller)
+    của mỗi lần đổi giây và mỗi cue âm thanh, gom vào histogram độ trễ.
+    """
+
+    # cận trên (ms) của từng bucket; bucket cuối là "> 250"
+    BUCKETS_MS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+    MAX_EVENTS = 5000
+
+    def __init__(self):
+        self.started = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.events: list[tuple[str, float, float]] = []  # kind, intended_ms, actual_ms
+        self.hist: dict[str, list[int]] = {}
+        # mỗi loại chỉ giữ MAX_EVENTS giá trị gần nhất -> summary() không chậm dần khi đo lâu
+        self.lateness: dict[str, deque[float]] = {}
+
+    def record(self, kind: str, intended_ms: float, actual_ms: float):
+        late = float(actual_ms) - float(intended_ms)
+        hist = self.hist.setdefault(kind, [0] * (len(self.BUCKETS_MS) + 1))
+        i = 0
+        while i < len(self.BUCKETS_MS) and late > self.BUCKETS_MS[i]:
+            i += 1
+        hist[i] += 1
+        vals = self.lateness.get(kind)
+        if vals is None:
+            vals = self.lateness[kind] = deque(maxlen=self.MAX_EVENTS)
+        vals.append(late)
+        self.events.append((kind, float(intended_ms), float(actual_ms)))
+        if len(self.events) > self.MAX_EVENTS:
+            del self.events[: len(self.events) - self.MAX_EVENTS]
+
+    def bucket_labels(self) -> list[str]:
+        labels = ["<= 0"]
+        for lo, hi in zip(self.BUCKETS_MS, self.BUCKETS_MS[1:]):
+            labels.append(f"{lo}-{hi}")
+        labels.append(f"> {self.BUCKETS_MS[-1]}")
+        return labels
+
+    def summary(self) -> dict:
+        out = {}
+        for kind, vals in self.lateness.items():
+            v = sorted(vals)
+            n = len(v)
+            out[kind] = {
+                # n / histogram: toàn phiên; mean / p50 / p95 / max: MAX_EVENTS lần gần nhất
+                "n": sum(self.hist[kind]),
+                "mean_ms": round(sum(v) / n, 3),
+                "p50_ms": round(v[n // 2], 3),
+                "p95_ms": round(v[min(n - 1, int(n * 0.95))], 3),
+                "max_ms": round(v[-1], 3),
+                "last_ms": round(vals[-1], 3),
+                "histogram": dict(zip(self.bucket_labels(), self.hist[kind])),
+            }
+        return out
+
+    def to_dict(self) -> dict:
+        return {
+            "started": self.started,
+            "dumped": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "summary": self.summary(),
+            "events": [
+                {"kind": k, "intended_ms": round(i, 3), "actual_ms": round(a, 3), "late_ms": round(a - i, 3)}
+                for k, i, a in self.events
+            ],
+        }
+
+    def dump(self, path: str | Path) -> str:
+        path = Path(path)
+        path.write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+        return str(path)
+
+    def overlay_text(self) -> str:
+        lines = ["TIMING (late ms)   n    p50    p95    max   last"]
+        for kind, st in self.summary().items():
+            lines.append(
+                f"{kind:<16}{st['n']:>5}{st['p50_ms']:>7.1f}{st['p95_ms']:>7.1f}"
+                f"{st['max_ms']:>7.1f}{st['last_ms']:>7.1f}"
+            )
+        if len(lines) == 1:
+            lines.append("(chưa có sự kiện — hãy Start timer)")
+        return "\n".join(lines)
+
+
+# ================== Match journal (append-only) ==================
+class MatchJournal:
+    """
+    Journal nhị phân append-only các thao tác của MatchController.
+
+    File = header (MAGIC, wall-clock lúc mở tính bằng ms) + các record
+    <t_ms:u32><op:u8><len:u16><payload>, t_ms là ms monotonic kể từ lúc mở.
+    GUI thread chỉ pack bytes vào queue; thread nền gom, ghi và flush.
+    """
+
+    MAGIC = b"TKJ1"
+    HEADER = struct.Struct("<4sQ")
+    REC = struct.Struct("<IBH")
+
+    # thứ tự loại mặc định, cho journal cũ không có OP_TYPES
+    TYPES = ("stone", "gold", "diamond")
+
+    OP_COUNT = 1      # team, type_idx, kho, value
+    OP_PENALTY = 2    # team, value
+    OP_BONUS = 3      # team, value
+    OP_ABS = 4        # winner (0 = None)
+    OP_NAMES = 5      # utf-8 "team1\0team2"
+    OP_COLOR = 6      # team, r, g, b
+    OP_TIME_SET = 7   # remaining_ms
+    OP_START = 8      # remaining_ms
+    OP_PAUSE = 9      # remaining_ms
+    OP_RESUME = 10    # remaining_ms
+    OP_FREEZE = 11    # remaining_ms (chốt tuyệt đối)
+    OP_END = 12       # hết giờ
+    OP_TIMER = 13     # remaining_ms, running, paused (khôi phục)
+    OP_TYPES = 14     # utf-8 "n_khos\0type0\0type1..." (ruleset: type_idx -> tên loại)
+
+    # OP_COUNT lưu type_idx / kho / giá trị ô trong 1 byte -> ruleset phải nằm trong giới hạn này
+    MAX_BYTE = 255
+
+    PAYLOAD = {
+        OP_COUNT: struct.Struct("<BBBB"),
+        OP_PENALTY: struct.Struct("<BI"),
+        OP_BONUS: struct.Struct("<BI"),
+        OP_ABS: struct.Struct("<B"),
+        OP_COLOR: struct.Struct("<BBBB"),
+        OP_TIME_SET: struct.Struct("<I"),
+        OP_START: struct.Struct("<I"),
+        OP_PAUSE: struct.Struct("<I"),
+        OP_RESUME: struct.Struct("<I"),
+        OP_FREEZE: struct.Struct("<I"),
+        OP_END: struct.Struct("<"),
+        OP_TIMER: struct.Struct("<IBB"),
+    }
+
+    FLUSH_INTERVAL_S = 0.25
+    _STOP = object()
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._t0_ns = time.monotonic_ns()
+        self.wall_start_ms = int(time.time() * 1000)
+
+        self._fh = open(self.path, "wb")
+        self._fh.write(self.HEADER.pack(self.MAGIC, self.wall_start_ms))
+        self._fh.flush()
+
+        self._q: queue.SimpleQueue = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._writer, name="MatchJournal", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def default_path(cls, arena: int | None = None) -> Path:
+        suffix = "" if arena is None else f"_a{int(arena)}"
+        return _exe_dir() / "journal" / time.strftime(f"match_%Y%m%d_%H%M%S{suffix}.tkj")
+
+    def now_ms(self) -> int:
+        return (time.monotonic_ns() - self._t0_ns) // 1_000_000
+
+    @classmethod
+    def encode(cls, t_ms: int, op: int, args: tuple) -> bytes:
+        if op == cls.OP_NAMES:
+            payload = "\0".join(args).encode("utf-8")
+        elif op == cls.OP_TYPES:
+            payload = "\0".join(str(a) for a in args).encode("utf-8")
+        else:
+            if op == cls.OP_COUNT and isinstance(args[1], str):
+                team, ttype, kho, value = args
+                args = (team, cls.TYPES.index(ttype), kho, value)
+            payload = cls.PAYLOAD[op].pack(*args)
+        return cls.REC.pack(int(t_ms) & 0xFFFFFFFF, op, len(payload)) + payload
+
+    @classmethod
+    def decode(cls, op: int, payload: bytes) -> tuple:
+        if op == cls.OP_NAMES:
+            parts = payload.decode("utf-8", errors="replace").split("\0")
+            return (parts[0], parts[1] if len(parts) > 1 else "")
+        if op == cls.OP_TYPES:
+            parts = payload.decode("utf-8", errors="replace").split("\0")
+            return (int(parts[0]), *parts[1:])
+        # OP_COUNT giữ type_idx; JournalReader map sang tên theo OP_TYPES gần nhất
+        return cls.PAYLOAD[op].unpack(payload)
+
+    def append(self, op: int, *args, t_ms: int | None = None):
+        if self._closed:
+            return
+        self._q.put(self.encode(self.now_ms() if t_ms is None else t_ms, op, args))
+
+    def append_many(self, ops: list[tuple[int, int, tuple]]):
+        if self._closed or not ops:
+            return
+        self._q.put(b"".join(self.encode(t, op, args) for t, op, args in ops))
+
+    def _writer(self):
+        while True:
+            try:
+                item = self._q.get(timeout=self.FLUSH_INTERVAL_S)
+            except queue.Empty:
+                continue
+            chunks = []
+            stop = False
+            while True:
+                if item is self._STOP:
+                    stop = True
+                else:
+                    chunks.append(item)
+                try:
+                    item = self._q.get_nowait()
+                except queue.Empty:
+                    break
+            if chunks:
+                self._fh.write(b"".join(chunks))
+                self._fh.flush()
+                try:
+                    os.fsync(self._fh.fileno())
+                except OSError:
+                    pass
+            if stop:
+                self._fh.close()
+                return
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._q.put(self._STOP)
+        self._thread.join(timeout=2.0)
+
+
+class JournalReader:
+    """
+    Đọc journal + replay nhanh: giải mã 1 lần, giữ checkpoint trạng thái mỗi
+    CHECKPOINT_EVERY record để seek tới thời điểm bất kỳ chỉ cần replay 1 đoạn ngắn.
+    """
+
+    CHECKPOINT_EVERY = 256
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        data = self.path.read_bytes()
+        hdr = MatchJournal.HEADER
+        if len(data) < hdr.size:
+            raise ValueError(f"{self.path}: not a match journal")
+        magic, self.wall_start_ms = hdr.unpack_from(data, 0)
+        if magic != MatchJournal.MAGIC:
+            raise ValueError(f"{self.path}: not a match journal")
+
+        self.records: list[tuple[int, int, tuple]] = []
+        self.truncated = False
+        rec = MatchJournal.REC
+        pos = hdr.size
+        while pos < len(data):
+            if pos + rec.size > len(data):
+                self.truncated = True
+                break
+            t_ms, op, n = rec.unpack_from(data, pos)
+            pos += rec.size
+            if pos + n > len(data):
+                # record cuối ghi dở (crash) -> bỏ
+                self.truncated = True
+                break
+            self.records.append((t_ms, op, MatchJournal.decode(op, data[pos:pos + n])))
+            pos += n
+        self.times = [r[0] for r in self.records]
+
+        self._checkpoints: list[tuple[int, dict]] = []
+        st = self.initial_state()
+        for i, r in enumerate(self.records):
+            if i % self.CHECKPOINT_EVERY == 0:
+                self._checkpoints.append((i, copy.deepcopy(st)))
+            self.apply_record(st, *r)
+
+    @property
+    def duration_ms(self) -> int:
+        return self.times[-1] if self.times else 0
+
+    @staticmethod
+    def _empty_counts(types, n_khos: int) -> dict:
+        return {team: {t: {k: 0 for k in range(1, n_khos + 1)} for t in types} for team in (1, 2)}
+
+    @staticmethod
+    def initial_state() -> dict:
+        return {
+            "team1": None,
+            "team2": None,
+            "team_colors": {},
+            "types": MatchJournal.TYPES,
+            "counts": JournalReader._empty_counts(MatchJournal.TYPES, 3),
+            "penalty_minus5": {1: 0, 2: 0},
+            "bonus_plus5": {1: 0, 2: 0},
+            "abs_winner": None,
+            # since_ms: thời điểm journal mà remaining_ms đang đúng
+            "timer": {"remaining_ms": 0, "running": False, "paused": False, "since_ms": 0},
+        }
+
+    @staticmethod
+    def apply_record(st: dict, t_ms: int, op: int, args: tuple):
+        J = MatchJournal
+        tm = st["timer"]
+        if op == J.OP_COUNT:
+            team, ti, kho, value = args
+            st["counts"][team][st["types"][ti]][kho] = value
+        elif op == J.OP_TYPES:
+            st["types"] = tuple(args[1:])
+            st["counts"] = JournalReader._empty_counts(st["types"], args[0])
+        elif op == J.OP_PENALTY:
+            st["penalty_minus5"][args[0]] = args[1]
+        elif op == J.OP_BONUS:
+            st["bonus_plus5"][args[0]] = args[1]
+        elif op == J.OP_ABS:
+            st["abs_winner"] = args[0] or None
+        elif op == J.OP_NAMES:
+            st["team1"], st["team2"] = args
+        elif op == J.OP_COLOR:
+            team, r, g, b = args
+            st["team_colors"][team] = f"#{r:02x}{g:02x}{b:02x}"
+        elif op == J.OP_TIME_SET:
+            st["abs_winner"] = None
+            tm.update(remaining_ms=args[0], running=False, paused=False, since_ms=t_ms)
+        elif op in (J.OP_START, J.OP_RESUME):
+            tm.update(remaining_ms=args[0], running=True, paused=False, since_ms=t_ms)
+        elif op == J.OP_PAUSE:
+            tm.update(remaining_ms=args[0], running=True, paused=True, since_ms=t_ms)
+        elif op == J.OP_FREEZE:
+            tm.update(remaining_ms=args[0], running=False, paused=False, since_ms=t_ms)
+        elif op == J.OP_END:
+            tm.update(remaining_ms=0, running=False, paused=False, since_ms=t_ms)
+        elif op == J.OP_TIMER:
+            tm.update(remaining_ms=args[0], running=bool(args[1]), paused=bool(args[2]), since_ms=t_ms)
+
+    def state_at(self, t_ms: int | None = None) -> dict:
+        """Trạng thái tại thời điểm t_ms (None = cuối journal), dạng export_state() + "timer"."""
+        if t_ms is None:
+            t_ms = self.duration_ms
+        end = bisect.bisect_right(self.times, int(t_ms))
+        ci = max(0, min(len(self._checkpoints) - 1, end // self.CHECKPOINT_EVERY))
+        if self._checkpoints:
+            start, base = self._checkpoints[ci]
+            st = copy.deepcopy(base)
+        else:
+            start, st = 0, self.initial_state()
+        for r in self.records[start:end]:
+            self.apply_record(st, *r)
+
+        tm = dict(st["timer"])
+        if tm["running"] and not tm["paused"]:
+            tm["remaining_ms"] = max(0, tm["remaining_ms"] - (int(t_ms) - tm["since_ms"]))
+        tm["at_ms"] = int(t_ms)
+
+        out = {
+            "team_colors": {str(k): v for k, v in st["team_colors"].items()},
+            "counts": {
+                str(team): {t: {str(k): v for k, v in row.items()} for t, row in per.items()}
+                for team, per in st["counts"].items()
+            },
+            "penalty_minus5": {str(k): v for k, v in st["penalty_minus5"].items()},
+            "bonus_plus5": {str(k): v for k, v in st["bonus_plus5"].items()},
+            "abs_winner": st["abs_winner"],
+            "timer": tm,
+        }
+        if st["team1"] is not None:
+            out["team1"] = st["team1"]
+            out["team2"] = st["team2"]
+        return out
+
+    def replay_into(self, controller, t_ms: int | None = None, run_timer: bool = False) -> dict:
+        """
+        Dựng lại trạng thái controller tại t_ms. Mặc định timer được đặt ở
+        trạng thái pause (để xem lại); run_timer=True giữ nguyên chạy/dừng như lúc đó.
+        """
+        st = self.state_at(t_ms)
+        tm = st["timer"]
+        controller.apply_state(st)
+        running = tm["running"]
+        paused = tm["paused"] if run_timer else running
+        controller.restore_timer(tm["remaining_ms"], running, paused)
+        return st
+
+
+# ================== Crash-safe snapshots ==================
+class SnapshotStore(QObject):
+    """
+    Snapshot gọn toàn bộ trạng thái trận (JSON) để khởi động lại giữa trận.
+
+    Mỗi INTERVAL_MS kiểm tra controller.state_version; chỉ khi đổi mới chụp
+    (trên GUI thread, rất nhẹ) rồi giao cho thread nền ghi file tạm + os.replace.
+    Timer đang chạy lưu kèm wall-clock nên không cần ghi lại mỗi giây.
+    """
+
+    FORMAT = 1
+    INTERVAL_MS = 1000
+    _STOP = object()
+
+    def __init__(self, controller, path: str | Path | None = None, parent=None):
+        super().__init__(parent)
+        self.c = controller
+        self.path = Path(path) if path else self.default_path()
+        self._written_version: int | None = None
+        self.writes = 0
+
+        self._q: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._writer, name="SnapshotStore", daemon=True)
+        self._thread.start()
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.INTERVAL_MS)
+        self._timer.timeout.connect(self.save_if_changed)
+
+    @staticmethod
+    def default_path(arena: int | None = None) -> Path:
+        # nhiều sân (--arenas): mỗi sân 1 file riêng
+        name = "last_match.json" if arena is None else f"arena{int(arena)}.json"
+        return _exe_dir() / "state" / name
+
+    def start(self):
+        self._written_version = self.c.state_version
+        self._timer.start()
+
+    def capture(self) -> dict:
+        snap = self.c.export_state()
+        snap["format"] = self.FORMAT
+        snap["saved"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        snap["timer"] = {
+            "remaining_ms": self.c.remaining_now_ms(),
+            "running": bool(self.c.running),
+            "paused": bool(self.c.paused),
+            "wall_ms": int(time.time() * 1000),
+        }
+        return snap
+
+    def save_if_changed(self):
+        if self.c.state_version == self._written_version:
+            return
+        self._written_version = self.c.state_version
+        self._q.put(self.capture())
+
+    def _write(self, snap: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        data = json.dumps(snap, ensure_ascii=False, separators=(",", ":"))
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.writes += 1
+
+    def _writer(self):
+        while True:
+            snap = self._q.get()
+            # chỉ cần bản mới nhất
+            stop = snap is self._STOP
+            while True:
+                try:
+                    nxt = self._q.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is self._STOP:
+                    stop = True
+                else:
+                    snap = nxt
+            if snap is not self._STOP:
+                try:
+                    self._write(snap)
+                except OSError:
+                    pass
+            if stop:
+                return
+
+    def close(self):
+        """Ghi bản cuối (nếu có thay đổi) rồi dừng thread."""
+        self._timer.stop()
+        self.save_if_changed()
+        self._q.put(self._STOP)
+        self._thread.join(timeout=2.0)
+
+    @classmethod
+    def load(cls, path: str | Path | None = None) -> dict | None:
+        path = Path(path) if path else cls.default_path()
+        try:
+            snap = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(snap, dict) or snap.get("format") != cls.FORMAT:
+            return None
+        return snap
+
+    @staticmethod
+    def restore(controller, snap: dict):
+        """Áp snapshot; timer đang chạy được trừ đi thời gian đã trôi (wall-clock)."""
+        controller.apply_state(snap)
+        tm = snap.get("timer") or {}
+        remain = int(tm.get("remaining_ms", 0))
+        running = bool(tm.get("running"))
+        paused = bool(tm.get("paused"))
+        if running and not paused:
+            gone = int(time.time() * 1000) - int(tm.get("wall_ms", 0))
+            remain = max(0, remain - max(0, gone))
+        controller.restore_timer(remain, running and remain > 0, paused)
+
+
+# ================== Audio cue engine ==================
+def _wav_info(path: str) -> dict:
+    """Đọc header WAV 1 lần (rate / kênh / độ dài) để kiểm tra file cue."""
+    import wave
+    try:
+        with wave.open(path, "rb") as w:
+            rate = w.getframerate()
+            return {
+                "rate": rate,
+                "channels": w.getnchannels(),
+                "sampwidth": w.getsampwidth(),
+                "duration_ms": round(w.getnframes() * 1000.0 / rate, 1) if rate else 0.0,
+            }
+    except (OSError, EOFError, wave.Error) as e:
+        return {"wav_error": str(e)}
+
+
+def _silence_wav(info: dict) -> str | None:
+    """WAV im lặng cùng định dạng với cue, dùng để giữ thiết bị audio luôn mở."""
+    import wave
+    import tempfile
+    rate = int(info.get("rate") or 44100)
+    ch = int(info.get("channels") or 2)
+    sw = int(info.get("sampwidth") or 2)
+    path = Path(tempfile.gettempdir()) / f"countdown_warm_{rate}_{ch}_{sw}.wav"
+    if path.exists():
+        return str(path)
+    try:
+        with wave.open(str(path), "wb") as w:
+            w.setnchannels(ch)
+            w.setsampwidth(sw)
+            w.setframerate(rate)
+            # 8-bit PCM là unsigned: im lặng = 0x80
+            w.writeframes((b"\x80" if sw == 1 else b"\x00") * (rate // 4) * ch * sw)
+    except OSError:
+        return None
+    return str(path)
+
+
+class _CueWorker(QObject):
+    """Sống trên thread audio: giữ QSoundEffect, hẹn giờ và phát cue."""
+
+    loaded = pyqtSignal(object)                   # {cue: status dict}
+    fired = pyqtSignal(str, str, object, object)  # token, cue, intended_ns, fired_ns
+    started = pyqtSignal(str, str, object, object)  # token, cue, intended_ns, started_ns
+
+    LOAD_TIMEOUT_MS = 3000
+
+    def __init__(self, paths: dict[str, str | None]):
+        super().__init__()
+        self._paths = dict(paths)
+        self._effects: dict = {}
+        self._status: dict[str, dict] = {}
+        self._warm = None
+        self._timers: dict[tuple[str, str], QTimer] = {}
+        # cue -> (token, intended_ns) chờ playingChanged để đo độ trễ ra loa
+        self._awaiting: dict[str, tuple[str, int]] = {}
+        self._poll: QTimer | None = None
+        self._load_clock = QElapsedTimer()
+
+    def setup(self):
+        try:
+            from PyQt6.QtMultimedia import QSoundEffect
+        except ImportError as e:
+            # máy không có backend audio -> chạy không âm thanh
+            for name, path in self._paths.items():
+                self._status[name] = {"path": path, "status": "unavailable", "error": str(e)}
+            self.loaded.emit(copy.deepcopy(self._status))
+            return
+
+        fmt = None
+        for name, path in self._paths.items():
+            if not path:
+                self._status[name] = {"path": None, "status": "missing"}
+                continue
+            info = _wav_info(path)
+            if fmt is None and "rate" in info:
+                fmt = info
+            s = QSoundEffect(self)
+            s.setSource(QUrl.fromLocalFile(path))
+            s.setLoopCount(1)
+            s.setVolume(0.9)
+            s.playingChanged.connect(lambda n=name: self._on_playing(n))
+            self._effects[name] = s
+            self._status[name] = {"path": path, "status": "loading", **info}
+
+        if fmt is not None:
+            warm = _silence_wav(fmt)
+            if warm:
+                # vòng lặp im lặng vô hạn: thiết bị không bao giờ phải "mở lại" khi có cue
+                self._warm = QSoundEffect(self)
+                self._warm.setSource(QUrl.fromLocalFile(warm))
+                self._warm.setLoopCount(QSoundEffect.Loop.Infinite.value)
+                self._warm.statusChanged.connect(self._start_warm)
+
+        self._load_clock.start()
+        self._poll = QTimer(self)
+        self._poll.setInterval(20)
+        self._poll.timeout.connect(self._check_loaded)
+        self._poll.start()
+        self._check_loaded()
+
+    def _start_warm(self):
+        from PyQt6.QtMultimedia import QSoundEffect
+        if self._warm is not None and self._warm.status() == QSoundEffect.Status.Ready:
+            if not self._warm.isPlaying():
+                self._warm.play()
+
+    def _check_loaded(self):
+        from PyQt6.QtMultimedia import QSoundEffect
+        names = {
+            QSoundEffect.Status.Ready: "ready",
+            QSoundEffect.Status.Error: "error",
+        }
+        done = True
+        for name, s in self._effects.items():
+            st = names.get(s.status(), "loading")
+            self._status[name]["status"] = st
+            done = done and st != "loading"
+        timed_out = self._load_clock.elapsed() > self.LOAD_TIMEOUT_MS
+        if not (done or timed_out):
+            return
+        if self._poll is not None:
+            self._poll.stop()
+        for name, s in self._effects.items():
+            self._status[name]["load_ms"] = self._load_clock.elapsed()
+            if self._status[name]["status"] == "loading":
+                self._status[name]["status"] = "timeout"
+        self._start_warm()
+        self.loaded.emit(copy.deepcopy(self._status))
+
+    def play(self, token: str, cue: str, intended_ns):
+        s = self._effects.get(cue)
+        if s is None:
+            return
+        now = time.perf_counter_ns()
+        if s.isPlaying():
+            s.stop()
+        self._awaiting[cue] = (token, int(intended_ns))
+        s.play()
+        self.fired.emit(token, cue, int(intended_ns), now)
+        # một số backend đặt playing ngay trong play()
+        self._on_playing(cue)
+
+    def _on_playing(self, cue: str):
+        s = self._effects.get(cue)
+        if s is None or not s.isPlaying():
+            return
+        pend = self._awaiting.pop(cue, None)
+        if pend is not None:
+            self.started.emit(pend[0], cue, pend[1], time.perf_counter_ns())
+
+    def schedule(self, token: str, cue: str, deadline_ns):
+        key = (token, cue)
+        t = self._timers.get(key)
+        if t is None:
+            t = QTimer(self)
+            t.setSingleShot(True)
+            t.setTimerType(Qt.TimerType.PreciseTimer)
+            self._timers[key] = t
+        else:
+            t.stop()
+            t.timeout.disconnect()
+        deadline_ns = int(deadline_ns)
+        t.timeout.connect(lambda: self.play(token, cue, deadline_ns))
+        t.start(max(0, int((deadline_ns - time.perf_counter_ns()) // 1_000_000)))
+
+    def cancel(self, token: str):
+        for (tok, _cue), t in self._timers.items():
+            if tok == token:
+                t.stop()
+
+    def shutdown(self):
+        for t in self._timers.values():
+            t.stop()
+        if self._poll is not None:
+            self._poll.stop()
+        if self._warm is not None:
+            self._warm.stop()
+        for s in self._effects.values():
+            s.stop()
+
+
+class CueAudioEngine(QObject):
+    """
+    Cue âm thanh độ trễ thấp: nạp WAV 1 lần, giữ thiết bị audio "ấm" bằng
+    vòng lặp im lặng, và hẹn giờ + phát cue trên thread audio riêng (ưu tiên
+    TimeCritical) nên GUI bận cũng không làm tiếng bíp lệch khỏi đồng hồ.
+
+    Mốc thời gian dùng time.perf_counter_ns(); mỗi lần phát báo lại
+    fired (thread audio gọi play) và started (playingChanged = ra loa).
+    Nhiều controller có thể dùng chung 1 engine, phân biệt bằng token.
+    """
+
+    statusReady = pyqtSignal(object)
+    cueFired = pyqtSignal(str, str, object, object)    # token, cue, intended_ns, fired_ns
+    cueStarted = pyqtSignal(str, str, object, object)  # token, cue, intended_ns, started_ns
+
+    _setupRequested = pyqtSignal()
+    _playRequested = pyqtSignal(str, str, object)
+    _scheduleRequested = pyqtSignal(str, str, object)
+    _cancelRequested = pyqtSignal(str)
+    _shutdownRequested = pyqtSignal()
+
+    CUES = {"cue_3s": ("3.wav", "3s.wav"), "cue_end": ("end.wav",)}
+
+    def __init__(self, paths: dict[str, str | None] | None = None, parent=None):
+        super().__init__(parent)
+        if paths is None:
+            paths = {}
+            for cue, candidates in self.CUES.items():
+                paths[cue] = next((p for p in map(find_asset_first, candidates) if p), None)
+        self.paths = dict(paths)
+        self.status: dict[str, dict] = {
+            n: {"path": p, "status": "loading" if p else "missing"} for n, p in self.paths.items()
+        }
+        self.ready = False
+
+        self._thread = QThread()
+        self._thread.setObjectName("CueAudio")
+        self._worker = _CueWorker(self.paths)
+        self._worker.moveToThread(self._thread)
+        self._setupRequested.connect(self._worker.setup)
+        self._playRequested.connect(self._worker.play)
+        self._scheduleRequested.connect(self._worker.schedule)
+        self._cancelRequested.connect(self._worker.cancel)
+        self._shutdownRequested.connect(self._worker.shutdown)
+        self._worker.loaded.connect(self._on_loaded)
+        self._worker.fired.connect(self.cueFired)
+        self._worker.started.connect(self.cueStarted)
+        self._thread.finished.connect(self._worker.deleteLater)
+        self._thread.start(QThread.Priority.TimeCriticalPriority)
+        self._setupRequested.emit()
+
+    @staticmethod
+    def now_ns() -> int:
+        """Đồng hồ của các mốc intended / deadline (ns)."""
+        return time.perf_counter_ns()
+
+    def has(self, cue: str) -> bool:
+        return self.status.get(cue, {}).get("status") in ("loading", "ready")
+
+    def play(self, cue: str, token: str = "", intended_ns: int | None = None):
+        self._playRequested.emit(token, cue, time.perf_counter_ns() if intended_ns is None else intended_ns)
+
+    def schedule(self, token: str, cue: str, deadline_ns: int):
+        """Hẹn phát cue đúng deadline (perf_counter_ns); hẹn lại cùng (token, cue) sẽ thay thế."""
+        self._scheduleRequested.emit(token, cue, int(deadline_ns))
+
+    def cancel(self, token: str):
+        self._cancelRequested.emit(token)
+
+    def _on_loaded(self, status: dict):
+        self.status = status
+        self.ready = True
+        bad = [f"{n}: {st['status']}" for n, st in status.items() if st["status"] != "ready"]
+        if bad:
+            print("[audio] " + ", ".join(bad), file=sys.stderr)
+        self.statusReady.emit(status)
+
+    def status_text(self) -> str:
+        parts = []
+        for name, st in self.status.items():
+            s = f"{name}={st['status']}"
+            if "load_ms" in st:
+                s += f" ({st['load_ms']} ms)"
+            parts.append(s)
+        return "AUDIO " + ("  ".join(parts) if parts else "(không có cue)")
+
+    def shutdown(self):
+        if not self._thread.isRunning():
+            return
+        self._shutdownRequested.emit()
+        self._thread.quit()
+        self._thread.wait(2000)
+
+
+# ================== Ruleset (luật chấm điểm) ==================
+# luật mặc định; giải khác: viết file JSON cùng dạng rồi chạy --rules FILE
+RULESET_TREASURE_HUNT_2025 = {
+    "name": "Robot Truy Tìm Kho Báu 2025",
+    "types": [
+        {"key": "stone", "title": "ĐÁ", "emoji": "🪨", "points": [5, 7, 10], "quota": 4},
+        {"key": "gold", "title": "VÀNG", "emoji": "🟡", "points": [15, 17, 20], "quota": 3},
+        {"key": "diamond", "title": "KIM CƯƠNG", "emoji": "💎", "points": [30, 32, 35], "quota": 2},
+    ],
+    "khos": ["K1", "K2", "K3"],
+    # ✅ MỖI KHO TỔNG (mọi loại) TỐI ĐA 3; có thể là list theo từng kho
+    "kho_capacity": 3,
+    "penalty": 5,
+    "bonus": 5,
+    # tuyệt đối: kho nào cũng có, ít nhất 1 kho đầy, tổng >= 6 (mọi điều kiện cùng đúng)
+    "absolute": [
+        {"every_kho_at_least": 1},
+        {"any_kho_full": True},
+        {"total_at_least": 6},
+    ],
+    # loại dùng để xếp hạng phụ trong giải (số kim cương)
+    "rank_type": "diamond",
+}
+
+
+class RuleTally:
+    """Số đếm của 1 đội theo ruleset: mảng phẳng các ô + tổng theo loại / kho, cập nhật O(1)."""
+
+    __slots__ = ("cells", "type_tot", "kho_tot", "total", "score", "key", "over")
+
+    def __init__(self, n_types: int, n_khos: int):
+        self.cells = [0] * (n_types * n_khos)
+        self.type_tot = [0] * n_types
+        self.kho_tot = [0] * n_khos
+        self.total = 0
+        self.score = 0  # chỉ phần điểm từ các ô (chưa gồm lỗi / thưởng)
+        self.key = 0    # sum(cells[i] * stride[i]) -> tra StateTable
+        self.over = 0   # số ô > cell_cap (chỉ trong batch); khác 0 thì key có thể trùng trạng thái khác
+
+    def copy(self) -> "RuleTally":
+        t = RuleTally.__new__(RuleTally)
+        t.cells = self.cells[:]
+        t.type_tot = self.type_tot[:]
+        t.kho_tot = self.kho_tot[:]
+        t.total = self.total
+        t.score = self.score
+        t.key = self.key
+        t.over = self.over
+        return t
+
+
+class Ruleset:
+    """
+    Luật khai báo (dict / JSON) được dịch 1 lần thành mảng phẳng:
+    ô i = type_idx * n_khos + kho_idx; points[i], cell_type[i], cell_kho[i], quota[type], kho_cap[kho].
+    Controller và widget dùng chung allowed_max() / set() / absolute_met() trên RuleTally.
+    """
+
+    _ABSOLUTE_CLAUSES = ("every_kho_at_least", "any_kho_at_least", "any_kho_full",
+                         "total_at_least", "score_at_least", "type_at_least")
+
+    def __init__(self, spec: dict):
+        try:
+            types = list(spec["types"])
+            kho_labels = [str(k) for k in spec["khos"]]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"ruleset: missing {e}") from None
+        if not types or not kho_labels:
+            raise ValueError("ruleset: need at least 1 type and 1 kho")
+
+        self.spec = spec
+        self.name = str(spec.get("name", ""))
+        self.kho_labels = tuple(kho_labels)
+        self.n_khos = len(kho_labels)
+        self.khos = tuple(range(1, self.n_khos + 1))
+
+        self.types = tuple(str(t["key"]) for t in types)
+        if len(set(self.types)) != len(self.types):
+            raise ValueError("ruleset: duplicate type key")
+        self.n_types = len(self.types)
+        self.type_index = {t: i for i, t in enumerate(self.types)}
+        self.titles = tuple(str(t.get("title", t["key"])) for t in types)
+        self.emojis = tuple(str(t.get("emoji", "")) for t in types)
+
+        points: list[int] = []
+        for t in types:
+            row = [int(v) for v in t["points"]]
+            if len(row) != self.n_khos:
+                raise ValueError(f"ruleset: {t['key']}: {len(row)} points for {self.n_khos} khos")
+            points.extend(row)
+        self.points = tuple(points)
+        self.quota = tuple(int(t.get("quota", 999)) for t in types)
+
+        cap = spec.get("kho_capacity", 999)
+        caps = [int(cap)] * self.n_khos if isinstance(cap, (int, float)) else [int(v) for v in cap]
+        if len(caps) != self.n_khos:
+            raise ValueError("ruleset: kho_capacity must be a number or 1 value per kho")
+        self.kho_cap = tuple(caps)
+
+        self.n_cells = self.n_types * self.n_khos
+        self.cell_type = tuple(i // self.n_khos for i in range(self.n_cells))
+        self.cell_kho = tuple(i % self.n_khos for i in range(self.n_cells))
+        self._cell = {(t, k): ti * self.n_khos + k - 1
+                      for ti, t in enumerate(self.types) for k in self.khos}
+        # giá trị lớn nhất 1 ô có thể có -> cơ số hỗn hợp cho key của trạng thái
+        self.cell_cap = tuple(min(self.quota[self.cell_type[i]], self.kho_cap[self.cell_kho[i]])
+                              for i in range(self.n_cells))
+        lim = MatchJournal.MAX_BYTE
+        if self.n_types > lim + 1 or self.n_khos > lim:
+            raise ValueError(f"ruleset: at most {lim + 1} types and {lim} khos (journal limit)")
+        for i, cap_i in enumerate(self.cell_cap):
+            if cap_i > lim:
+                raise ValueError(f"ruleset: {self.types[self.cell_type[i]]} @ "
+                                 f"{self.kho_labels[self.cell_kho[i]]} may reach {cap_i} > {lim} "
+                                 f"(journal limit); set quota or kho_capacity")
+        stride, acc = [], 1
+        for cap_i in self.cell_cap:
+            stride.append(acc)
+            acc *= max(0, cap_i) + 1
+        self.stride = tuple(stride)
+        self.n_keys = acc
+
+        self.penalty = int(spec.get("penalty", 5))
+        self.bonus = int(spec.get("bonus", 5))
+        rank_type = spec.get("rank_type", self.types[-1])
+        if rank_type not in self.type_index:
+            raise ValueError(f"ruleset: unknown rank_type {rank_type!r}")
+        self.rank_type = str(rank_type)
+        self._absolute = tuple(self._compile_clause(c) for c in spec.get("absolute") or ())
+        # (kind, arg) đã kiểm tra, cho bản vector hoá trong StateTable
+        self.absolute_clauses = tuple(next(iter(c.items())) for c in spec.get("absolute") or ())
+
+        self._table: "StateTable | None" = None
+        self._table_tried = False
+
+    _default: "Ruleset | None" = None
+
+    @classmethod
+    def default(cls) -> "Ruleset":
+        if cls._default is None:
+            cls._default = Ruleset(RULESET_TREASURE_HUNT_2025)
+        return cls._default
+
+    @classmethod
+    def load(cls, path: str | Path) -> "Ruleset":
+        try:
+            spec = json.loads(Path(path).read_text(encoding="utf-8"))
+        except ValueError as e:
+            raise ValueError(f"{path}: {e}") from None
+        return cls(spec)
+
+    def _compile_clause(self, clause: dict):
+        if not isinstance(clause, dict) or len(clause) != 1:
+            raise ValueError(f"ruleset: absolute clause must have 1 key: {clause!r}")
+        (kind, arg), = clause.items()
+        if kind == "every_kho_at_least":
+            n = int(arg)
+            return lambda t: min(t.kho_tot) >= n
+        if kind == "any_kho_at_least":
+            n = int(arg)
+            return lambda t: max(t.kho_tot) >= n
+        if kind == "any_kho_full":
+            caps = self.kho_cap
+            want = bool(arg)
+            return lambda t: any(v >= c for v, c in zip(t.kho_tot, caps)) == want
+        if kind == "total_at_least":
+            n = int(arg)
+            return lambda t: t.total >= n
+        if kind == "score_at_least":
+            n = int(arg)
+            return lambda t: t.score >= n
+        if kind == "type_at_least":
+            need = tuple((self.type_index[k], int(v)) for k, v in dict(arg).items())
+            return lambda t: all(t.type_tot[i] >= v for i, v in need)
+        raise ValueError(f"ruleset: unknown absolute clause {kind!r} (known: {', '.join(self._ABSOLUTE_CLAUSES)})")
+
+    def table(self) -> "StateTable | None":
+        """Bảng mọi trạng thái hợp lệ (dựng ở lần gọi đầu); None nếu thiếu NumPy hoặc quá nhiều trạng thái."""
+        if not self._table_tried:
+            self._table_tried = True
+            try:
+                self._table = StateTable(self)
+            except (ImportError, ValueError):
+                self._table = None
+        return self._table
+
+    # -------- ô / tally --------
+    def cell(self, treasure_type: str, kho: int) -> int:
+        return self._cell[(treasure_type, int(kho))]
+
+    def new_tally(self) -> RuleTally:
+        return RuleTally(self.n_types, self.n_khos)
+
+    def counts_template(self) -> dict:
+        return {t: {k: 0 for k in self.khos} for t in self.types}
+
+    def allowed_max(self, tally: RuleTally, i: int) -> int:
+        """Giá trị lớn nhất ô i được nhận: quota của loại và sức chứa của kho (trừ phần các ô khác)."""
+        table = self._table
+        if table is not None and not tally.over:
+            # mọi ô <= cell_cap -> key duy nhất; không có trong bảng = vượt quota / sức chứa kho
+            row = table.allowed_by_key.get(tally.key)
+            if row is not None:
+                return row[i]
+        # chưa có bảng / trạng thái tạm vượt luật trong batch -> tính trực tiếp
+        cur = tally.cells[i]
+        t = self.cell_type[i]
+        k = self.cell_kho[i]
+        by_type = self.quota[t] - tally.type_tot[t] + cur
+        by_kho = self.kho_cap[k] - tally.kho_tot[k] + cur
+        return max(0, by_type if by_type < by_kho else by_kho)
+
+    def set(self, tally: RuleTally, i: int, value: int) -> int:
+        """Ghi ô i (không clamp) và cập nhật các tổng; trả về chênh lệch điểm."""
+        old = tally.cells[i]
+        d = value - old
+        if d:
+            cap = self.cell_cap[i]
+            tally.over += (value > cap) - (old > cap)
+            tally.cells[i] = value
+            tally.type_tot[self.cell_type[i]] += d
+            tally.kho_tot[self.cell_kho[i]] += d
+            tally.total += d
+            tally.score += d * self.points[i]
+            tally.key += d * self.stride[i]
+        return d * self.points[i]
+
+    def score(self, cells: list[int]) -> int:
+        return sum(c * p for c, p in zip(cells, self.points))
+
+    def violations(self, tally: RuleTally) -> list[str]:
+        problems = []
+        for ti, total in enumerate(tally.type_tot):
+            if total > self.quota[ti]:
+                problems.append(f"{self.types[ti]}: {total} > quota {self.quota[ti]}")
+        for k, total in enumerate(tally.kho_tot):
+            if total > self.kho_cap[k]:
+                problems.append(f"{self.kho_labels[k]}: {total} > {self.kho_cap[k]}")
+        return problems
+
+    def absolute_met(self, tally: RuleTally) -> bool:
+        if not self._absolute:
+            return False
+        for clause in self._absolute:
+            if not clause(tally):
+                return False
+        return True
+
+    def points_dict(self) -> dict:
+        return {t: {k: self.points[ti * self.n_khos + k - 1] for k in self.khos}
+                for ti, t in enumerate(self.types)}
+
+
+class StateTable:
+    """
+    Mọi trạng thái hợp lệ của 1 đội theo ruleset, liệt kê 1 lần bằng NumPy: thêm từng ô,
+    cắt ngay các nhánh vượt quota / sức chứa kho. Mỗi trạng thái có sẵn điểm (chưa gồm
+    lỗi / thưởng), tuyệt đối hay không và allowed_max của từng ô; tra bằng RuleTally.key.
+    """
+
+    MAX_STATES = 2_000_000
+
+    def __init__(self, rules: Ruleset):
+        import numpy as np
+
+        t0 = time.perf_counter()
+        if rules.n_keys >= 2 ** 62:
+            raise ValueError("ruleset: state key space too large")
+        self.rules = rules
+        quota = np.array(rules.quota, dtype=np.int32)
+        kho_cap = np.array(rules.kho_cap, dtype=np.int32)
+
+        states = np.zeros((1, 0), dtype=np.int16)
+        type_tot = np.zeros((1, rules.n_types), dtype=np.int32)
+        kho_tot = np.zeros((1, rules.n_khos), dtype=np.int32)
+        for i in range(rules.n_cells):
+            t, k = rules.cell_type[i], rules.cell_kho[i]
+            vals = np.arange(rules.cell_cap[i] + 1, dtype=np.int32)
+            parent = np.repeat(np.arange(len(states)), len(vals))
+            val = np.tile(vals, len(states))
+            keep = (type_tot[parent, t] + val <= quota[t]) & (kho_tot[parent, k] + val <= kho_cap[k])
+            parent, val = parent[keep], val[keep]
+            if len(parent) > self.MAX_STATES:
+                raise ValueError(f"ruleset: more than {self.MAX_STATES} legal states")
+            states = np.column_stack((states[parent], val.astype(np.int16)))
+            type_tot = type_tot[parent]
+            type_tot[:, t] += val
+            kho_tot = kho_tot[parent]
+            kho_tot[:, k] += val
+
+        self.states = states
+        self.type_tot = type_tot
+        self.kho_tot = kho_tot
+        self.total = type_tot.sum(axis=1)
+        self.scores = states.astype(np.int64) @ np.array(rules.points, dtype=np.int64)
+        self.keys = states.astype(np.int64) @ np.array(rules.stride, dtype=np.int64)
+
+        cell_type = np.array(rules.cell_type)
+        cell_kho = np.array(rules.cell_kho)
+        by_type = quota[cell_type] - type_tot[:, cell_type]
+        by_kho = kho_cap[cell_kho] - kho_tot[:, cell_kho]
+        self.allowed = np.maximum(0, np.minimum(by_type, by_kho) + states)
+
+        absolute = np.full(len(states), bool(rules.absolute_clauses))
+        for kind, arg in rules.absolute_clauses:
+            absolute &= self._clause_mask(np, kind, arg)
+        self.absolute = absolute
+
+        # tra theo key bằng dict Python (không tạo numpy scalar)
+        self.allowed_by_key = dict(zip(self.keys.tolist(), map(tuple, self.allowed.tolist())))
+        self.build_ms = (time.perf_counter() - t0) * 1000.0
+
+    def _clause_mask(self, np, kind: str, arg):
+        if kind == "every_kho_at_least":
+            return (self.kho_tot >= int(arg)).all(axis=1)
+        if kind == "any_kho_at_least":
+            return (self.kho_tot >= int(arg)).any(axis=1)
+        if kind == "any_kho_full":
+            return (self.kho_tot >= np.array(self.rules.kho_cap)).any(axis=1) == bool(arg)
+        if kind == "total_at_least":
+            return self.total >= int(arg)
+        if kind == "score_at_least":
+            return self.scores >= int(arg)
+        if kind == "type_at_least":
+            mask = np.ones(len(self.states), dtype=bool)
+            for key, v in dict(arg).items():
+                mask &= self.type_tot[:, self.rules.type_index[key]] >= int(v)
+            return mask
+        raise ValueError(f"ruleset: unknown absolute clause {kind!r}")
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def counts(self, row: int) -> dict:
+        """Trạng thái thứ row dạng counts[type][kho] như MatchController.counts[team]."""
+        n = self.rules.n_khos
+        cells = self.states[int(row)].tolist()
+        return {t: {k: cells[ti * n + k - 1] for k in self.rules.khos} for ti, t in enumerate(self.rules.types)}
+
+    def max_score(self) -> int:
+        return int(self.scores.max())
+
+    def absolute_rows(self):
+        return self.absolute.nonzero()[0]
+
+    def summary(self) -> dict:
+        """Trả lời nhanh cho BTC: số trạng thái, điểm tối đa, các trạng thái tuyệt đối."""
+        best = int(self.scores.argmax())
+        out = {
+            "ruleset": self.rules.name,
+            "legal_states": len(self),
+            "max_score": self.max_score(),
+            "max_score_counts": self.counts(best),
+            "absolute_states": int(self.absolute.sum()),
+            "build_ms": round(self.build_ms, 2),
+        }
+        rows = self.absolute_rows()
+        if len(rows):
+            low = rows[self.scores[rows].argmin()]
+            out["min_absolute_score"] = int(self.scores[low])
+            out["min_absolute_counts"] = self.counts(low)
+            out["min_absolute_total"] = int(self.total[rows].min())
+        plain = (~self.absolute).nonzero()[0]
+        if len(plain):
+            out["max_non_absolute_score"] = int(self.scores[plain].max())
+        return out
+
+
+# ================== Tick scheduler (dùng chung) ==================
+class TickScheduler(QObject):
+    """
+    1 QTimer PreciseTimer cho mọi MatchController trong process (nhiều sân).
+    Mỗi controller chỉ hẹn mốc gần nhất của mình (arm); scheduler giữ heap các
+    deadline và chỉ thức dậy ở mốc sớm nhất, gọi hết các mốc đã tới trong 1 lần.
+    Đồng hồ (clock) cũng dùng chung nên deadline các sân so sánh trực tiếp được.
+
+    clock: bất kỳ object nào có elapsed() (ms) và nsecsElapsed() như QElapsedTimer
+    (mặc định 1 QElapsedTimer mới); SimScheduler + VirtualClock chạy thời gian ảo.
+    """
+
+    _default: "TickScheduler | None" = None
+
+    @classmethod
+    def default(cls) -> "TickScheduler":
+        if cls._default is None:
+            cls._default = TickScheduler()
+        return cls._default
+
+    def __init__(self, parent=None, clock=None):
+        super().__init__(parent)
+        if clock is None:
+            clock = QElapsedTimer()
+            clock.start()
+        self.clock = clock
+        self._heap: list[tuple[int, int, object]] = []
+        # owner -> (seq, callback); mục trong heap có seq khác = đã huỷ / hẹn lại
+        self._due: dict[object, tuple[int, object]] = {}
+        self._seq = 0
+        self._armed_at: int | None = None
+        self._firing = False
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._fire)
+
+        self.wakeups = 0
+        self.callbacks = 0
+
+    def now_ms(self) -> int:
+        return self.clock.elapsed()
+
+    def arm(self, owner, deadline_ms: int, callback):
+        """Hẹn callback() lúc clock >= deadline_ms; mỗi owner chỉ có 1 mốc (hẹn lại = thay)."""
+        self._seq += 1
+        self._due[owner] = (self._seq, callback)
+        heapq.heappush(self._heap, (int(deadline_ms), self._seq, owner))
+        if not self._firing and (self._armed_at is None or deadline_ms < self._armed_at):
+            self._rearm()
+
+    def cancel(self, owner):
+        if self._due.pop(owner, None) is None:
+            return
+        # huỷ lười; chỉ dọn heap khi rác nhiều hơn hẳn số mốc còn sống
+        if len(self._heap) > 4 * len(self._due) + 16:
+            self._heap = [e for e in self._heap if self._due.get(e[2], (None,))[0] == e[1]]
+            heapq.heapify(self._heap)
+        if not self._due and not self._firing:
+            self._wait(None)
+            self._armed_at = None
+
+    def is_armed(self, owner) -> bool:
+        return owner in self._due
+
+    def next_deadline(self) -> int | None:
+        """Mốc sớm nhất còn sống (bỏ các mục đã huỷ / hẹn lại ở đỉnh heap)."""
+        heap = self._heap
+        while heap and self._due.get(heap[0][2], (None,))[0] != heap[0][1]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def _rearm(self):
+        deadline = self.next_deadline()
+        if deadline is None:
+            self._wait(None)
+            self._armed_at = None
+            return
+        self._armed_at = deadline
+        self._wait(max(0, deadline - self.clock.elapsed()))
+
+    def _wait(self, ms: int | None):
+        # None = không còn mốc nào
+        if ms is None:
+            self._timer.stop()
+        else:
+            self._timer.start(ms)
+
+    def _fire(self):
+        self.wakeups += 1
+        self._armed_at = None
+        self._firing = True
+        try:
+            now = self.clock.elapsed()
+            heap = self._heap
+            ready = []
+            while heap and heap[0][0] <= now:
+                _deadline, seq, owner = heapq.heappop(heap)
+                entry = self._due.get(owner)
+                if entry is not None and entry[0] == seq:
+                    del self._due[owner]
+                    ready.append(entry[1])
+            for callback in ready:
+                callback()
+            self.callbacks += len(ready)
+        finally:
+            self._firing = False
+        self._rearm()
+
+    def stats(self) -> dict:
+        return {"armed": len(self._due), "heap": len(self._heap),
+                "wakeups": self.wakeups, "callbacks": self.callbacks}
+
+
 # ================== Controller: treasures -> score ==================
 class MatchController(QObject):
     scoreboardChanged = pyqtSignal(str, int, str, int)  # team1, score1, team2, score2 (DISPLAY SCORE)
@@ -279,24 +1692,22 @@ class MatchController(QObject):
 
     teamColorChanged = pyqtSignal(int, str)  # team, color_hex
 
-    DEFAULT_POINTS = {
-        "stone":   {1: 5,  2: 7,  3: 10},
-        "gold":    {1: 15, 2: 17, 3: 20},
-        "diamond": {1: 30, 2: 32, 3: 35},
-    }
-
-    # quota theo mỗi đội (2 bên độc lập)
-    MAX_TREASURES_PER_TEAM = {
-        "stone": 4,
-        "gold": 3,
-        "diamond": 2,
-    }
-
-    # ✅ MỖI KHO (K1/K2/K3) TỔNG (ĐÁ+VÀNG+KIM CƯƠNG) TỐI ĐA 3
-    MAX_PER_KHO_TOTAL = 3
+    # tín hiệu chi tiết cho control panel (chỉ phát khi giá trị thật sự đổi)
+    countChanged = pyqtSignal(int, str, int, int)  # team, type, kho, value
+    adjustersChanged = pyqtSignal(int)  # team (lỗi / thưởng / tuyệt đối)
+    scoreChanged = pyqtSignal(int, int)  # team, DISPLAY score
+    changesCommitted = pyqtSignal(object)  # change set gộp của 1 lần commit (xem _new_changes)
+    absoluteConditionMet = pyqtSignal(int)  # team vừa đủ điều kiện tuyệt đối (chưa đủ -> đủ)
 
-    def __init__(self):
+    def __init__(
+        self,
+        score_self_check: bool = False,
+        scheduler: TickScheduler | None = None,
+        rules: Ruleset | None = None,
+    ):
         super().__init__()
+        # loại / kho / điểm / quota / tuyệt đối đều lấy từ ruleset (xem Ruleset)
+        self.rules = rules if rules is not None else Ruleset.default()
         self.team1 = "ĐỘI ĐỎ"
         self.team2 = "ĐỘI XANH"
 
@@ -311,34 +1722,63 @@ class MatchController(QObject):
             2: "#1e73be",
         }
 
-        self.points = copy.deepcopy(self.DEFAULT_POINTS)
+        self.points = self.rules.points_dict()
 
-        self.counts = {
-            1: {"stone": {1: 0, 2: 0, 3: 0}, "gold": {1: 0, 2: 0, 3: 0}, "diamond": {1: 0, 2: 0, 3: 0}},
-            2: {"stone": {1: 0, 2: 0, 3: 0}, "gold": {1: 0, 2: 0, 3: 0}, "diamond": {1: 0, 2: 0, 3: 0}},
-        }
+        # counts[team][type][kho]: dạng dict cho UI / snapshot; _tally: mảng phẳng để clamp / tính điểm
+        self.counts = {1: self.rules.counts_template(), 2: self.rules.counts_template()}
+        self._tally = {1: self.rules.new_tally(), 2: self.rules.new_tally()}
 
         self.penalty_minus5 = {1: 0, 2: 0}   # không giới hạn (>=0)
         self.bonus_plus5 = {1: 0, 2: 0}      # ✅ không giới hạn (>=0)
 
         self.abs_winner: int | None = None
+        # điều kiện tuyệt đối theo ruleset, xét lại khi ô của đội đổi (xem _track_absolute)
+        self._abs_met = {1: False, 2: False}
+        # bật: đội đủ điều kiện khi đang chạy giờ -> tự set_absolute_win + chốt giờ ngay
+        self.auto_absolute = False
+
+        # tổng điểm thật chạy song song, cập nhật O(1) theo delta ở mỗi setter
+        self._real_scores = {1: 0, 2: 0}
+        # bật để so mỗi lần emit với compute_score() (tính lại đủ 18 ô)
+        self.score_self_check = bool(score_self_check)
+        self.score_checks = 0
+        self._last_display: tuple[int | None, int | None] = (None, None)
+
+        # tăng sau mỗi commit / hết giờ -> snapshot biết khi nào cần ghi
+        self.state_version = 0
+
+        # ----- batch / transaction -----
+        self._batch_depth = 0
+        self._batch_snapshot: dict | None = None
+        self._pending = self._new_changes()
 
         # ----- timer -----
         self.seconds = 0
         self.running = False
         self.paused = False
-        self.elapsed = QElapsedTimer()
+        # mọi trận trong process dùng chung 1 scheduler + 1 đồng hồ (xem TickScheduler)
+        self.scheduler = scheduler if scheduler is not None else TickScheduler.default()
+        self.elapsed = self.scheduler.clock
         self.end_epoch_ms = None
-        self.remaining_ms_pause = 0
+        # thời gian còn lại (ms) khi KHÔNG đang chạy: dừng / pause / freeze
+        self.remaining_ms = 0
+        # False = không hẹn tick mỗi lần đổi giây, chỉ mốc cue / hết giờ (MatchSimulator tua nhanh)
+        self.second_ticks = True
+
+        # đo độ trễ đổi giây / cue (None = tắt, xem enable_timing_probe)
+        self.timing: TimingProbe | None = None
+        # journal append-only (None = tắt, xem attach_journal)
+        self.journal: MatchJournal | None = None
 
         self.played3 = False
         self.playedEnd = False
-        self.sound3 = self._load_sound_any(["3.wav", "3s.wav"])
-        self.soundEnd = self._load_sound_any(["end.wav"])
-
-        self.timer_ms = QTimer()
-        self.timer_ms.timeout.connect(self._tick)
-        self.timer_ms.start(100)
+        # âm thanh nạp sau khi cửa sổ đã hiện (load_sounds), tránh kéo QtMultimedia lúc khởi động
+        self.audio: CueAudioEngine | None = None
+        self._audio_token = f"m{id(self):x}"
+        # cue -> deadline (ms, theo self.elapsed) đã hẹn trên thread audio
+        self._cue_deadlines: dict[str, int] = {}
+        # audio.now_ns() + offset = nsecsElapsed của self.elapsed
+        self._audio_offset_ns = 0
 
         # đảm bảo tên mặc định cũng tuân maxlen
         self.set_team_names(self.team1, self.team2)
@@ -348,19 +1788,16 @@ class MatchController(QObject):
         m, s = divmod(max(0, int(sec)), 60)
         return f"{m:02d}:{s:02d}"
 
-    def _load_sound_any(self, candidates: list[str]):
-        full = None
-        for name in candidates:
-            full = find_asset_first(name)
-            if full:
-                break
-        if not full:
-            return None
-        s = QSoundEffect()
-        s.setSource(QUrl.fromLocalFile(full))
-        s.setLoopCount(1)
-        s.setVolume(0.9)
-        return s
+    def load_sounds(self, engine: "CueAudioEngine | None" = None):
+        """Gắn engine âm thanh (tạo mới nếu không truyền vào; nhiều trận có thể dùng chung)."""
+        if self.audio is None:
+            self.audio = engine if engine is not None else CueAudioEngine()
+            self._audio_offset_ns = self.elapsed.nsecsElapsed() - self.audio.now_ns()
+            self.audio.cueFired.connect(self._on_cue_fired)
+            self.audio.cueStarted.connect(self._on_cue_started)
+        # timer đang chạy: hẹn lại để có mốc cue 3s
+        if self.running and (not self.paused) and self.end_epoch_ms is not None:
+            self._arm_next(self.remaining_now_ms())
 
     # -------- colors --------
     def get_team_color(self, team: int) -> str:
@@ -375,75 +1812,371 @@ class MatchController(QObject):
         if self.team_colors.get(team) == new_hex:
             return
         self.team_colors[team] = new_hex
-        self.teamColorChanged.emit(team, new_hex)
+        self._pending["colors"][team] = new_hex
+        self._op(MatchJournal.OP_COLOR, team, qc.red(), qc.green(), qc.blue())
+        self._changed()
 
     # -------- kho / quota helpers --------
     def team_capacity_for_type(self, team: int, treasure_type: str) -> int:
         _ = team
-        return int(self.MAX_TREASURES_PER_TEAM.get(treasure_type, 999))
+        return int(self.rules.quota[self.rules.type_index[treasure_type]])
 
     def kho_other_types_sum(self, team: int, kho: int, exclude_type: str) -> int:
-        total = 0
-        for t in ("stone", "gold", "diamond"):
-            if t == exclude_type:
-                continue
-            total += int(self.counts[team][t][kho])
-        return int(total)
+        i = self.rules.cell(exclude_type, kho)
+        tally = self._tally[team]
+        return int(tally.kho_tot[self.rules.cell_kho[i]] - tally.cells[i])
 
     def kho_free_space_for_type(self, team: int, kho: int, treasure_type: str) -> int:
-        """
-        Số chỗ tối đa còn lại trong kho (theo rule tổng kho <= 3),
-        dành cho treasure_type (tức là 3 - (2 loại còn lại)).
-        """
-        other = self.kho_other_types_sum(team, kho, treasure_type)
-        return max(0, int(self.MAX_PER_KHO_TOTAL) - int(other))
+        """Số chỗ còn lại trong kho (sức chứa kho trừ các loại khác) dành cho treasure_type."""
+        cap = self.rules.kho_cap[int(kho) - 1]
+        return max(0, int(cap) - self.kho_other_types_sum(team, kho, treasure_type))
+
+    def allowed_max(self, team: int, treasure_type: str, kho: int) -> int:
+        """Giá trị lớn nhất ô (team, type, kho) được nhận, theo quota loại + sức chứa kho."""
+        return self.rules.allowed_max(self._tally[team], self.rules.cell(treasure_type, kho))
 
     # -------- scoring --------
     def compute_score(self, team: int) -> int:
+        # tính lại từ đầu (đối chiếu với _real_scores); không dùng tổng chạy trong tally
         total = 0
-        for t in ("stone", "gold", "diamond"):
-            for kho in (1, 2, 3):
-                c = int(self.counts[team][t][kho])
-                total += c * int(self.points[t][kho])
-        total -= int(self.penalty_minus5[team]) * 5
-        total += int(self.bonus_plus5[team]) * 5
+        for t, row in self.counts[team].items():
+            pts = self.points[t]
+            for kho, v in row.items():
+                total += int(v) * pts[kho]
+        total -= int(self.penalty_minus5[team]) * self.rules.penalty
+        total += int(self.bonus_plus5[team]) * self.rules.bonus
         return total
 
+    def real_score(self, team: int) -> int:
+        return int(self._real_scores[int(team)])
+
+    def verify_scores(self):
+        """
+        So tổng chạy song song với compute_score(); có NumPy thì đối chiếu thêm
+        allowed_max với StateTable (trạng thái phải hợp lệ). Lệch -> RuntimeError.
+        """
+        self.score_checks += 1
+        table = self.rules.table()
+        for team in (1, 2):
+            full = self.compute_score(team)
+            fast = self._real_scores[team]
+            if full != fast:
+                raise RuntimeError(
+                    f"score mismatch team {team}: incremental={fast} full={full}"
+                )
+            if table is None:
+                continue
+            tally = self._tally[team]
+            want = table.allowed_by_key.get(tally.key)
+            got = tuple(self.rules.allowed_max(tally, i) for i in range(self.rules.n_cells))
+            if want != got:
+                raise RuntimeError(f"clamp mismatch team {team}: table={want} direct={got}")
+
     def get_display_scores(self) -> tuple[int, int]:
-        real1 = self.compute_score(1)
-        real2 = self.compute_score(2)
         if self.abs_winner == 1:
             return (1, 0)
         if self.abs_winner == 2:
             return (0, 1)
-        return (real1, real2)
+        return (self._real_scores[1], self._real_scores[2])
 
-    def get_totals(self, team: int, treasure_type: str) -> tuple[int, int, int, int]:
-        k1 = int(self.counts[team][treasure_type][1])
-        k2 = int(self.counts[team][treasure_type][2])
-        k3 = int(self.counts[team][treasure_type][3])
-        return (k1 + k2 + k3, k1, k2, k3)
+    def get_totals(self, team: int, treasure_type: str) -> tuple[int, ...]:
+        """(tổng của loại, số ở K1, K2, ...)."""
+        ti = self.rules.type_index[treasure_type]
+        tally = self._tally[team]
+        n = self.rules.n_khos
+        return (tally.type_tot[ti], *tally.cells[ti * n:(ti + 1) * n])
 
     # -------- emits --------
     def _freeze_timer_now(self):
         if not self.running:
             return
 
-        if (not self.paused) and (self.end_epoch_ms is not None):
-            now = self.elapsed.elapsed()
-            remaining_ms = max(0, int(self.end_epoch_ms - now))
-            self.seconds = int(remaining_ms // 1000)
+        self.remaining_ms = self.remaining_now_ms()
+        self.seconds = int(self.remaining_ms // 1000)
 
         self.running = False
         self.paused = False
         self.end_epoch_ms = None
-        self.remaining_ms_pause = 0
-
-    def _emit_all(self):
+        self._stop_timer()
+        self._pending["timer"] = True
+        self._op(MatchJournal.OP_FREEZE, self.remaining_ms)
+
+    def _emit_scoreboard(self, force: bool = False):
+        # scoreChanged theo từng đội + đúng 1 scoreboardChanged cho mỗi thay đổi
+        if self.score_self_check:
+            self.verify_scores()
         s1, s2 = self.get_display_scores()
-        self.scoreboardChanged.emit(self.team1, int(s1), self.team2, int(s2))
-        self.timeTextChanged.emit(self._fmt(self.seconds))
-        self.stateChanged.emit(self.running, self.paused)
+        last1, last2 = self._last_display
+        if s1 != last1:
+            self.scoreChanged.emit(1, int(s1))
+        if s2 != last2:
+            self.scoreChanged.emit(2, int(s2))
+        if force or (s1, s2) != self._last_display:
+            self._last_display = (s1, s2)
+            self.scoreboardChanged.emit(self.team1, int(s1), self.team2, int(s2))
+
+    # -------- batch / transaction --------
+    @staticmethod
+    def _new_changes() -> dict:
+        return {
+            "counts": {},        # (team, type, kho) -> value
+            "adjusters": set(),  # team: lỗi / thưởng / tuyệt đối
+            "colors": {},        # team -> color_hex
+            "names": False,
+            "timer": False,      # thời gian / trạng thái chạy
+            "absolute_met": [],  # team vừa đủ điều kiện tuyệt đối
+            "ops": [],           # (t_ms, op, args) cho journal, ghi lúc commit
+        }
+
+    def _capture_state(self) -> dict:
+        return {
+            "counts": copy.deepcopy(self.counts),
+            "tally": {team: t.copy() for team, t in self._tally.items()},
+            "penalty_minus5": dict(self.penalty_minus5),
+            "bonus_plus5": dict(self.bonus_plus5),
+            "real_scores": dict(self._real_scores),
+            "team_colors": dict(self.team_colors),
+            "team1": self.team1,
+            "team2": self.team2,
+            "abs_winner": self.abs_winner,
+            "abs_met": dict(self._abs_met),
+            "timer": (
+                self.seconds, self.running, self.paused, self.end_epoch_ms,
+                self.remaining_ms, self.played3, self.playedEnd,
+            ),
+        }
+
+    def _restore_captured(self, st: dict):
+        self.counts = st["counts"]
+        self._tally = st["tally"]
+        self.penalty_minus5 = st["penalty_minus5"]
+        self.bonus_plus5 = st["bonus_plus5"]
+        self._real_scores = st["real_scores"]
+        self.team_colors = st["team_colors"]
+        self.team1 = st["team1"]
+        self.team2 = st["team2"]
+        self.abs_winner = st["abs_winner"]
+        self._abs_met = st["abs_met"]
+        (
+            self.seconds, self.running, self.paused, self.end_epoch_ms,
+            self.remaining_ms, self.played3, self.playedEnd,
+        ) = st["timer"]
+        self._stop_timer()
+        if self.running and (not self.paused) and self.end_epoch_ms is not None:
+            self._arm_next(self.remaining_now_ms())
+
+    @contextmanager
+    def batch(self):
+        """
+        Gộp nhiều thay đổi thành 1 transaction:
+
+            with controller.batch():
+                controller.set_count(1, "gold", 2, 1)
+                controller.set_penalty_minus5(2, 1)
+
+        Trong batch, set_count chỉ clamp >= 0; rule quota được kiểm 1 lần lúc commit.
+        Commit phát đúng 1 lượt tín hiệu (changesCommitted + các tín hiệu chi tiết).
+        Có exception, sai rule hoặc ghi journal lỗi -> rollback toàn bộ, không phát tín hiệu nào.
+        Journal ghi xong là commit đã chốt; lỗi trong slot lúc phát tín hiệu không rollback.
+        Batch lồng nhau gộp vào batch ngoài cùng.
+        """
+        if self._batch_depth == 0:
+            self._batch_snapshot = self._capture_state()
+            self._pending = self._new_changes()
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._rollback()
+            raise
+        self._batch_depth -= 1
+        if self._batch_depth == 0:
+            problems = self.validate_counts()
+            if problems:
+                self._rollback()
+                raise ValueError("; ".join(problems))
+            try:
+                ch = self._commit_pending()
+            except BaseException:
+                self._rollback()
+                raise
+            self._batch_snapshot = None
+            self._emit_changes(ch)
+
+    def in_batch(self) -> bool:
+        return self._batch_depth > 0
+
+    def _rollback(self):
+        if self._batch_snapshot is not None:
+            self._restore_captured(self._batch_snapshot)
+        self._batch_snapshot = None
+        self._pending = self._new_changes()
+
+    def validate_counts(self) -> list[str]:
+        problems: list[str] = []
+        for team in (1, 2):
+            problems.extend(f"team {team} {p}" for p in self.rules.violations(self._tally[team]))
+        return problems
+
+    def _changed(self):
+        if self._batch_depth == 0:
+            self._flush_changes()
+
+    def _op(self, op: int, *args):
+        if self.journal is not None:
+            self._pending["ops"].append((self.journal.now_ms(), op, args))
+
+    def attach_journal(self, journal: MatchJournal | None):
+        """Gắn journal và ghi ngay 1 baseline đầy đủ của trạng thái hiện tại."""
+        self.journal = journal
+        if journal is None:
+            return
+        J = MatchJournal
+        t = journal.now_ms()
+        ops: list[tuple[int, int, tuple]] = [
+            (t, J.OP_TYPES, (self.rules.n_khos, *self.rules.types)),
+            (t, J.OP_NAMES, (self.team1, self.team2)),
+        ]
+        for team, color_hex in self.team_colors.items():
+            qc = QColor(color_hex)
+            ops.append((t, J.OP_COLOR, (team, qc.red(), qc.green(), qc.blue())))
+        for team in (1, 2):
+            for ttype, row in self.counts[team].items():
+                for kho, v in row.items():
+                    if v:
+                        ops.append((t, J.OP_COUNT, (team, self.rules.type_index[ttype], kho, int(v))))
+            ops.append((t, J.OP_PENALTY, (team, int(self.penalty_minus5[team]))))
+            ops.append((t, J.OP_BONUS, (team, int(self.bonus_plus5[team]))))
+        ops.append((t, J.OP_ABS, (int(self.abs_winner or 0),)))
+        ops.append((t, J.OP_TIMER, (self.remaining_now_ms(), int(self.running), int(self.paused))))
+        journal.append_many(ops)
+
+    def _track_absolute(self, team: int):
+        # tally đã hợp lệ (clamp / validate xong) -> vài phép so trên tổng từng kho, không quét lại ô
+        met = self.rules.absolute_met(self._tally[team])
+        if met == self._abs_met[team]:
+            return
+        self._abs_met[team] = met
+        if not met:
+            return
+        self._pending["absolute_met"].append(team)
+        if self.auto_absolute and self.abs_winner is None and self.running:
+            # cùng change set với thao tác vừa nhập: giờ chốt ngay tại lúc này
+            self._apply_absolute_win(team)
+        # dừng giờ / auto đang tắt: start(), resume(), set_auto_absolute(True) xét lại (_auto_absolute_pending)
+
+    def _flush_changes(self):
+        self._emit_changes(self._commit_pending(detach_on_error=True))
+
+    def _commit_pending(self, detach_on_error: bool = False) -> dict:
+        """
+        Phần có thể lỗi của commit (xét tuyệt đối, ghi journal); chưa phát tín hiệu nào.
+        batch() rollback khi ghi journal lỗi; thao tác lẻ (detach_on_error) không rollback được
+        -> bỏ ops, tách journal và báo lỗi, chấm điểm chạy tiếp.
+        """
+        for team in sorted({key[0] for key in self._pending["counts"]}):
+            self._track_absolute(team)
+        ch = self._pending
+        if ch["ops"] and self.journal is not None:
+            try:
+                self.journal.append_many(ch["ops"])
+            except Exception as e:
+                if not detach_on_error:
+                    raise
+                self._detach_broken_journal(e)
+        self._pending = self._new_changes()
+        self.state_version += 1
+        return ch
+
+    def _detach_broken_journal(self, err: Exception):
+        journal, self.journal = self.journal, None
+        print(f"[journal] {getattr(journal, 'path', journal)}: {err!r} -> journal disabled",
+              file=sys.stderr)
+        try:
+            journal.close()
+        except Exception:
+            pass
+
+    def _emit_changes(self, ch: dict):
+        for (team, t, kho), value in ch["counts"].items():
+            self.countChanged.emit(team, t, kho, value)
+        for team in sorted(ch["adjusters"]):
+            self.adjustersChanged.emit(team)
+        for team, color_hex in ch["colors"].items():
+            self.teamColorChanged.emit(team, color_hex)
+
+        self._emit_scoreboard(force=ch["names"])
+        if ch["timer"]:
+            self.timeTextChanged.emit(self._fmt(self.seconds))
+            self.stateChanged.emit(self.running, self.paused)
+        for team in ch["absolute_met"]:
+            self.absoluteConditionMet.emit(team)
+
+        self.changesCommitted.emit(ch)
+
+    def export_state(self) -> dict:
+        """Trạng thái chấm điểm (không gồm timer), dạng JSON-friendly."""
+        return {
+            "team1": self.team1,
+            "team2": self.team2,
+            "team_colors": {str(k): v for k, v in self.team_colors.items()},
+            "counts": {
+                str(team): {t: {str(k): int(v) for k, v in row.items()} for t, row in per.items()}
+                for team, per in self.counts.items()
+            },
+            "penalty_minus5": {str(k): int(v) for k, v in self.penalty_minus5.items()},
+            "bonus_plus5": {str(k): int(v) for k, v in self.bonus_plus5.items()},
+            "abs_winner": self.abs_winner,
+        }
+
+    def match_result(self) -> dict:
+        """Kết quả trận hiện tại cho Tournament: điểm thật, số ô từng kho, lỗi / thưởng, tuyệt đối."""
+        abs_winner = int(self.abs_winner or 0)
+        s1, s2 = self.real_score(1), self.real_score(2)
+        if abs_winner:
+            winner = abs_winner
+        else:
+            winner = 1 if s1 > s2 else 2 if s2 > s1 else 0
+        teams = []
+        for team, score in ((1, s1), (2, s2)):
+            teams.append({
+                "score": score,
+                "counts": {t: {str(k): int(v) for k, v in row.items()} for t, row in self.counts[team].items()},
+                "diamonds": self.get_totals(team, self.rules.rank_type)[0],
+                "penalty_minus5": int(self.penalty_minus5[team]),
+                "bonus_plus5": int(self.bonus_plus5[team]),
+            })
+        return {
+            "team1": self.team1,
+            "team2": self.team2,
+            "winner": winner,
+            "abs_winner": abs_winner,
+            "teams": teams,
+            "remaining_ms": self.remaining_now_ms(),
+        }
+
+    def apply_state(self, state: dict):
+        """Áp trạng thái từ export_state() trong 1 batch -> 1 lần refresh UI."""
+        with self.batch():
+            if "team1" in state or "team2" in state:
+                self.set_team_names(state.get("team1", self.team1), state.get("team2", self.team2))
+            for team, color_hex in (state.get("team_colors") or {}).items():
+                self.set_team_color(int(team), color_hex)
+            for team, per in (state.get("counts") or {}).items():
+                for t, row in per.items():
+                    if t not in self.rules.type_index:
+                        continue  # snapshot / journal của ruleset khác
+                    for kho, v in row.items():
+                        if int(kho) in self.rules.khos:
+                            self.set_count(int(team), t, int(kho), int(v))
+            for team, v in (state.get("penalty_minus5") or {}).items():
+                self.set_penalty_minus5(int(team), int(v))
+            for team, v in (state.get("bonus_plus5") or {}).items():
+                self.set_bonus_plus5(int(team), int(v))
+            if "abs_winner" in state:
+                self.set_absolute_win(state["abs_winner"])
 
     # -------- public api --------
     def set_team_names(self, t1: str, t2: str):
@@ -457,75 +2190,108 @@ class MatchController(QObject):
         m1 = int(self.team_name_maxlen.get(1, 80))
         m2 = int(self.team_name_maxlen.get(2, 80))
 
-        self.team1 = norm(t1, m1) or "ĐỘI 1"
-        self.team2 = norm(t2, m2) or "ĐỘI 2"
-        self._emit_all()
+        n1 = norm(t1, m1) or "ĐỘI 1"
+        n2 = norm(t2, m2) or "ĐỘI 2"
+        if (n1, n2) != (self.team1, self.team2):
+            self._pending["names"] = True
+            self._op(MatchJournal.OP_NAMES, n1, n2)
+        self.team1 = n1
+        self.team2 = n2
+        self._changed()
 
     def set_count(self, team: int, treasure_type: str, kho: int, value: int):
         """
-        Clamp theo 2 rule:
-        (1) quota theo LOẠI trong đội: K1+K2+K3 <= MAX_TREASURES_PER_TEAM[type]
-        (2) quota theo KHO trong đội: (stone+gold+diamond) tại Kx <= 3
+        Clamp theo ruleset:
+        (1) quota theo LOẠI trong đội: tổng các kho <= quota[type]
+        (2) sức chứa KHO trong đội: tổng mọi loại tại Kx <= kho_capacity
         """
         team = int(team)
         kho = int(kho)
         value = max(0, int(value))
+        rules = self.rules
+        i = rules.cell(treasure_type, kho)
+        tally = self._tally[team]
 
-        # rule (1): theo loại
-        cap_type = int(self.team_capacity_for_type(team, treasure_type))
-        other_khos_same_type = 0
-        for k in (1, 2, 3):
-            if k != kho:
-                other_khos_same_type += int(self.counts[team][treasure_type][k])
-        max_by_type = max(0, cap_type - other_khos_same_type)
-
-        # rule (2): theo kho (tổng kho <= 3)
-        max_by_kho = int(self.kho_free_space_for_type(team, kho, treasure_type))
-
-        allowed_here = max(0, min(max_by_type, max_by_kho))
-        value = min(value, allowed_here)
+        if self._batch_depth == 0:
+            value = min(value, rules.allowed_max(tally, i))
+        # trong batch: rule quota kiểm 1 lần lúc commit (validate_counts)
 
+        if value == tally.cells[i]:
+            return
+        self._real_scores[team] += rules.set(tally, i, value)
         self.counts[team][treasure_type][kho] = value
-        self._emit_all()
+        self._pending["counts"][(team, treasure_type, kho)] = value
+        self._op(MatchJournal.OP_COUNT, team, rules.cell_type[i], kho, value)
+        self._changed()
 
     def set_penalty_minus5(self, team: int, value: int):
-        self.penalty_minus5[team] = max(0, int(value))
-        self._emit_all()
+        value = max(0, int(value))
+        if value == self.penalty_minus5[team]:
+            return
+        self._real_scores[team] -= (value - self.penalty_minus5[team]) * self.rules.penalty
+        self.penalty_minus5[team] = value
+        self._pending["adjusters"].add(team)
+        self._op(MatchJournal.OP_PENALTY, team, value)
+        self._changed()
 
     def set_bonus_plus5(self, team: int, value: int):
         # ✅ không giới hạn, chỉ clamp >= 0
-        self.bonus_plus5[team] = max(0, int(value))
-        self._emit_all()
+        value = max(0, int(value))
+        if value == self.bonus_plus5[team]:
+            return
+        self._real_scores[team] += (value - self.bonus_plus5[team]) * self.rules.bonus
+        self.bonus_plus5[team] = value
+        self._pending["adjusters"].add(team)
+        self._op(MatchJournal.OP_BONUS, team, value)
+        self._changed()
 
     def reset_scoring_and_coeff(self):
-        self.points = copy.deepcopy(self.DEFAULT_POINTS)
-        for team in (1, 2):
-            for t in ("stone", "gold", "diamond"):
-                for kho in (1, 2, 3):
-                    self.counts[team][t][kho] = 0
-            self.penalty_minus5[team] = 0
-            self.bonus_plus5[team] = 0
-        self.abs_winner = None
-        self._emit_all()
+        with self.batch():
+            for team in (1, 2):
+                for t in self.rules.types:
+                    for kho in self.rules.khos:
+                        self.set_count(team, t, kho, 0)
+                self.set_penalty_minus5(team, 0)
+                self.set_bonus_plus5(team, 0)
+                self._real_scores[team] = 0
+            self.set_absolute_win(None)
 
     def check_absolute_team(self, team: int) -> bool:
-        kho_total = {1: 0, 2: 0, 3: 0}
-        total_all = 0
-        for kho in (1, 2, 3):
-            for t in ("stone", "gold", "diamond"):
-                kho_total[kho] += int(self.counts[team][t][kho])
-            total_all += kho_total[kho]
-
-        cond1 = (kho_total[1] >= 1 and kho_total[2] >= 1 and kho_total[3] >= 1)
-        cond2 = (kho_total[1] == 3 or kho_total[2] == 3 or kho_total[3] == 3)
-        cond3 = (total_all >= 6)
-        return bool(cond1 and cond2 and cond3)
+        return self.rules.absolute_met(self._tally[int(team)])
 
-    def set_absolute_win(self, winner: int | None):
+    def absolute_condition_met(self, team: int) -> bool:
+        """Kết quả gần nhất của check_absolute_team (cập nhật mỗi lần ô của đội đổi)."""
+        return self._abs_met[int(team)]
+
+    def set_auto_absolute(self, on: bool):
+        self.auto_absolute = bool(on)
+        if self.auto_absolute and self._auto_absolute_pending():
+            self._changed()
+
+    def _auto_absolute_pending(self) -> bool:
+        """
+        Auto mode + đang chạy giờ mà 1 đội ĐÃ đủ điều kiện từ trước (lúc dừng giờ / trước khi bật
+        auto) -> xử luôn trong change set hiện tại. Cả 2 đội cùng đủ -> để trọng tài quyết.
+        """
+        if not (self.auto_absolute and self.running and self.abs_winner is None):
+            return False
+        met = [team for team in (1, 2) if self._abs_met[team]]
+        if len(met) != 1:
+            return False
+        self._apply_absolute_win(met[0])
+        return True
+
+    def _apply_absolute_win(self, winner: int | None):
         if winner in (1, 2):
             self._freeze_timer_now()
+        if winner != self.abs_winner:
+            self._pending["adjusters"].update((1, 2))
+            self._op(MatchJournal.OP_ABS, int(winner or 0))
         self.abs_winner = winner
-        self._emit_all()
+
+    def set_absolute_win(self, winner: int | None):
+        self._apply_absolute_win(winner)
+        self._changed()
 
     def set_time_seconds(self, seconds: int):
         self.abs_winner = None
@@ -533,23 +2299,31 @@ class MatchController(QObject):
         self.running = False
         self.paused = False
         self.end_epoch_ms = None
-        self.remaining_ms_pause = 0
+        self.remaining_ms = self.seconds * 1000
+        self._stop_timer()
         self.played3 = False
         self.playedEnd = False
-        self._emit_all()
+        self._pending["adjusters"].update((1, 2))
+        self._pending["timer"] = True
+        self._op(MatchJournal.OP_TIME_SET, self.remaining_ms)
+        self._changed()
 
     def start(self):
         if self.abs_winner is not None:
             return
-        if self.seconds <= 0:
+        remain = self.remaining_now_ms()
+        if remain <= 0:
             return
         self.running = True
         self.paused = False
         self.played3 = False
         self.playedEnd = False
-        self.elapsed.restart()
-        self.end_epoch_ms = self.elapsed.elapsed() + self.seconds * 1000
-        self.stateChanged.emit(self.running, self.paused)
+        self.end_epoch_ms = self.elapsed.elapsed() + remain
+        self._arm_next(remain)
+        self._pending["timer"] = True
+        self._op(MatchJournal.OP_START, remain)
+        self._auto_absolute_pending()
+        self._changed()
 
     def reset_timer_only(self):
         self.abs_winner = None
@@ -559,22 +2333,46 @@ class MatchController(QObject):
         if self.abs_winner is not None:
             return
         if self.running and not self.paused:
-            now = self.elapsed.elapsed()
-            self.remaining_ms_pause = max(0, int(self.end_epoch_ms - now)) if self.end_epoch_ms else self.seconds * 1000
-            self.seconds = int(self.remaining_ms_pause // 1000)
+            self.remaining_ms = self.remaining_now_ms()
+            self.seconds = int(self.remaining_ms // 1000)
             self.paused = True
-            self.timeTextChanged.emit(self._fmt(self.seconds))
-            self.stateChanged.emit(self.running, self.paused)
+            self.end_epoch_ms = None
+            self._stop_timer()
+            self._pending["timer"] = True
+            self._op(MatchJournal.OP_PAUSE, self.remaining_ms)
+            self._changed()
 
     def resume(self):
         if self.abs_winner is not None:
             return
         if self.running and self.paused:
-            remain = max(0, int(self.remaining_ms_pause))
-            self.elapsed.restart()
+            remain = max(0, int(self.remaining_ms))
             self.end_epoch_ms = self.elapsed.elapsed() + remain
             self.paused = False
-            self.stateChanged.emit(self.running, self.paused)
+            self._arm_next(remain)
+            self._pending["timer"] = True
+            self._op(MatchJournal.OP_RESUME, remain)
+            self._auto_absolute_pending()
+            self._changed()
+
+    def restore_timer(self, remaining_ms: int, running: bool = False, paused: bool = False):
+        """Đặt lại timer về đúng trạng thái (ms) đã lưu: dừng / đang chạy / pause."""
+        remain = max(0, int(remaining_ms))
+        self._stop_timer()
+        self.remaining_ms = remain
+        self.seconds = int(remain // 1000)
+        self.running = bool(running) and remain > 0
+        self.paused = bool(paused) and self.running
+        self.end_epoch_ms = None
+        # đã qua mốc 3s thì không phát lại cue
+        self.played3 = remain <= 4000
+        self.playedEnd = False
+        if self.running and not self.paused:
+            self.end_epoch_ms = self.elapsed.elapsed() + remain
+            self._arm_next(remain)
+        self._pending["timer"] = True
+        self._op(MatchJournal.OP_TIMER, remain, int(self.running), int(self.paused))
+        self._changed()
 
     def toggle_pause(self):
         if self.abs_winner is not None:
@@ -586,6 +2384,73 @@ class MatchController(QObject):
         else:
             self.force_pause()
 
+    def remaining_now_ms(self) -> int:
+        """Thời gian còn lại chính xác tới ms (đang chạy thì tính theo deadline)."""
+        if self.running and (not self.paused) and self.end_epoch_ms is not None:
+            return max(0, int(self.end_epoch_ms - self.elapsed.elapsed()))
+        return max(0, int(self.remaining_ms))
+
+    def _arm_next(self, remaining_ms: int):
+        # mốc đổi giây hiển thị: remaining // 1000 giảm khi remaining < sec * 1000
+        sec = remaining_ms // 1000
+        wait = remaining_ms - sec * 1000 + 1 if self.second_ticks else remaining_ms
+        if (not self.played3) and self._has_cue("cue_3s"):
+            if remaining_ms > 4000:
+                wait = min(wait, remaining_ms - 4000)
+                self._schedule_cue("cue_3s", self.end_epoch_ms - 4000)
+            elif remaining_ms > 0:
+                # start / resume khi đã qua mốc 3s: phát ngay, không đợi lần đổi giây kế tiếp
+                self._play_cue("cue_3s", self.end_epoch_ms - 4000)
+                self.played3 = True
+        if (not self.playedEnd) and self._has_cue("cue_end"):
+            self._schedule_cue("cue_end", self.end_epoch_ms)
+        wait = min(wait, remaining_ms)
+        # không poll: chỉ hẹn mốc gần nhất (đổi giây / cue / hết giờ) trên scheduler chung
+        self.scheduler.arm(self, self.end_epoch_ms - remaining_ms + max(0, int(wait)), self._tick)
+
+    def _stop_timer(self):
+        self.scheduler.cancel(self)
+        if self._cue_deadlines:
+            self._cue_deadlines.clear()
+            if self.audio is not None:
+                self.audio.cancel(self._audio_token)
+
+    # -------- audio cues --------
+    def _has_cue(self, kind: str) -> bool:
+        return self.audio is not None and self.audio.has(kind)
+
+    def _schedule_cue(self, kind: str, deadline_ms: int):
+        # chỉ gửi sang thread audio khi deadline đổi (start / resume), không phải mỗi giây
+        if self._cue_deadlines.get(kind) == deadline_ms:
+            return
+        self._cue_deadlines[kind] = deadline_ms
+        self.audio.schedule(self._audio_token, kind, deadline_ms * 1_000_000 - self._audio_offset_ns)
+
+    def _on_cue_fired(self, token: str, cue: str, intended_ns, fired_ns):
+        if token == self._audio_token and self.timing is not None:
+            off = self._audio_offset_ns
+            self.timing.record(cue, (intended_ns + off) / 1e6, (fired_ns + off) / 1e6)
+
+    def _on_cue_started(self, token: str, cue: str, intended_ns, started_ns):
+        # độ trễ tới lúc backend báo đang phát (ra loa) so với mốc đồng hồ
+        if token == self._audio_token and self.timing is not None:
+            off = self._audio_offset_ns
+            self.timing.record(cue + "_out", (intended_ns + off) / 1e6, (started_ns + off) / 1e6)
+
+    def enable_timing_probe(self) -> TimingProbe:
+        if self.timing is None:
+            self.timing = TimingProbe()
+        return self.timing
+
+    def _probe_now_ms(self) -> float:
+        return self.elapsed.nsecsElapsed() / 1_000_000.0
+
+    def _play_cue(self, kind: str, intended_ms: int):
+        # đã hẹn trên thread audio thì thread đó tự phát đúng mốc
+        if self._cue_deadlines.pop(kind, None) == intended_ms:
+            return
+        self.audio.play(kind, self._audio_token, intended_ms * 1_000_000 - self._audio_offset_ns)
+
     def _tick(self):
         if self.abs_winner is not None:
             return
@@ -594,128 +2459,890 @@ class MatchController(QObject):
             now = self.elapsed.elapsed()
             remaining_ms = max(0, self.end_epoch_ms - now)
 
-            if 0 < remaining_ms <= 4000 and (not self.played3) and self.sound3:
-                self.sound3.stop()
-                self.sound3.play()
+            if 0 < remaining_ms <= 4000 and (not self.played3) and self._has_cue("cue_3s"):
+                self._play_cue("cue_3s", self.end_epoch_ms - 4000)
                 self.played3 = True
 
             sec_disp = remaining_ms // 1000
             if int(sec_disp) != int(self.seconds):
                 self.seconds = int(sec_disp)
                 self.timeTextChanged.emit(self._fmt(self.seconds))
+                if self.timing is not None:
+                    # giây s lên màn hình đúng lúc remaining vừa < (s + 1) * 1000
+                    self.timing.record(
+                        "second", self.end_epoch_ms - (self.seconds + 1) * 1000, self._probe_now_ms()
+                    )
 
             if remaining_ms <= 0:
-                if (not self.playedEnd) and self.soundEnd:
-                    self.soundEnd.stop()
-                    self.soundEnd.play()
+                if (not self.playedEnd) and self._has_cue("cue_end"):
+                    self._play_cue("cue_end", self.end_epoch_ms)
                     self.playedEnd = True
 
                 self.running = False
                 self.paused = False
                 self.seconds = 0
+                self.remaining_ms = 0
                 self.end_epoch_ms = None
+                self.state_version += 1
+                if self.journal is not None:
+                    self.journal.append(MatchJournal.OP_END)
                 self.timeTextChanged.emit(self._fmt(self.seconds))
                 self.stateChanged.emit(self.running, self.paused)
+                return
 
+            self._arm_next(int(remaining_ms))
 
-# ================== Display window (fullscreen) ==================
-class DisplayWindow(QWidget):
-    BG = "#CFE8FF"
 
-    def __init__(self, c: MatchController):
-        super().__init__()
-        self.c = c
-        self.setWindowTitle("DISPLAY")
-        self.setStyleSheet(f"QWidget{{ background:{self.BG}; }} QLabel{{ color:#111; }}")
+# ================== Virtual time / simulation ==================
+class VirtualClock:
+    """Đồng hồ ảo cùng giao diện QElapsedTimer (elapsed / nsecsElapsed); chỉ trôi khi set_ms / advance."""
 
-        self.fullTeam1 = c.team1
-        self.fullTeam2 = c.team2
+    __slots__ = ("ns",)
 
-        root = QVBoxLayout(self)
-        root.setContentsMargins(24, 18, 24, 24)
-        root.setSpacing(16)
+    def __init__(self, start_ms: int = 0):
+        self.ns = int(start_ms) * 1_000_000
 
-        self.scoreRowWidget = QWidget()
-        row = QHBoxLayout(self.scoreRowWidget)
-        row.setContentsMargins(0, 0, 0, 0)
-        row.setSpacing(0)
+    def elapsed(self) -> int:
+        return self.ns // 1_000_000
 
-        # LEFT
-        self.leftWrap = QWidget()
-        l = QVBoxLayout(self.leftWrap)
-        l.setContentsMargins(0, 0, 0, 0)
-        l.setSpacing(10)
-        l.setAlignment(Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignVCenter)
+    def nsecsElapsed(self) -> int:
+        return self.ns
 
-        self.card1 = QFrame()
-        c1 = QVBoxLayout(self.card1)
-        c1.setContentsMargins(0, 0, 0, 0)
-        c1.setAlignment(Qt.AlignmentFlag.AlignCenter)
+    def set_ms(self, t_ms: int):
+        # không lùi
+        ns = int(t_ms) * 1_000_000
+        if ns > self.ns:
+            self.ns = ns
 
-        self.lblScore1 = QLabel("0")
-        self.lblScore1.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.lblScore1.setStyleSheet("color:white; font-weight:1000;")
-        c1.addWidget(self.lblScore1)
+    def advance(self, ms: int):
+        self.ns += max(0, int(ms)) * 1_000_000
 
-        self.lblTeam1 = QLabel(self.fullTeam1)
-        self.lblTeam1.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.lblTeam1.setStyleSheet("color:#111; font-weight:1000;")
-        self.lblTeam1.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
 
-        l.addWidget(self.card1, 0, Qt.AlignmentFlag.AlignHCenter)
-        l.addWidget(self.lblTeam1, 0, Qt.AlignmentFlag.AlignHCenter)
+class SimScheduler(TickScheduler):
+    """TickScheduler trên VirtualClock: không QTimer thật, run_until() nhảy thẳng tới từng mốc."""
 
-        # RIGHT
-        self.rightWrap = QWidget()
-        r = QVBoxLayout(self.rightWrap)
-        r.setContentsMargins(0, 0, 0, 0)
-        r.setSpacing(10)
-        r.setAlignment(Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignVCenter)
+    def __init__(self, clock: VirtualClock | None = None, parent=None):
+        super().__init__(parent, clock if clock is not None else VirtualClock())
 
-        self.card2 = QFrame()
-        c2 = QVBoxLayout(self.card2)
-        c2.setContentsMargins(0, 0, 0, 0)
-        c2.setAlignment(Qt.AlignmentFlag.AlignCenter)
+    def _wait(self, ms: int | None):
+        pass  # thời gian chỉ trôi trong run_until
 
-        self.lblScore2 = QLabel("0")
-        self.lblScore2.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.lblScore2.setStyleSheet("color:white; font-weight:1000;")
-        c2.addWidget(self.lblScore2)
+    def run_until(self, t_ms: int | None = None) -> int:
+        """Gọi lần lượt mọi mốc <= t_ms (None = tới khi hết mốc); trả về số lần thức dậy."""
+        steps = 0
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or (t_ms is not None and deadline > t_ms):
+                break
+            self.clock.set_ms(deadline)
+            self._fire()
+            steps += 1
+        if t_ms is not None:
+            self.clock.set_ms(t_ms)
+        return steps
 
-        self.lblTeam2 = QLabel(self.fullTeam2)
-        self.lblTeam2.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.lblTeam2.setStyleSheet("color:#111; font-weight:1000;")
-        self.lblTeam2.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
 
-        r.addWidget(self.card2, 0, Qt.AlignmentFlag.AlignHCenter)
-        r.addWidget(self.lblTeam2, 0, Qt.AlignmentFlag.AlignHCenter)
+class SimCueAudio(QObject):
+    """
+    Thay CueAudioEngine khi mô phỏng: cue được "phát" đúng mốc trên SimScheduler,
+    ghi lại fired = [(token, cue, intended_ms, fired_ms)].
+    """
 
-        row.addWidget(self.leftWrap, 1)
-        row.addWidget(self.rightWrap, 1)
-        root.addWidget(self.scoreRowWidget, 0)
+    cueFired = pyqtSignal(str, str, object, object)    # token, cue, intended_ns, fired_ns
+    cueStarted = pyqtSignal(str, str, object, object)  # token, cue, intended_ns, started_ns
 
-        # BIG TIMER
-        self.timerLabel = QLabel("00:00")
-        self.timerLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.timerLabel.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-        self.timerLabel.setStyleSheet("color:#111; font-weight:1000;")
-        root.addWidget(self.timerLabel, 1)
+    def __init__(self, scheduler: SimScheduler, cues=("cue_3s", "cue_end"), parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler
+        self.cues = frozenset(cues)
+        self.fired: list[tuple[str, str, float, float]] = []
+        self._pending: dict[tuple[str, str], int] = {}
+
+    def now_ns(self) -> int:
+        return self.scheduler.clock.nsecsElapsed()
+
+    def has(self, cue: str) -> bool:
+        return cue in self.cues
+
+    def play(self, cue: str, token: str = "", intended_ns: int | None = None):
+        self._emit(token, cue, self.now_ns() if intended_ns is None else int(intended_ns))
+
+    def schedule(self, token: str, cue: str, deadline_ns: int):
+        key = (token, cue)
+        self._pending[key] = int(deadline_ns)
+        self.scheduler.arm(key, -(-int(deadline_ns) // 1_000_000), lambda: self._due(key))
+
+    def cancel(self, token: str):
+        for key in [k for k in self._pending if k[0] == token]:
+            del self._pending[key]
+            self.scheduler.cancel(key)
+
+    def _due(self, key: tuple[str, str]):
+        deadline_ns = self._pending.pop(key, None)
+        if deadline_ns is not None:
+            self._emit(key[0], key[1], deadline_ns)
+
+    def _emit(self, token: str, cue: str, intended_ns: int):
+        now = self.now_ns()
+        self.fired.append((token, cue, intended_ns / 1e6, now / 1e6))
+        self.cueFired.emit(token, cue, intended_ns, now)
+        self.cueStarted.emit(token, cue, intended_ns, now)
+
+
+class MatchSimulator:
+    """
+    Chạy 1 trận trên thời gian ảo, headless: cùng MatchController / _tick / cue như
+    lúc thật, nhưng đồng hồ nhảy thẳng tới từng mốc nên trận 3:30 chỉ tốn vài ms.
+    script: các (t_ms, tên method của controller, args), VD (0, "start", ()),
+    (30_000, "force_pause", ()), (41_500, "set_count", (1, "gold", 2, 1)).
+    fast=True: bỏ ~210 tick đổi giây, chỉ chạy thao tác trong script + mốc cue / hết giờ
+    (không ghi được `shown`).
+    """
+
+    def __init__(self, seconds: int = 3 * 60 + 30, rules: Ruleset | None = None,
+                 cues: bool = True, record: bool = True, fast: bool = False):
+        self.clock = VirtualClock()
+        self.scheduler = SimScheduler(self.clock)
+        self.audio = SimCueAudio(self.scheduler) if cues else None
+        self.c = MatchController(scheduler=self.scheduler, rules=rules)
+        self.c.second_ticks = not fast
+        if self.audio is not None:
+            self.c.load_sounds(self.audio)
+        self.c.set_time_seconds(seconds)
+        # (t_ms, "mm:ss") mỗi lần đồng hồ hiển thị đổi
+        self.shown: list[tuple[int, str]] = []
+        self.end_ms: int | None = None
+        if record and not fast:
+            self.c.timeTextChanged.connect(self._on_time)
+        self.c.stateChanged.connect(self._on_state)
+
+    def _on_time(self, text: str):
+        self.shown.append((self.clock.elapsed(), text))
+
+    def _on_state(self, running: bool, paused: bool):
+        if not running and self.end_ms is None and self.c.abs_winner is None and self.c.remaining_now_ms() == 0:
+            self.end_ms = self.clock.elapsed()
+
+    def run(self, script=(), until_ms: int | None = None) -> dict:
+        c = self.c
+        for t_ms, action, args in script:
+            # owner riêng cho mỗi thao tác; cùng ms thì chạy theo thứ tự trong script
+            self.scheduler.arm(object(), int(t_ms), lambda a=action, x=tuple(args): getattr(c, a)(*x))
+        self.scheduler.run_until(until_ms)
+        return self.result()
+
+    def result(self) -> dict:
+        return {
+            "end_ms": self.end_ms,
+            "now_ms": self.clock.elapsed(),
+            "remaining_ms": self.c.remaining_now_ms(),
+            "running": self.c.running,
+            "paused": self.c.paused,
+            "abs_winner": self.c.abs_winner,
+            "scores": self.c.get_display_scores(),
+            "shown": len(self.shown),
+            "cues": [(cue, intended, fired) for _tok, cue, intended, fired in
+                     (self.audio.fired if self.audio is not None else ())],
+        }
 
-        root.setStretch(0, 4)
-        root.setStretch(1, 10)
+    @staticmethod
+    def random_script(rnd, seconds: int = 3 * 60 + 30, events: int = 20,
+                      rules: Ruleset | None = None) -> list[tuple[int, str, tuple]]:
+        """Kịch bản ngẫu nhiên: start lúc 0, rải nhập kho báu + các cặp pause / resume."""
+        rules = rules if rules is not None else Ruleset.default()
+        span = seconds * 1000
+        script: list[tuple[int, str, tuple]] = [(0, "start", ())]
+        for _ in range(events):
+            t = rnd.randint(0, span)
+            if rnd.random() < 0.2:
+                script.append((t, "force_pause", ()))
+                script.append((t + rnd.randint(0, 15_000), "resume", ()))
+            else:
+                args = (rnd.choice((1, 2)), rnd.choice(rules.types), rnd.choice(rules.khos), rnd.randint(0, 3))
+                script.append((t, "set_count", args))
+        script.sort(key=lambda e: e[0])
+        return script
+
+
+# ================== Font fit cache ==================
+class FontFitCache:
+    """
+    LRU cache cho font đồng hồ lớn:
+    (rect w, rect h, family, weight, lớp độ rộng glyph) -> QFont đã fit sẵn.
+    """
+
+    def __init__(self, capacity: int = 64, scale: float = 0.90):
+        self.capacity = max(1, int(capacity))
+        self.scale = float(scale)
+        self._fonts: OrderedDict[tuple, QFont] = OrderedDict()
+        self._widest: dict[tuple, str] = {}
+        self.hits = 0
+        self.misses = 0
 
-        self.c.scoreboardChanged.connect(self.onScoreboard)
-        self.c.timeTextChanged.connect(self.onTimeText)
-        self.c.teamColorChanged.connect(self.onTeamColorChanged)
+    @staticmethod
+    def glyph_class(text: str) -> str:
+        # mọi chữ số chung 1 lớp: "03:29" và "01:00" đều là "00:00"
+        return "".join("0" if ch.isdigit() else ch for ch in (text or ""))
+
+    def widest_digit(self, family: str, weight) -> str:
+        key = (family, weight)
+        d = self._widest.get(key)
+        if d is None:
+            fm = QFontMetrics(QFont(family, 100, weight))
+            d = max("0123456789", key=fm.horizontalAdvance)
+            self._widest[key] = d
+        return d
+
+    def fit(self, avail_w: int, avail_h: int, family: str, weight, text: str) -> QFont:
+        cls = self.glyph_class(text or "00:00")
+        key = (int(avail_w), int(avail_h), family, weight, cls)
+        font = self._fonts.get(key)
+        if font is not None:
+            self.hits += 1
+            self._fonts.move_to_end(key)
+            return font
+
+        self.misses += 1
+        # fit theo layout rộng nhất của lớp này (VD "88:88") để mọi giây đều vừa
+        sample = cls.replace("0", self.widest_digit(family, weight))
+        lo, hi = 10, max(12, int(avail_h))
+        best = lo
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            fm = QFontMetrics(QFont(family, int(mid), weight))
+            if fm.horizontalAdvance(sample) <= avail_w and fm.height() <= avail_h:
+                best = mid
+                lo = mid + 1
+            else:
+                hi = mid - 1
+
+        font = QFont(family, max(10, int(best * self.scale)), weight)
+        self._fonts[key] = font
+        if len(self._fonts) > self.capacity:
+            self._fonts.popitem(last=False)
+        return font
+
+    def clear(self):
+        self._fonts.clear()
+        self._widest.clear()
+
+
+# ================== Digit glyph atlas ==================
+class GlyphAtlas:
+    """
+    Pixmap dựng sẵn cho '0-9' và ':' ở 1 font / màu / DPR.
+    Mọi chữ số chung 1 độ rộng slot (chữ số rộng nhất) nên giây đổi không làm chữ xô ngang.
+    """
+
+    CHARS = "0123456789:"
+
+    def __init__(self, font: QFont, color: str, dpr: float = 1.0):
+        self.font = QFont(font)
+        self.color = QColor(color)
+        self.dpr = float(dpr) or 1.0
+        fm = QFontMetrics(self.font)
+        self.slot_w = max(fm.horizontalAdvance(d) for d in "0123456789")
+        self.height = fm.height()
+        self._fm = fm
+        self._glyphs: dict[str, QPixmap] = {}
+        for ch in self.CHARS:
+            self.glyph(ch)
+
+    def advance(self, ch: str) -> int:
+        if ch.isdigit():
+            return self.slot_w
+        return self._fm.horizontalAdvance(ch)
+
+    def text_width(self, text: str) -> int:
+        return sum(self.advance(ch) for ch in text)
+
+    def origin(self, text: str, rect: QRect) -> tuple[int, int]:
+        """Góc trên-trái để text nằm giữa rect."""
+        return (
+            rect.x() + (rect.width() - self.text_width(text)) // 2,
+            rect.y() + (rect.height() - self.height) // 2,
+        )
+
+    def dirty_rect(self, old: str, new: str, rect: QRect) -> QRect:
+        """Vùng cần vẽ lại khi đổi old -> new; cùng bố cục slot thì chỉ gồm các slot đổi chữ."""
+        if len(old) != len(new) or FontFitCache.glyph_class(old) != FontFitCache.glyph_class(new):
+            return QRect(rect)
+        x, y = self.origin(new, rect)
+        dirty = QRect()
+        for a_ch, b_ch in zip(old, new):
+            w = self.advance(b_ch)
+            if a_ch != b_ch:
+                dirty = dirty.united(QRect(x, y, w, self.height))
+            x += w
+        return dirty
+
+    def draw(self, p: QPainter, text: str, rect: QRect, clip: QRect) -> int:
+        """Blit text vào giữa rect (bỏ qua slot nằm ngoài clip); trả về số lần blit."""
+        x, y = self.origin(text, rect)
+        blits = 0
+        for ch in text:
+            w = self.advance(ch)
+            if clip.intersects(QRect(x, y, w, self.height)):
+                p.drawPixmap(x, y, self.glyph(ch))
+                blits += 1
+            x += w
+        return blits
+
+    def glyph(self, ch: str) -> QPixmap:
+        pm = self._glyphs.get(ch)
+        if pm is None:
+            # ký tự ngoài bộ dựng sẵn (hiếm) thì dựng thêm khi gặp lần đầu
+            w = max(1, self.advance(ch))
+            pm = QPixmap(max(1, math.ceil(w * self.dpr)), max(1, math.ceil(self.height * self.dpr)))
+            pm.setDevicePixelRatio(self.dpr)
+            pm.fill(Qt.GlobalColor.transparent)
+            p = QPainter(pm)
+            p.setRenderHint(QPainter.RenderHint.TextAntialiasing, True)
+            p.setFont(self.font)
+            p.setPen(self.color)
+            p.drawText(QRectF(0, 0, w, self.height), int(Qt.AlignmentFlag.AlignCenter), ch)
+            p.end()
+            self._glyphs[ch] = pm
+        return pm
+
+
+class GlyphAtlasCache:
+    """LRU (family, pt, weight, màu, DPR) -> GlyphAtlas; chỉ dựng lại khi đổi kích thước / màn hình."""
+
+    def __init__(self, capacity: int = 8):
+        self.capacity = max(1, int(capacity))
+        self._atlases: OrderedDict[tuple, GlyphAtlas] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, font: QFont, color: str, dpr: float) -> GlyphAtlas:
+        key = (font.family(), font.pointSize(), font.weight(), str(color), round(float(dpr), 3))
+        atlas = self._atlases.get(key)
+        if atlas is not None:
+            self.hits += 1
+            self._atlases.move_to_end(key)
+            return atlas
+        self.misses += 1
+        atlas = GlyphAtlas(font, color, dpr)
+        self._atlases[key] = atlas
+        if len(self._atlases) > self.capacity:
+            self._atlases.popitem(last=False)
+        return atlas
+
+    def stats(self) -> dict:
+        return {"atlases": len(self._atlases), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        self._atlases.clear()
+
+
+class AtlasTimerWidget(QWidget):
+    """Đồng hồ lớn vẽ bằng cách blit glyph từ GlyphAtlas vào các slot cố định."""
+
+    def __init__(self, text: str = "00:00", parent=None):
+        super().__init__(parent)
+        self._text = text
+        self._atlas: GlyphAtlas | None = None
+        self.blits = 0
+
+    def text(self) -> str:
+        return self._text
+
+    def atlas(self) -> GlyphAtlas | None:
+        return self._atlas
+
+    def setAtlas(self, atlas: GlyphAtlas | None):
+        if atlas is self._atlas:
+            return
+        self._atlas = atlas
+        self.update()
+
+    def minimumSizeHint(self) -> QSize:
+        # không để kích thước font đẩy ngược layout (font được fit theo rect)
+        return QSize(10, 10)
+
+    def setText(self, text: str):
+        if text == self._text:
+            return
+        old = self._text
+        self._text = text
+        if self._atlas is None:
+            self.update()
+            return
+        # cùng bố cục slot: chỉ vẽ lại các slot đổi chữ
+        dirty = self._atlas.dirty_rect(old, text, self.contentsRect())
+        if not dirty.isNull():
+            self.update(dirty)
+
+    def paintEvent(self, event):
+        if self._atlas is None or not self._text:
+            return
+        p = QPainter(self)
+        self.blits += self._atlas.draw(p, self._text, self.contentsRect(), event.rect())
+        p.end()
+
+
+# ================== Render scheduler (dirty flags) ==================
+class RenderScheduler(QObject):
+    """
+    Gom mọi yêu cầu vẽ lại thành tối đa 1 pass / FRAME_MS.
+    Mỗi yêu cầu chỉ OR thêm dirty bit; pass kế tiếp nhận toàn bộ bit đã gom.
+    """
+
+    def __init__(self, render_cb, frame_ms: int = 16, parent=None):
+        super().__init__(parent)
+        self._render_cb = render_cb
+        self.frame_ms = max(0, int(frame_ms))
+        self._dirty = 0
+        self._last_ms: int | None = None
+
+        self._clock = QElapsedTimer()
+        self._clock.start()
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self.flush)
+
+        self.requested = 0
+        self.ran = 0
+        self.requested_bits: dict[int, int] = {}
+        self.ran_bits: dict[int, int] = {}
+
+    def request(self, bits: int):
+        bits = int(bits)
+        self.requested += 1
+        self.requested_bits[bits] = self.requested_bits.get(bits, 0) + 1
+        self._dirty |= bits
+        if self._timer.isActive():
+            return
+        wait = 0
+        if self._last_ms is not None:
+            wait = max(0, self.frame_ms - (self._clock.elapsed() - self._last_ms))
+        self._timer.start(wait)
+
+    def flush(self):
+        self._timer.stop()
+        bits = self._dirty
+        if not bits:
+            return
+        self._dirty = 0
+        self._last_ms = self._clock.elapsed()
+        self.ran += 1
+        self.ran_bits[bits] = self.ran_bits.get(bits, 0) + 1
+        self._render_cb(bits)
+
+    def stats(self) -> dict:
+        return {
+            "frame_ms": self.frame_ms,
+            "requested": self.requested,
+            "ran": self.ran,
+            "coalesced": self.requested - self.ran,
+            "requested_bits": dict(self.requested_bits),
+            "ran_bits": dict(self.ran_bits),
+        }
+
+    def reset_stats(self):
+        self.requested = 0
+        self.ran = 0
+        self.requested_bits.clear()
+        self.ran_bits.clear()
+
+
+# ================== Shared display resources ==================
+class DisplayGeometry:
+    """
+    Layout của màn hình Display cho 1 (w, h, bố cục): kích thước thẻ điểm, font,
+    rect tên đội / đồng hồ. Tính 1 lần, dùng chung cho cả 2 renderer và mọi cửa sổ cùng cỡ.
+    """
+
+    MARGINS = (24, 18, 24, 24)  # trái, trên, phải, dưới
+    SPACING = 16
+    RADIUS = 22
+
+    def __init__(self, w: int, h: int, layout: str, family: str):
+        self.size = (w, h)
+        self.layout = layout
+        self.show_scores = layout != "timer"
+        self.show_timer = layout != "scores"
+
+        ml, mt, mr, mb = self.MARGINS
+        if layout == "scores":
+            # chỉ bảng điểm (VD màn hình giám khảo): thẻ to, nằm giữa màn hình
+            self.card_w = max(260, int(w * 0.40))
+            self.card_h = max(150, int(h * 0.50))
+            self.team_pt = max(28, int(h * 0.08))
+        else:
+            self.card_w = max(260, int(w * 0.26))
+            self.card_h = max(150, int(h * 0.20))
+            self.team_pt = max(28, int(h * 0.055))
+        self.score_pt = max(52, int(self.card_h * 0.52))
+        self.team_h = max(44, int(self.team_pt * 1.75))
+        self.row_h = self.card_h + self.team_h + 22 if self.show_scores else 0
+
+        self.score_font = QFont(family, self.score_pt, QFont.Weight.Bold)
+        self.name_font = QFont(family, self.team_pt, QFont.Weight.Bold)
+
+        inner_w = max(1, w - ml - mr)
+        half = inner_w // 2
+        content_h = self.card_h + 10 + self.team_h
+        if layout == "scores":
+            top = mt + (h - mt - mb - content_h) // 2
+        else:
+            top = mt + (self.row_h - content_h) // 2
+        self.card_rects = [QRect(), QRect()]
+        self.card_paths = [QPainterPath(), QPainterPath()]
+        self.name_rects = [QRect(), QRect()]
+        if self.show_scores:
+            for i in (0, 1):
+                x0 = ml + i * half
+                card = QRect(x0 + (half - self.card_w) // 2, top, self.card_w, self.card_h)
+                self.card_rects[i] = card
+                self.card_paths[i].addRoundedRect(QRectF(card), self.RADIUS, self.RADIUS)
+                self.name_rects[i] = QRect(x0, top + self.card_h + 10, half, self.team_h)
+
+        self.timer_rect = QRect()
+        if self.show_timer:
+            ty = mt + (self.row_h + self.SPACING if self.show_scores else 0)
+            self.timer_rect = QRect(ml, ty, inner_w, max(10, h - ty - mb))
+
+
+class DisplayShared:
+    """
+    Tài nguyên vẽ dùng chung giữa các DisplayWindow (máy chiếu, LED, màn giám khảo):
+    font đã fit, atlas chữ số, DisplayGeometry và tên đội đã elide.
+    Thêm 1 màn hình cùng cỡ chỉ tốn thêm phần blit / paint của chính nó.
+    """
+
+    def __init__(self, capacity: int = 16):
+        self.capacity = max(1, int(capacity))
+        self.fit_cache = FontFitCache()
+        self.atlas_cache = GlyphAtlasCache(capacity=self.capacity)
+        self._geoms: OrderedDict[tuple, DisplayGeometry] = OrderedDict()
+        self._elided: OrderedDict[tuple, str] = OrderedDict()
+        self.geom_hits = 0
+        self.geom_misses = 0
+
+    def geometry(self, w: int, h: int, layout: str, family: str) -> DisplayGeometry:
+        key = (int(w), int(h), layout, family)
+        g = self._geoms.get(key)
+        if g is not None:
+            self.geom_hits += 1
+            self._geoms.move_to_end(key)
+            return g
+        self.geom_misses += 1
+        g = DisplayGeometry(int(w), int(h), layout, family)
+        self._geoms[key] = g
+        if len(self._geoms) > self.capacity:
+            self._geoms.popitem(last=False)
+        return g
+
+    def elide(self, text: str, font: QFont, width: int) -> str:
+        key = (text, font.family(), font.pointSize(), font.weight(), int(width))
+        out = self._elided.get(key)
+        if out is None:
+            out = QFontMetrics(font).elidedText(text, Qt.TextElideMode.ElideRight, int(width))
+            self._elided[key] = out
+            if len(self._elided) > self.capacity * 4:
+                self._elided.popitem(last=False)
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "fit": {"hits": self.fit_cache.hits, "misses": self.fit_cache.misses},
+            "atlas": self.atlas_cache.stats(),
+            "geometry": {"hits": self.geom_hits, "misses": self.geom_misses},
+        }
+
+
+# ================== Painted display surface ==================
+class PaintedDisplaySurface(QWidget):
+    """
+    Renderer thay thế cho cây QFrame/QLabel của DisplayWindow: 1 widget duy nhất
+    vẽ thẻ điểm, tên đội và đồng hồ bằng QPainter. Brush / font / path dựng sẵn
+    theo kích thước; mỗi thay đổi chỉ update() đúng hình chữ nhật của nó.
+    """
+
+    def __init__(self, display: "DisplayWindow"):
+        super().__init__(display)
+        self.d = display
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent, True)
+
+        self._bg = QBrush(QColor(display.BG))
+        self._name_pen = QPen(QColor("#111"))
+        self._score_pen = QPen(QColor("white"))
+        self._card_brushes = [QBrush(QColor(display.BG)), QBrush(QColor(display.BG))]
+        self._colors = ("", "")
+
+        self._scores = ("0", "0")
+        self._names = ("", "")
+        self._elided = ["", ""]
+        self._time = "00:00"
+
+        self._geom_key: tuple | None = None
+        self._g: DisplayGeometry | None = None
+        self._atlas: GlyphAtlas | None = None
+        self._atlas_class = ""
+
+        self.paints = 0
+        self.paint_ns = 0
+        self.blits = 0
+
+    # -------- geometry --------
+    def relayout(self, force: bool = False):
+        w = max(1, self.width())
+        h = max(1, self.height())
+        key = (w, h, self.devicePixelRatioF(), self.d.layout_name)
+        if key == self._geom_key and not force:
+            return
+        self._geom_key = key
+        # cửa sổ khác cùng cỡ + cùng bố cục đã tính rồi thì chỉ là 1 lần tra dict
+        self._g = self.d.shared.geometry(w, h, self.d.layout_name, self.d.FONT_FAMILY)
+        self._elide_names()
+        self._fit_timer()
+        self.update()
+
+    def _fit_timer(self):
+        r = self._g.timer_rect
+        if not self._g.show_timer:
+            self._atlas = None
+            return
+        font = self.d._fit_cache.fit(
+            max(10, r.width()), max(10, r.height()), self.d.FONT_FAMILY, QFont.Weight.Bold, self._time
+        )
+        self._atlas = self.d._atlas_cache.get(font, self.d.TIMER_COLOR, self.devicePixelRatioF())
+        self._atlas_class = FontFitCache.glyph_class(self._time)
+
+    def _elide_names(self):
+        for i in (0, 1):
+            self._elided[i] = self.d.shared.elide(
+                self._names[i], self._g.name_font, self._g.name_rects[i].width()
+            )
+
+    # -------- state -> dirty rects --------
+    def set_colors(self, col1: str, col2: str):
+        for i, col in enumerate((col1, col2)):
+            if col != self._colors[i]:
+                self._card_brushes[i] = QBrush(QColor(col))
+                if self._g is not None:
+                    self.update(self._g.card_rects[i])
+        self._colors = (col1, col2)
+
+    def set_scores(self, s1: str, s2: str):
+        for i, sc in enumerate((s1, s2)):
+            if sc != self._scores[i] and self._g is not None:
+                self.update(self._g.card_rects[i])
+        self._scores = (s1, s2)
+
+    def set_names(self, n1: str, n2: str):
+        if (n1, n2) == self._names:
+            return
+        self._names = (n1, n2)
+        if self._g is None:
+            return
+        self._elide_names()
+        for r in self._g.name_rects:
+            self.update(r)
+
+    def set_time(self, text: str):
+        if text == self._time:
+            return
+        old = self._time
+        self._time = text
+        if self._atlas is None:
+            return
+        if FontFitCache.glyph_class(text) != self._atlas_class:
+            self._fit_timer()
+            self.update(self._g.timer_rect)
+            return
+        dirty = self._atlas.dirty_rect(old, text, self._g.timer_rect)
+        if not dirty.isNull():
+            self.update(dirty)
+
+    # -------- paint --------
+    def paintEvent(self, event):
+        t0 = time.perf_counter_ns()
+        clip = event.rect()
+        g = self._g
+        p = QPainter(self)
+        p.fillRect(clip, self._bg)
+        p.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        center = int(Qt.AlignmentFlag.AlignCenter)
+        for i in ((0, 1) if g is not None and g.show_scores else ()):
+            card = g.card_rects[i]
+            if clip.intersects(card):
+                p.fillPath(g.card_paths[i], self._card_brushes[i])
+                p.setFont(g.score_font)
+                p.setPen(self._score_pen)
+                p.drawText(card, center, self._scores[i])
+            name = g.name_rects[i]
+            if clip.intersects(name):
+                p.setFont(g.name_font)
+                p.setPen(self._name_pen)
+                p.drawText(name, center, self._elided[i])
+        if self._atlas is not None and clip.intersects(g.timer_rect):
+            self.blits += self._atlas.draw(p, self._time, g.timer_rect, clip)
+        p.end()
+        self.paints += 1
+        self.paint_ns += time.perf_counter_ns() - t0
+
+    def stats(self) -> dict:
+        return {
+            "paints": self.paints,
+            "paint_ms_total": round(self.paint_ns / 1e6, 3),
+            "paint_ms_mean": round(self.paint_ns / 1e6 / self.paints, 3) if self.paints else 0.0,
+            "blits": self.blits,
+        }
+
+
+# ================== Display window (fullscreen) ==================
+class DisplayWindow(QWidget):
+    BG = "#CFE8FF"
+    FONT_FAMILY = "Segoe UI"
+    TIMER_COLOR = "#111"
+
+    DIRTY_TIMER = 0x01
+    DIRTY_SCORES = 0x02
+    DIRTY_NAMES = 0x04
+    DIRTY_GEOMETRY = 0x08
+    DIRTY_COLORS = 0x10
+    DIRTY_ALL = 0x1F
+
+    # "widgets": QFrame/QLabel + stylesheet; "painted": PaintedDisplaySurface
+    RENDERERS = ("widgets", "painted")
+    # full: điểm + đồng hồ; timer: chỉ đồng hồ (LED); scores: chỉ bảng điểm (giám khảo)
+    LAYOUTS = ("full", "timer", "scores")
+
+    _shared_default: DisplayShared | None = None
+
+    @classmethod
+    def default_shared(cls) -> DisplayShared:
+        if cls._shared_default is None:
+            cls._shared_default = DisplayShared()
+        return cls._shared_default
+
+    def __init__(
+        self,
+        c: MatchController,
+        renderer: str = "widgets",
+        layout: str = "full",
+        shared: DisplayShared | None = None,
+        app_shortcuts: bool = True,
+    ):
+        super().__init__()
+        self.c = c
+        if layout not in self.LAYOUTS:
+            raise ValueError(f"unknown layout: {layout!r}")
+        self.layout_name = layout
+        self.renderer = "widgets"
+        self.surface: PaintedDisplaySurface | None = None
+        self.standings: "StandingsView | None" = None
+        self.shared = shared if shared is not None else self.default_shared()
+        self._fit_cache = self.shared.fit_cache
+        self._atlas_cache = self.shared.atlas_cache
+        self._geom_key: tuple | None = None
+        self._timer_key: tuple | None = None
+        self._screen_hooked = False
+        self._render = RenderScheduler(self._render_frame, parent=self)
+        self._pending_scores = ("0", "0")
+        self._pending_time = "00:00"
+        self.setWindowTitle("DISPLAY")
+        self.setStyleSheet(f"QWidget{{ background:{self.BG}; }} QLabel{{ color:#111; }}")
+
+        self.fullTeam1 = c.team1
+        self.fullTeam2 = c.team2
+
+        self._stack = QStackedLayout(self)
+        self._stack.setContentsMargins(0, 0, 0, 0)
+        self.widgetsPage = QWidget()
+        self._stack.addWidget(self.widgetsPage)
+
+        root = QVBoxLayout(self.widgetsPage)
+        root.setContentsMargins(24, 18, 24, 24)
+        root.setSpacing(16)
+
+        self.scoreRowWidget = QWidget()
+        row = QHBoxLayout(self.scoreRowWidget)
+        row.setContentsMargins(0, 0, 0, 0)
+        row.setSpacing(0)
+
+        # LEFT
+        self.leftWrap = QWidget()
+        l = QVBoxLayout(self.leftWrap)
+        l.setContentsMargins(0, 0, 0, 0)
+        l.setSpacing(10)
+        l.setAlignment(Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignVCenter)
+
+        self.card1 = QFrame()
+        c1 = QVBoxLayout(self.card1)
+        c1.setContentsMargins(0, 0, 0, 0)
+        c1.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        self.lblScore1 = QLabel("0")
+        self.lblScore1.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.lblScore1.setStyleSheet("color:white; font-weight:1000;")
+        c1.addWidget(self.lblScore1)
+
+        self.lblTeam1 = QLabel(self.fullTeam1)
+        self.lblTeam1.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.lblTeam1.setStyleSheet("color:#111; font-weight:1000;")
+        self.lblTeam1.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+
+        l.addWidget(self.card1, 0, Qt.AlignmentFlag.AlignHCenter)
+        l.addWidget(self.lblTeam1, 0, Qt.AlignmentFlag.AlignHCenter)
+
+        # RIGHT
+        self.rightWrap = QWidget()
+        r = QVBoxLayout(self.rightWrap)
+        r.setContentsMargins(0, 0, 0, 0)
+        r.setSpacing(10)
+        r.setAlignment(Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignVCenter)
+
+        self.card2 = QFrame()
+        c2 = QVBoxLayout(self.card2)
+        c2.setContentsMargins(0, 0, 0, 0)
+        c2.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        self.lblScore2 = QLabel("0")
+        self.lblScore2.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.lblScore2.setStyleSheet("color:white; font-weight:1000;")
+        c2.addWidget(self.lblScore2)
+
+        self.lblTeam2 = QLabel(self.fullTeam2)
+        self.lblTeam2.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.lblTeam2.setStyleSheet("color:#111; font-weight:1000;")
+        self.lblTeam2.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
 
-        self._apply_team_colors()
+        r.addWidget(self.card2, 0, Qt.AlignmentFlag.AlignHCenter)
+        r.addWidget(self.lblTeam2, 0, Qt.AlignmentFlag.AlignHCenter)
+
+        row.addWidget(self.leftWrap, 1)
+        row.addWidget(self.rightWrap, 1)
+        root.addWidget(self.scoreRowWidget, 0)
+
+        # BIG TIMER
+        self.timerLabel = AtlasTimerWidget("00:00")
+        self.timerLabel.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        root.addWidget(self.timerLabel, 1)
+
+        root.setStretch(0, 4)
+        root.setStretch(1, 10)
+
+        self.c.scoreboardChanged.connect(self.onScoreboard)
+        self.c.timeTextChanged.connect(self.onTimeText)
+        self.c.teamColorChanged.connect(self.onTeamColorChanged)
 
         s1, s2 = self.c.get_display_scores()
         self.onScoreboard(self.c.team1, s1, self.c.team2, s2)
         self.onTimeText(self.c._fmt(self.c.seconds))
+        self._apply_layout_visibility()
+        if renderer != "widgets":
+            self.set_renderer(renderer)
+        else:
+            self._fit_layout()
 
-        QTimer.singleShot(0, self._fit_layout)
-
+        # display chính nhận Esc/F/Q từ mọi cửa sổ; display phụ chỉ khi đang focus
+        ctx = Qt.ShortcutContext.ApplicationShortcut if app_shortcuts else Qt.ShortcutContext.WindowShortcut
         for seq, slot in [
             ("Esc", self.close),
             ("F11", self.showFullScreen),
@@ -723,7 +3350,69 @@ class DisplayWindow(QWidget):
             ("Q", self.close),
         ]:
             sc = QShortcut(QKeySequence(seq), self, slot)
-            sc.setContext(Qt.ShortcutContext.ApplicationShortcut)
+            sc.setContext(ctx)
+        for seq, slot in [
+            ("Ctrl+Shift+R", self.toggle_renderer),
+            ("Ctrl+Shift+L", self.cycle_layout),
+        ]:
+            sc = QShortcut(QKeySequence(seq), self, slot)
+            sc.setContext(Qt.ShortcutContext.WindowShortcut)
+
+    def set_renderer(self, renderer: str):
+        if renderer not in self.RENDERERS:
+            raise ValueError(f"unknown renderer: {renderer!r}")
+        self.renderer = renderer
+        if renderer == "painted":
+            if self.surface is None:
+                self.surface = PaintedDisplaySurface(self)
+                self._stack.addWidget(self.surface)
+            self._stack.setCurrentWidget(self.surface)
+        else:
+            self._stack.setCurrentWidget(self.widgetsPage)
+        # renderer vừa hiện chưa nhận các thay đổi trước đó -> dựng lại toàn bộ
+        self._geom_key = None
+        self._timer_key = None
+        self._fit_layout()
+
+    def show_standings(self, tournament: "Tournament", group: str):
+        """Chiếu bảng xếp hạng thay cho bảng điểm / đồng hồ (cùng cửa sổ, cùng màn hình)."""
+        if self.standings is None:
+            self.standings = StandingsView(tournament, group, self)
+            self._stack.addWidget(self.standings)
+        else:
+            self.standings.set_group(group)
+        self._stack.setCurrentWidget(self.standings)
+        self._apply_layout()
+
+    def hide_standings(self):
+        if self.showing_standings():
+            self.set_renderer(self.renderer)
+
+    def showing_standings(self) -> bool:
+        return self.standings is not None and self._stack.currentWidget() is self.standings
+
+    def toggle_renderer(self):
+        i = self.RENDERERS.index(self.renderer)
+        self.set_renderer(self.RENDERERS[(i + 1) % len(self.RENDERERS)])
+
+    def set_layout_mode(self, layout: str):
+        if layout not in self.LAYOUTS:
+            raise ValueError(f"unknown layout: {layout!r}")
+        if layout == self.layout_name:
+            return
+        self.layout_name = layout
+        self._apply_layout_visibility()
+        self._geom_key = None
+        self._timer_key = None
+        self._fit_layout()
+
+    def cycle_layout(self):
+        i = self.LAYOUTS.index(self.layout_name)
+        self.set_layout_mode(self.LAYOUTS[(i + 1) % len(self.LAYOUTS)])
+
+    def _apply_layout_visibility(self):
+        self.scoreRowWidget.setVisible(self.layout_name != "timer")
+        self.timerLabel.setVisible(self.layout_name != "scores")
 
     def _apply_team_colors(self):
         col1 = self.c.get_team_color(1)
@@ -734,8 +3423,7 @@ class DisplayWindow(QWidget):
     def onTeamColorChanged(self, team: int, color_hex: str):
         _ = team
         _ = color_hex
-        self._apply_team_colors()
-        QTimer.singleShot(0, self._fit_layout)
+        self._render.request(self.DIRTY_COLORS)
 
     def show_on_screen(self, screen_index: int | None = None):
         screens = QGuiApplication.screens()
@@ -761,69 +3449,247 @@ class DisplayWindow(QWidget):
         if w < 80:
             label.setText(full_text)
             return
-        fm = QFontMetrics(label.font())
-        label.setText(fm.elidedText(full_text, Qt.TextElideMode.ElideRight, w))
+        label.setText(self.shared.elide(full_text, label.font(), w))
 
     def onScoreboard(self, team1, score1, team2, score2):
-        self.fullTeam1 = team1
-        self.fullTeam2 = team2
-        self.lblScore1.setText(str(score1))
-        self.lblScore2.setText(str(score2))
-        QTimer.singleShot(0, self._fit_layout)
+        bits = self.DIRTY_SCORES
+        if team1 != self.fullTeam1 or team2 != self.fullTeam2:
+            self.fullTeam1 = team1
+            self.fullTeam2 = team2
+            bits |= self.DIRTY_NAMES
+        self._pending_scores = (str(score1), str(score2))
+        self._render.request(bits)
 
     def onTimeText(self, text: str):
-        self.timerLabel.setText(text)
-        QTimer.singleShot(0, self._fit_layout)
+        self._pending_time = text
+        self._render.request(self.DIRTY_TIMER)
 
     def resizeEvent(self, event):
-        QTimer.singleShot(0, self._fit_layout)
+        self._render.request(self.DIRTY_GEOMETRY)
         super().resizeEvent(event)
 
-    def _fit_layout(self):
-        w = max(1, self.width())
-        h = max(1, self.height())
+    def showEvent(self, event):
+        super().showEvent(event)
+        wh = self.windowHandle()
+        if wh is not None and not self._screen_hooked:
+            wh.screenChanged.connect(self._on_screen_changed)
+            self._screen_hooked = True
+
+    def _on_screen_changed(self, _screen):
+        # DPR / kích thước màn hình mới -> fit + atlas dựng lại ở frame kế tiếp
+        self._geom_key = None
+        self._timer_key = None
+        self._render.request(self.DIRTY_GEOMETRY)
+
+    def render_stats(self) -> dict:
+        st = self._render.stats()
+        st["renderer"] = self.renderer
+        st["atlas"] = dict(self._atlas_cache.stats(), blits=self.timerLabel.blits)
+        if self.surface is not None:
+            st["surface"] = self.surface.stats()
+        return st
+
+    def _timer_fit_key(self) -> tuple:
+        rect = self.timerLabel.contentsRect()
+        return (
+            max(10, rect.width()),
+            max(10, rect.height()),
+            FontFitCache.glyph_class(self.timerLabel.text() or "00:00"),
+            self.devicePixelRatioF(),
+        )
+
+    def _layout_geometry(self, w: int, h: int):
+        g = self.shared.geometry(w, h, self.layout_name, self.FONT_FAMILY)
+        self.card1.setFixedSize(g.card_w, g.card_h)
+        self.card2.setFixedSize(g.card_w, g.card_h)
+
+        self.lblScore1.setFont(g.score_font)
+        self.lblScore2.setFont(g.score_font)
+        self.lblTeam1.setFont(g.name_font)
+        self.lblTeam2.setFont(g.name_font)
+
+        self.lblTeam1.setFixedHeight(g.team_h)
+        self.lblTeam2.setFixedHeight(g.team_h)
+        self.scoreRowWidget.setFixedHeight(g.row_h)
+
+    def _fit_timer(self):
+        key = self._timer_fit_key()
+        if key == self._timer_key:
+            return
+        avail_w, avail_h, _cls, dpr = key
+        font = self._fit_cache.fit(
+            avail_w, avail_h, self.FONT_FAMILY, QFont.Weight.Bold, self.timerLabel.text()
+        )
+        self.timerLabel.setAtlas(self._atlas_cache.get(font, self.TIMER_COLOR, dpr))
+        self._timer_key = key
+
+    def _apply_layout(self):
+        # cửa sổ còn ẩn không nhận resize event -> tự đặt geometry trang hiện tại
+        self._stack.setGeometry(self.rect())
+        page = self._stack.currentWidget()
+        if page is not None and page.layout() is not None:
+            page.layout().setGeometry(page.rect())
+
+    def _render_painted(self, bits: int):
+        s = self.surface
+        if bits & self.DIRTY_GEOMETRY:
+            self._apply_layout()
+            s.relayout()
+        if bits & self.DIRTY_COLORS:
+            s.set_colors(self.c.get_team_color(1), self.c.get_team_color(2))
+        if bits & self.DIRTY_SCORES:
+            s.set_scores(*self._pending_scores)
+        if bits & self.DIRTY_NAMES:
+            s.set_names(self.fullTeam1, self.fullTeam2)
+        if bits & self.DIRTY_TIMER:
+            s.set_time(self._pending_time)
+
+    def _render_frame(self, bits: int):
+        if self.renderer == "painted":
+            self._render_painted(bits)
+            return
 
-        card_w = max(260, int(w * 0.26))
-        card_h = max(150, int(h * 0.20))
-        self.card1.setFixedSize(card_w, card_h)
-        self.card2.setFixedSize(card_w, card_h)
+        if bits & self.DIRTY_COLORS:
+            self._apply_team_colors()
 
-        score_pt = max(52, int(card_h * 0.52))
-        team_pt = max(28, int(h * 0.055))
+        if bits & self.DIRTY_SCORES:
+            s1, s2 = self._pending_scores
+            self.lblScore1.setText(s1)
+            self.lblScore2.setText(s2)
 
-        self.lblScore1.setFont(QFont("Segoe UI", score_pt, QFont.Weight.Bold))
-        self.lblScore2.setFont(QFont("Segoe UI", score_pt, QFont.Weight.Bold))
-        self.lblTeam1.setFont(QFont("Segoe UI", team_pt, QFont.Weight.Bold))
-        self.lblTeam2.setFont(QFont("Segoe UI", team_pt, QFont.Weight.Bold))
+        if bits & self.DIRTY_TIMER:
+            self.timerLabel.setText(self._pending_time)
 
-        team_h = max(44, int(team_pt * 1.75))
-        self.lblTeam1.setFixedHeight(team_h)
-        self.lblTeam2.setFixedHeight(team_h)
-        self.scoreRowWidget.setFixedHeight(card_h + team_h + 22)
+        if bits & self.DIRTY_GEOMETRY:
+            w = max(1, self.width())
+            h = max(1, self.height())
+            # font điểm/tên chỉ dựng lại khi đổi kích thước cửa sổ
+            if self._geom_key != (w, h):
+                self._layout_geometry(w, h)
+                self._geom_key = (w, h)
+                # áp layout ngay để rect của timerLabel đúng trước khi fit + dựng atlas
+                self._apply_layout()
 
-        text = self.timerLabel.text() or "00:00"
-        rect = self.timerLabel.contentsRect()
-        avail_w = max(10, rect.width())
-        avail_h = max(10, rect.height())
+        if bits & (self.DIRTY_TIMER | self.DIRTY_GEOMETRY):
+            # tick bình thường: cùng lớp glyph + cùng rect -> font + atlas đã có sẵn
+            self._fit_timer()
 
-        lo, hi = 10, max(12, avail_h)
-        best = lo
-        while lo <= hi:
-            mid = (lo + hi) // 2
-            f = QFont("Segoe UI", int(mid), QFont.Weight.Bold)
-            fm = QFontMetrics(f)
-            if fm.horizontalAdvance(text) <= avail_w and fm.height() <= avail_h:
-                best = mid
-                lo = mid + 1
-            else:
-                hi = mid - 1
+        if bits & (self.DIRTY_NAMES | self.DIRTY_GEOMETRY):
+            # mỗi label đã “tách riêng” nên elide theo từng đội độc lập
+            self._elide_name(self.lblTeam1, self.fullTeam1)
+            self._elide_name(self.lblTeam2, self.fullTeam2)
 
-        best = int(best * 0.90)
-        self.timerLabel.setFont(QFont("Segoe UI", max(10, best), QFont.Weight.Bold))
+    def _fit_layout(self):
+        # pass đầy đủ, chạy ngay (không qua scheduler)
+        self._render.request(self.DIRTY_ALL)
+        self._render.flush()
+
+
+# ================== Theme cache ==================
+class ThemeCache:
+    """
+    Stylesheet của control panel dựng 1 lần cho mỗi (loại, màu) rồi dùng lại.
+    Phần phụ thuộc màu đội (viền panel, nền header) được vẽ bằng QPainter từ
+    QColor cache, nên đổi màu chỉ là repaint, không parse lại stylesheet của cả cây widget.
+    """
+
+    TEMPLATES = {
+        # viền trong suốt: TeamPanel tự vẽ viền theo màu đội
+        "panel": """
+            QGroupBox {
+                font-weight:900;
+                color:#111;
+                border:2px solid transparent;
+                border-radius:14px;
+                margin-top:10px;
+                background:#ffffff;
+            }
+            QGroupBox::title {
+                subcontrol-origin: margin;
+                left:12px;
+                padding:0 6px;
+            }
+            QLineEdit {
+                background:white;
+                color:#111;
+                border:1px solid #c7c7c7;
+                border-radius:10px;
+                padding:6px 10px;
+                min-height:32px;
+            }
+            QLabel { color:#111; }
+        """,
+        # nền do TeamHeaderLabel tự vẽ
+        "header": """
+            QLabel{
+                background:transparent;
+                color:white;
+                font-weight:800;
+                border-radius:12px;
+                padding:6px 10px;
+                min-height:34px;
+            }
+        """,
+        "swatch": "background:{color}; color:white; font-weight:900; border-radius:12px;",
+    }
 
-        # mỗi label đã “tách riêng” nên elide theo từng đội độc lập
-        self._elide_name(self.lblTeam1, self.fullTeam1)
-        self._elide_name(self.lblTeam2, self.fullTeam2)
+    def __init__(self):
+        self._sheets: dict[tuple[str, str], str] = {}
+        self._colors: dict[str, QColor] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def sheet(self, kind: str, color: str = "") -> str:
+        key = (kind, str(color))
+        css = self._sheets.get(key)
+        if css is not None:
+            self.hits += 1
+            return css
+        self.misses += 1
+        tpl = self.TEMPLATES[kind]
+        css = tpl.replace("{color}", str(color)) if color else tpl
+        self._sheets[key] = css
+        return css
+
+    def color(self, color: str) -> QColor:
+        qc = self._colors.get(color)
+        if qc is None:
+            qc = QColor(color)
+            self._colors[color] = qc
+        return qc
+
+
+THEMES = ThemeCache()
+
+
+class TeamHeaderLabel(QLabel):
+    """Header khối kho báu: nền bo góc vẽ từ màu đội, text vẫn do QLabel vẽ."""
+
+    RADIUS = 12
+
+    def __init__(self, text: str, color: str):
+        super().__init__(text)
+        self._color = THEMES.color(color)
+        self.setStyleSheet(THEMES.sheet("header"))
+
+    def color(self) -> QColor:
+        return self._color
+
+    def setColor(self, color: str):
+        qc = THEMES.color(color)
+        if qc == self._color:
+            return
+        self._color = qc
+        self.update()
+
+    def paintEvent(self, event):
+        p = QPainter(self)
+        p.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        p.setPen(Qt.PenStyle.NoPen)
+        p.setBrush(self._color)
+        p.drawRoundedRect(QRectF(self.rect()), self.RADIUS, self.RADIUS)
+        p.end()
+        super().paintEvent(event)
 
 
 # ================== Treasure block ==================
@@ -841,16 +3707,17 @@ class TreasureBlock(QWidget):
         root.setContentsMargins(0, 0, 0, 0)
         root.setSpacing(6)
 
-        self.header = QLabel(f"{self.emoji} {self.title}: 0")
+        self.header = TeamHeaderLabel(f"{self.emoji} {self.title}: 0", self._color)
         self.header.setAlignment(Qt.AlignmentFlag.AlignCenter)
         root.addWidget(self.header)
-        self.set_header_color(self._color)
 
         row = QHBoxLayout()
         row.setContentsMargins(4, 2, 4, 6)
         row.setSpacing(10)
 
-        def mk_kho(tag: str):
+        rules = self.c.rules
+
+        def mk_kho(tag: str, cap: int):
             wrap = QWidget()
             wrap.setStyleSheet("background:#f5f7fb; border-radius:12px;")
             v = QVBoxLayout(wrap)
@@ -861,122 +3728,77 @@ class TreasureBlock(QWidget):
             lab.setAlignment(Qt.AlignmentFlag.AlignCenter)
             lab.setStyleSheet("font-weight:900; color:#111;")
 
-            # ✅ UI: mỗi kho tối đa 3 (controller sẽ clamp thêm theo rule tổng kho)
-            ct = CounterControl(0, 0, 3, 1)
+            # ✅ UI: tối đa = sức chứa kho (controller sẽ clamp thêm theo quota loại / tổng kho)
+            ct = CounterControl(0, 0, cap, 1)
             v.addWidget(lab)
             v.addWidget(ct, 0, Qt.AlignmentFlag.AlignCenter)
             return wrap, ct
 
-        w1, self.ct1 = mk_kho("K1")
-        w2, self.ct2 = mk_kho("K2")
-        w3, self.ct3 = mk_kho("K3")
-
-        row.addWidget(w1, 1)
-        row.addWidget(w2, 1)
-        row.addWidget(w3, 1)
+        self.counters: dict[int, CounterControl] = {}
+        for kho, tag, cap in zip(rules.khos, rules.kho_labels, rules.kho_cap):
+            wrap, ct = mk_kho(tag, cap)
+            self.counters[kho] = ct
+            ct.valueChanged.connect(lambda v, kho=kho: self.apply_kho(kho, v))
+            row.addWidget(wrap, 1)
         root.addLayout(row)
 
-        def cap_type_total() -> int:
-            return int(self.c.team_capacity_for_type(self.team, self.ttype))
-
-        def free_in_kho(kho: int) -> int:
-            return int(self.c.kho_free_space_for_type(self.team, kho, self.ttype))
-
-        def update_dynamic_limits(k1: int, k2: int, k3: int):
-            cap = cap_type_total()
-
-            # max theo quota loại
-            m1_by_type = max(0, cap - (k2 + k3))
-            m2_by_type = max(0, cap - (k1 + k3))
-            m3_by_type = max(0, cap - (k1 + k2))
-
-            # max theo quota kho tổng <= 3
-            m1_by_kho = free_in_kho(1)
-            m2_by_kho = free_in_kho(2)
-            m3_by_kho = free_in_kho(3)
-
-            m1 = min(m1_by_type, m1_by_kho, 3)
-            m2 = min(m2_by_type, m2_by_kho, 3)
-            m3 = min(m3_by_type, m3_by_kho, 3)
-
-            self.ct1.setRange(0, m1, clamp_current=True)
-            self.ct2.setRange(0, m2, clamp_current=True)
-            self.ct3.setRange(0, m3, clamp_current=True)
-
-        def sync_from_controller():
-            total, k1, k2, k3 = self.c.get_totals(self.team, self.ttype)
-            self.ct1.setValue(k1, emit_signal=False)
-            self.ct2.setValue(k2, emit_signal=False)
-            self.ct3.setValue(k3, emit_signal=False)
-            update_dynamic_limits(k1, k2, k3)
-
-            max_team = int(self.c.MAX_TREASURES_PER_TEAM.get(self.ttype, 0))
-            self.header.setText(f"{self.emoji} {self.title}: {total}/{max_team}")
-
-        def apply_kho(kho: int, v: int):
-            k1 = self.ct1.value()
-            k2 = self.ct2.value()
-            k3 = self.ct3.value()
-
-            cap = cap_type_total()
-            v = max(0, int(v))
-
-            if kho == 1:
-                other_same_type = k2 + k3
-            elif kho == 2:
-                other_same_type = k1 + k3
-            else:
-                other_same_type = k1 + k2
-
-            allowed_by_type = max(0, cap - other_same_type)
-            allowed_by_kho = free_in_kho(kho)
-            allowed = min(allowed_by_type, allowed_by_kho, 3)
-
-            v2 = min(v, allowed)
-
-            if kho == 1:
-                self.ct1.setValue(v2, emit_signal=False)
-                k1 = v2
-            elif kho == 2:
-                self.ct2.setValue(v2, emit_signal=False)
-                k2 = v2
-            else:
-                self.ct3.setValue(v2, emit_signal=False)
-                k3 = v2
-
-            update_dynamic_limits(k1, k2, k3)
-            self.c.set_count(self.team, self.ttype, kho, v2)
-            sync_from_controller()
-
-        self.ct1.valueChanged.connect(lambda v: apply_kho(1, v))
-        self.ct2.valueChanged.connect(lambda v: apply_kho(2, v))
-        self.ct3.valueChanged.connect(lambda v: apply_kho(3, v))
-
-        self.c.scoreboardChanged.connect(lambda *_: sync_from_controller())
-        sync_from_controller()
+        self.c.changesCommitted.connect(self._on_changes)
+        self.sync_from_controller()
+
+    def _refresh_cell(self, kho: int):
+        # setRange/setValue tự bỏ qua khi không đổi -> không repaint thừa
+        ct = self.counters[kho]
+        ct.setRange(0, self.c.allowed_max(self.team, self.ttype, kho), clamp_current=True)
+        ct.setValue(int(self.c.counts[self.team][self.ttype][kho]), emit_signal=False)
+
+    def _refresh_header(self):
+        total = self.c.get_totals(self.team, self.ttype)[0]
+        max_team = self.c.team_capacity_for_type(self.team, self.ttype)
+        self.header.setText(f"{self.emoji} {self.title}: {total}/{max_team}")
+
+    def sync_from_controller(self):
+        for kho in self.counters:
+            self._refresh_cell(kho)
+        self._refresh_header()
+
+    def _on_changes(self, changes: dict):
+        # gom các ô bị ảnh hưởng của cả change set rồi refresh 1 lần
+        khos: set[int] = set()
+        for (team, ttype, kho) in changes["counts"]:
+            if team != self.team:
+                continue
+            if ttype == self.ttype:
+                # cùng loại: quota loại đổi -> mọi ô + header
+                self.sync_from_controller()
+                return
+            # loại khác: chỉ quota tổng của kho đó đổi
+            khos.add(kho)
+        for kho in sorted(khos):
+            self._refresh_cell(kho)
+
+    def apply_kho(self, kho: int, v: int):
+        self.c.set_count(self.team, self.ttype, kho, max(0, int(v)))
+        # controller có thể clamp/không đổi gì -> kéo lại giá trị thật về ô này
+        self.counters[kho].setValue(int(self.c.counts[self.team][self.ttype][kho]), emit_signal=False)
 
     def set_header_color(self, color: str):
         self._color = str(color)
-        self.header.setStyleSheet(f"""
-            QLabel{{
-                background:{self._color};
-                color:white;
-                font-weight:800;
-                border-radius:12px;
-                padding:6px 10px;
-                min-height:34px;
-            }}
-        """)
+        self.header.setColor(self._color)
 
 
 # ================== Team panel ==================
 class TeamPanel(QGroupBox):
-    def __init__(self, team: int, controller: MatchController):
+    # các khối kho báu lấy theo thứ tự loại của ruleset (c.rules.types)
+    def __init__(self, team: int, controller: MatchController, build_blocks: bool = True):
         super().__init__()
         self.team = int(team)
         self.c = controller
 
         self.setTitle(f"Đội {self.team}")
+        # stylesheet tĩnh, dùng chung cho mọi màu (màu viền vẽ trong paintEvent)
+        self.setStyleSheet(THEMES.sheet("panel"))
+        self._theme_color: str | None = None
+        self._border = THEMES.color(self.c.get_team_color(self.team))
 
         root = QVBoxLayout(self)
         root.setContentsMargins(12, 12, 12, 12)
@@ -1043,60 +3865,68 @@ class TeamPanel(QGroupBox):
         adj_row.addStretch(1)
         root.addLayout(adj_row)
 
-        col = self.c.get_team_color(self.team)
-        self.blockStone = TreasureBlock("ĐÁ", "🪨", self.team, "stone", controller, col)
-        self.blockGold  = TreasureBlock("VÀNG", "🟡", self.team, "gold", controller, col)
-        self.blockDia   = TreasureBlock("KIM CƯƠNG", "💎", self.team, "diamond", controller, col)
-
-        root.addWidget(self.blockStone)
-        root.addWidget(self.blockGold)
-        root.addWidget(self.blockDia)
+        self._root = root
+        self.blocks: list[TreasureBlock] = []
+        self.block_by_type: dict[str, TreasureBlock] = {}
 
-        self.c.scoreboardChanged.connect(self._on_scoreboard)
+        self.c.scoreChanged.connect(self._on_score_changed)
+        self.c.adjustersChanged.connect(self._on_adjusters_changed)
         self.c.teamColorChanged.connect(self._on_team_color_changed)
+        self.c.changesCommitted.connect(self._on_changes)
+        self._abs_hint: bool | None = None
 
-        self._apply_theme(col)
+        self._apply_theme(self.c.get_team_color(self.team))
         self._sync_adjusters()
 
         s1, s2 = self.c.get_display_scores()
-        self._on_scoreboard(self.c.team1, s1, self.c.team2, s2)
-
-    def _build_stylesheet(self, border_color: str) -> str:
-        bc = border_color
-        return f"""
-            QGroupBox {{
-                font-weight:900;
-                color:#111;
-                border:2px solid {bc};
-                border-radius:14px;
-                margin-top:10px;
-                background:#ffffff;
-            }}
-            QGroupBox::title {{
-                subcontrol-origin: margin;
-                left:12px;
-                padding:0 6px;
-            }}
-            QLineEdit {{
-                background:white;
-                color:#111;
-                border:1px solid #c7c7c7;
-                border-radius:10px;
-                padding:6px 10px;
-                min-height:32px;
-            }}
-            QLabel {{ color:#111; }}
-        """
+        self._on_score_changed(self.team, s1 if self.team == 1 else s2)
+
+        # build_blocks=False: ControlWindow gọi add_block() dần từng khối sau khi cửa sổ đã hiện
+        if build_blocks:
+            for i in range(self.c.rules.n_types):
+                self.add_block(i)
+
+    def add_block(self, index: int) -> "TreasureBlock":
+        rules = self.c.rules
+        ttype = rules.types[index]
+        block = TreasureBlock(rules.titles[index], rules.emojis[index], self.team, ttype,
+                              self.c, self.c.get_team_color(self.team))
+        self.block_by_type[ttype] = block
+        self.blocks.append(block)
+        self._root.addWidget(block)
+        return block
 
     def _apply_theme(self, color: str):
         color = str(color)
-        self.setStyleSheet(self._build_stylesheet(color))
-        self.btnColor.setStyleSheet(f"background:{color}; color:white; font-weight:900; border-radius:12px;")
-        self.blockStone.set_header_color(color)
-        self.blockGold.set_header_color(color)
-        self.blockDia.set_header_color(color)
+        if color == self._theme_color:
+            return
+        self._theme_color = color
+        self._border = THEMES.color(color)
+        # chỉ lá (nút màu) đổi stylesheet; viền + header chỉ repaint
+        self.btnColor.setStyleSheet(THEMES.sheet("swatch", color))
+        for block in self.blocks:
+            block.set_header_color(color)
+        self.update()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        opt = QStyleOptionGroupBox()
+        self.initStyleOption(opt)
+        style = self.style()
+        frame = style.subControlRect(QStyle.ComplexControl.CC_GroupBox, opt, QStyle.SubControl.SC_GroupBoxFrame, self)
+        label = style.subControlRect(QStyle.ComplexControl.CC_GroupBox, opt, QStyle.SubControl.SC_GroupBoxLabel, self)
+        p = QPainter(self)
+        p.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        # viền chừa chỗ cho tiêu đề giống viền stylesheet
+        p.setClipRegion(QRegion(self.rect()).subtracted(QRegion(label)))
+        p.setPen(QPen(self._border, 2))
+        p.setBrush(Qt.BrushStyle.NoBrush)
+        p.drawRoundedRect(QRectF(frame).adjusted(1, 1, -1, -1), 13, 13)
+        p.end()
 
     def _pick_color(self):
+        from PyQt6.QtWidgets import QColorDialog
+
         cur = QColor(self.c.get_team_color(self.team))
         picked = QColorDialog.getColor(cur, self, f"Chọn màu cho Đội {self.team}")
         if not picked.isValid():
@@ -1121,9 +3951,10 @@ class TeamPanel(QGroupBox):
     def _sync_adjusters(self):
         self.penCounter.setValue(int(self.c.penalty_minus5[self.team]), emit_signal=False)
         self.bonusCounter.setValue(int(self.c.bonus_plus5[self.team]), emit_signal=False)
+        self._sync_absolute_hint()
 
         if self.c.abs_winner is None:
-            self.btnAbsolute.setText("Tuyệt đối")
+            self.btnAbsolute.setText("Tuyệt đối ✓" if self._abs_hint else "Tuyệt đối")
             self.btnAbsolute.setEnabled(True)
         elif self.c.abs_winner == self.team:
             self.btnAbsolute.setText("Hủy tuyệt đối")
@@ -1132,18 +3963,49 @@ class TeamPanel(QGroupBox):
             self.btnAbsolute.setText("Đội kia tuyệt đối")
             self.btnAbsolute.setEnabled(False)
 
-    def _on_scoreboard(self, team1, score1, team2, score2):
-        self.lblScore.setText(str(score1 if self.team == 1 else score2))
-        self._sync_adjusters()
+    def _sync_absolute_hint(self):
+        # đội đủ điều kiện mà chưa ai được xử tuyệt đối -> nút nổi bật để trọng tài bấm
+        hint = self.c.abs_winner is None and self.c.absolute_condition_met(self.team)
+        if hint == self._abs_hint:
+            return
+        self._abs_hint = hint
+        self.btnAbsolute.setStyleSheet("background:#22c55e; color:#111; font-weight:900;" if hint
+                                       else "background:#f1c40f; color:#111;")
+
+    def _on_changes(self, changes: dict):
+        if any(team == self.team for team, _t, _kho in changes["counts"]):
+            self._sync_adjusters()
+
+    def _on_adjusters_changed(self, team: int):
+        if int(team) == self.team:
+            self._sync_adjusters()
+
+    def _on_score_changed(self, team: int, score: int):
+        if int(team) == self.team:
+            self.lblScore.setText(str(score))
 
 
 # ================== Control window ==================
 class ControlWindow(QWidget):
-    def __init__(self, c: MatchController):
+    buildFinished = pyqtSignal()
+
+    def __init__(self, c: MatchController, deferred: bool = False, embedded: bool = False):
+        """
+        deferred=True: dựng khung + khu Timer trước, còn TeamPanel / TreasureBlock
+        được dựng dần, mỗi vòng event loop 1 bước (xem _run_build_step).
+        embedded=True: nằm trong 1 tab của ArenaWindow -> phím tắt chỉ tác dụng trong tab đó.
+        """
         super().__init__()
         self.c = c
-        self.display: DisplayWindow | None = None
+        self.embedded = bool(embedded)
+        # displays[0] = display chính (Open Display / chọn màn hình); các phần tử sau = display phụ
+        self.displays: list[DisplayWindow] = []
+        # renderer cho DisplayWindow (xem DisplayWindow.RENDERERS, đổi bằng --display-renderer)
+        self.display_renderer = "widgets"
         self.display_screen_index: int | None = None
+        self.display_title = "DISPLAY"
+        # kết quả giải (dùng chung giữa các sân); None = tạo lúc lưu trận đầu tiên
+        self.tournament: "Tournament | None" = None
 
         self.setWindowTitle("CONTROL PANEL")
         self.resize(1200, 780)
@@ -1176,14 +4038,14 @@ class ControlWindow(QWidget):
         root.setContentsMargins(10, 10, 10, 10)
         root.setSpacing(10)
 
-        rowTeams = QHBoxLayout()
-        rowTeams.setSpacing(10)
+        self.rowTeams = QHBoxLayout()
+        self.rowTeams.setSpacing(10)
+        root.addLayout(self.rowTeams)
 
-        self.teamPanel1 = TeamPanel(1, c)
-        self.teamPanel2 = TeamPanel(2, c)
-        rowTeams.addWidget(self.teamPanel1, 1)
-        rowTeams.addWidget(self.teamPanel2, 1)
-        root.addLayout(rowTeams)
+        self.teamPanel1: TeamPanel | None = None
+        self.teamPanel2: TeamPanel | None = None
+        self.build_times: list[tuple[str, float]] = []
+        self._build_queue: list[tuple[str, object]] = []
 
         box = QGroupBox("⏱️ Timer / Display")
         box.setStyleSheet("""
@@ -1236,6 +4098,9 @@ class ControlWindow(QWidget):
         self.btnOpenDisplay = QPushButton("Open Display")
         self.btnOpenDisplay.setStyleSheet("background:#111; color:white;")
 
+        self.btnAddDisplay = QPushButton("+ Display")
+        self.btnAddDisplay.setStyleSheet("background:#334155; color:white;")
+
         self.btnCloseDisplay = QPushButton("Close Display")
         self.btnCloseDisplay.setStyleSheet("background:#555; color:white;")
 
@@ -1253,6 +4118,7 @@ class ControlWindow(QWidget):
         top.addWidget(self.lblScreen, 0)
         top.addSpacing(10)
         top.addWidget(self.btnOpenDisplay)
+        top.addWidget(self.btnAddDisplay)
         top.addWidget(self.btnCloseDisplay)
 
         bl.addLayout(top)
@@ -1272,6 +4138,26 @@ class ControlWindow(QWidget):
         preset.addWidget(mk_preset("00:30", 30))
         preset.addStretch(1)
 
+        self.inGroup = QLineEdit("A")
+        self.inGroup.setMaxLength(12)
+        self.inGroup.setFixedWidth(70)
+        self.inGroup.setStyleSheet("background:#ffffff; border:1px solid #d8dbe0; border-radius:10px; padding:6px 8px; font-weight:900;")
+        self.btnRecord = QPushButton("Lưu kết quả")
+        self.btnRecord.setStyleSheet("background:#b45309; color:white;")
+        self.btnStandings = QPushButton("Bảng xếp hạng")
+        self.btnStandings.setStyleSheet("background:#0e7490; color:white;")
+        self.btnAutoAbsolute = QPushButton("Tự động tuyệt đối")
+        self.btnAutoAbsolute.setCheckable(True)
+        self.btnAutoAbsolute.setChecked(self.c.auto_absolute)
+        self.btnAutoAbsolute.setToolTip("Đội đủ điều kiện tuyệt đối khi đang chạy giờ -> tự xử tuyệt đối và chốt giờ")
+        self.btnAutoAbsolute.setStyleSheet("QPushButton{background:#6b7280; color:white;} QPushButton:checked{background:#16a34a;}")
+        preset.addWidget(self.btnAutoAbsolute)
+        preset.addSpacing(10)
+        preset.addWidget(QLabel("Bảng:"))
+        preset.addWidget(self.inGroup)
+        preset.addWidget(self.btnRecord)
+        preset.addWidget(self.btnStandings)
+
         bl.addLayout(preset)
         root.addWidget(box)
 
@@ -1282,14 +4168,15 @@ class ControlWindow(QWidget):
         self.btnResetScore.clicked.connect(self.c.reset_scoring_and_coeff)
         self.btnChooseScreen.clicked.connect(self.choose_screen)
         self.btnOpenDisplay.clicked.connect(self.open_display)
+        self.btnAddDisplay.clicked.connect(self.add_display_dialog)
         self.btnCloseDisplay.clicked.connect(self.close_display)
+        self.btnRecord.clicked.connect(self.record_result)
+        self.btnStandings.clicked.connect(self.toggle_standings)
+        self.btnAutoAbsolute.toggled.connect(self.c.set_auto_absolute)
 
         self.c.timeTextChanged.connect(self.on_time)
         self.c.stateChanged.connect(self.on_state)
 
-        self.teamPanel1.inName.editingFinished.connect(self.apply_names)
-        self.teamPanel2.inName.editingFinished.connect(self.apply_names)
-
         self.on_time(self.c._fmt(self.c.seconds))
         self._update_screen_label()
 
@@ -1301,9 +4188,109 @@ class ControlWindow(QWidget):
             ("R", self.c.reset_timer_only),
             ("D", self.open_display),
             ("Q", self.close),
+            ("Ctrl+Shift+T", self.toggle_timing_overlay),
+            ("Ctrl+Shift+J", self.dump_timing_json),
         ]:
+            if self.embedded and seq == "Q":
+                continue
             sc = QShortcut(QKeySequence(seq), self, slot)
-            sc.setContext(Qt.ShortcutContext.ApplicationShortcut)
+            sc.setContext(Qt.ShortcutContext.WidgetWithChildrenShortcut if self.embedded
+                          else Qt.ShortcutContext.ApplicationShortcut)
+
+        # overlay đo timing: ẩn, bật bằng Ctrl+Shift+T
+        self.timingOverlay = QLabel(self)
+        self.timingOverlay.setFont(QFont("Consolas", 9))
+        self.timingOverlay.setStyleSheet(
+            "background:rgba(15,23,42,220); color:#e2e8f0; border-radius:10px; padding:8px 10px;"
+        )
+        self.timingOverlay.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents, True)
+        self.timingOverlay.hide()
+        self._timingRefresh = QTimer(self)
+        self._timingRefresh.setInterval(500)
+        self._timingRefresh.timeout.connect(self._refresh_timing_overlay)
+
+        self._build_queue = [("team panel 1", lambda: self._add_team_panel(1)),
+                             ("team panel 2", lambda: self._add_team_panel(2))]
+        for i, title in enumerate(self.c.rules.titles):
+            for team in (1, 2):
+                self._build_queue.append(
+                    (f"team {team} {title}", lambda team=team, i=i: self._team_panel(team).add_block(i))
+                )
+        # bảng trạng thái (import NumPy) sau khi cửa sổ đã hiện; trước đó allowed_max tính trực tiếp
+        self._build_queue.append(("rules table", self.c.rules.table))
+        if deferred:
+            QTimer.singleShot(0, self._run_build_step)
+        else:
+            while self._build_queue:
+                self._run_build_step(chain=False)
+
+    # -------- dựng dần team panel --------
+    def _team_panel(self, team: int) -> "TeamPanel":
+        return self.teamPanel1 if team == 1 else self.teamPanel2
+
+    def _add_team_panel(self, team: int):
+        panel = TeamPanel(team, self.c, build_blocks=False)
+        if team == 1:
+            self.teamPanel1 = panel
+        else:
+            self.teamPanel2 = panel
+        self.rowTeams.addWidget(panel, 1)
+        panel.inName.editingFinished.connect(self.apply_names)
+
+    def _run_build_step(self, chain: bool = True):
+        if not self._build_queue:
+            return
+        label, step = self._build_queue.pop(0)
+        t0 = time.perf_counter()
+        step()
+        self.build_times.append((label, (time.perf_counter() - t0) * 1000.0))
+        if self._build_queue:
+            if chain:
+                QTimer.singleShot(0, self._run_build_step)
+        else:
+            self.buildFinished.emit()
+
+    def is_built(self) -> bool:
+        return not self._build_queue
+
+    # -------- timing overlay (ẩn) --------
+    def toggle_timing_overlay(self):
+        if self.timingOverlay.isVisible():
+            self.timingOverlay.hide()
+            self._timingRefresh.stop()
+            return
+        self.c.enable_timing_probe()
+        self._refresh_timing_overlay()
+        self.timingOverlay.show()
+        self.timingOverlay.raise_()
+        self._timingRefresh.start()
+
+    def _refresh_timing_overlay(self, extra: str = ""):
+        probe = self.c.timing
+        text = probe.overlay_text() if probe is not None else "TIMING: tắt"
+        if self.c.audio is not None:
+            text += "\n" + self.c.audio.status_text()
+        if extra:
+            text += "\n" + extra
+        self.timingOverlay.setText(text)
+        self.timingOverlay.adjustSize()
+        self.timingOverlay.move(self.width() - self.timingOverlay.width() - 14, 14)
+
+    def dump_timing_json(self):
+        probe = self.c.enable_timing_probe()
+        name = time.strftime("timing_%Y%m%d_%H%M%S.json")
+        try:
+            path = probe.dump(_exe_dir() / name)
+        except OSError:
+            path = probe.dump(Path.cwd() / name)
+        if self.timingOverlay.isVisible():
+            self._refresh_timing_overlay(f"→ {path}")
+        return path
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.timingOverlay.isVisible():
+            self._refresh_timing_overlay()
 
     def _update_screen_label(self):
         screens = QGuiApplication.screens()
@@ -1313,11 +4300,17 @@ class ControlWindow(QWidget):
 
         if self.display_screen_index is None:
             idx = 1 if len(screens) >= 2 else 0
-            self.lblScreen.setText(f"Screen: Auto → [{idx}]")
+            text = f"Screen: Auto → [{idx}]"
         else:
-            self.lblScreen.setText(f"Screen: [{self.display_screen_index}]")
+            text = f"Screen: [{self.display_screen_index}]"
+        extra = len(self.displays) - 1
+        if extra > 0:
+            text += f" +{extra}"
+        self.lblScreen.setText(text)
 
     def apply_names(self):
+        if self.teamPanel1 is None or self.teamPanel2 is None:
+            return
         self.c.set_team_names(self.teamPanel1.inName.text(), self.teamPanel2.inName.text())
 
     def set_time_dialog(self):
@@ -1346,8 +4339,20 @@ class ControlWindow(QWidget):
             self.display_screen_index = int(dlg.selected_index)
         self._update_screen_label()
 
-        if self.display is not None and self.display.isVisible():
-            self.display.show_on_screen(self.display_screen_index)
+        display = self.display
+        if display is not None and display.isVisible():
+            display.show_on_screen(self.display_screen_index)
+
+    @property
+    def display(self) -> DisplayWindow | None:
+        return self.displays[0] if self.displays else None
+
+    def _new_display(self, layout: str = "full", primary: bool = False) -> DisplayWindow:
+        # mọi display dùng chung DisplayShared mặc định: cùng cỡ -> không fit / dựng atlas lại
+        disp = DisplayWindow(self.c, renderer=self.display_renderer, layout=layout,
+                             app_shortcuts=primary and not self.embedded)
+        disp.setWindowTitle(self.display_title)
+        return disp
 
     def open_display(self):
         self.apply_names()
@@ -1361,20 +4366,1217 @@ class ControlWindow(QWidget):
                 self.display_screen_index = 1
             self._update_screen_label()
 
-        if self.display is None:
-            self.display = DisplayWindow(self.c)
+        if not self.displays:
+            self.displays.append(self._new_display(primary=True))
 
-        self.display.show_on_screen(self.display_screen_index)
+        self.displays[0].show_on_screen(self.display_screen_index)
+
+    def add_display(self, screen_index: int | None, layout: str = "full") -> DisplayWindow:
+        """Mở thêm 1 display phụ (máy chiếu / LED / màn giám khảo) trên màn hình chỉ định."""
+        if not self.displays:
+            self.open_display()
+        self.apply_names()
+        disp = self._new_display(layout)
+        disp.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose, True)
+        disp.destroyed.connect(lambda _=None, d=disp: self._forget_display(d))
+        self.displays.append(disp)
+        disp.show_on_screen(screen_index)
+        self._update_screen_label()
+        return disp
+
+    def add_display_dialog(self):
+        screens = QGuiApplication.screens()
+        if not screens:
+            return
+        dlg = ScreenSelectDialog(self, current_index=len(self.displays) % len(screens), with_layout=True)
+        if dlg.exec() and dlg.selected_index is not None:
+            self.add_display(dlg.selected_index, dlg.selected_layout)
+
+    # -------- giải đấu --------
+    def _tournament(self) -> "Tournament":
+        if self.tournament is None:
+            self.tournament = Tournament()
+            self.tournament.load()
+        return self.tournament
+
+    def _group(self) -> str:
+        return self.inGroup.text().strip() or "A"
+
+    def record_result(self):
+        self.apply_names()
+        r = self.c.match_result()
+        s1, s2 = r["teams"][0]["score"], r["teams"][1]["score"]
+        text = f"{r['team1']}  {s1} – {s2}  {r['team2']}"
+        if r["abs_winner"]:
+            text += f"\n(tuyệt đối: {r['team1'] if r['abs_winner'] == 1 else r['team2']})"
+        ans = QMessageBox.question(self, "Lưu kết quả", f"Bảng {self._group()}:\n{text}")
+        if ans != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            self._tournament().record(self.c, self._group())
+        except OSError as e:
+            QMessageBox.warning(self, "Lưu kết quả", str(e))
+
+    def toggle_standings(self):
+        """Bật / tắt bảng xếp hạng trên mọi display của sân này."""
+        if not self.displays:
+            self.open_display()
+        showing = any(d.showing_standings() for d in self.displays)
+        for disp in self.displays:
+            if showing:
+                disp.hide_standings()
+            else:
+                disp.show_standings(self._tournament(), self._group())
+
+    def _forget_display(self, disp: DisplayWindow):
+        if disp in self.displays[1:]:
+            self.displays.remove(disp)
+            self._update_screen_label()
 
     def close_display(self):
-        if self.display is not None:
-            self.display.close()
-            self.display = None
+        # display phụ tự xoá (WA_DeleteOnClose); display chính huỷ như trước
+        for disp in list(self.displays[1:]):
+            disp.close()
+        if self.displays:
+            self.displays[0].close()
+        self.displays.clear()
+        self._update_screen_label()
+
+
+# ================== Multi-arena ==================
+class ArenaWindow(QWidget):
+    """
+    Nhiều sân trong 1 process: mỗi sân 1 MatchController + 1 tab control (+ display riêng).
+    Dùng chung: Qt, TickScheduler (1 timer cho mọi đồng hồ), CueAudioEngine (1 thread,
+    1 bộ QSoundEffect), DisplayShared / ThemeCache / AssetIndex.
+    Tab chỉ được dựng khi mở lần đầu nên 16 sân không dựng 16 bộ TeamPanel lúc khởi động.
+    """
+
+    def __init__(self, controllers: list[MatchController], renderer: str = "widgets"):
+        super().__init__()
+        self.arenas = list(controllers)
+        self.display_renderer = renderer
+        self.controls: list[ControlWindow | None] = [None] * len(self.arenas)
+        self.audio: CueAudioEngine | None = None
+        # mọi sân ghi vào cùng 1 giải
+        self.tournament = Tournament()
+        self.tournament.load()
+
+        self.setWindowTitle(f"CONTROL PANEL — {len(self.arenas)} sân")
+        self.resize(1240, 820)
+        self.setMinimumSize(980, 620)
+
+        outer = QVBoxLayout(self)
+        outer.setContentsMargins(0, 0, 0, 0)
+        self.tabs = QTabWidget()
+        self.tabs.setDocumentMode(True)
+        outer.addWidget(self.tabs)
+
+        for i, c in enumerate(self.arenas):
+            page = QWidget()
+            lay = QVBoxLayout(page)
+            lay.setContentsMargins(0, 0, 0, 0)
+            self.tabs.addTab(page, self._tab_text(i, c._fmt(c.seconds)))
+            c.timeTextChanged.connect(lambda text, i=i: self.tabs.setTabText(i, self._tab_text(i, text)))
+
+        self.tabs.currentChanged.connect(self._ensure_built)
+        self._ensure_built(0)
+
+        for i in range(min(9, len(self.arenas))):
+            sc = QShortcut(QKeySequence(f"Ctrl+{i + 1}"), self, lambda i=i: self.tabs.setCurrentIndex(i))
+            sc.setContext(Qt.ShortcutContext.WindowShortcut)
+        sc = QShortcut(QKeySequence("Ctrl+Q"), self, self.close)
+        sc.setContext(Qt.ShortcutContext.WindowShortcut)
+
+    @staticmethod
+    def _tab_text(i: int, time_text: str) -> str:
+        return f"Sân {i + 1} · {time_text}"
+
+    def _ensure_built(self, i: int):
+        if i < 0 or self.controls[i] is not None:
+            return
+        win = ControlWindow(self.arenas[i], deferred=True, embedded=True)
+        win.display_renderer = self.display_renderer
+        win.tournament = self.tournament
+        win.display_title = f"DISPLAY — Sân {i + 1}"
+        self.controls[i] = win
+        self.tabs.widget(i).layout().addWidget(win)
+
+    def control(self, i: int) -> ControlWindow:
+        self._ensure_built(i)
+        return self.controls[i]
+
+    def load_sounds(self):
+        """1 engine âm thanh cho mọi sân (cue phân biệt theo token của từng controller)."""
+        if self.audio is None:
+            self.audio = CueAudioEngine()
+        for c in self.arenas:
+            c.load_sounds(self.audio)
+
+    def closeEvent(self, event):
+        for win in self.controls:
+            if win is not None:
+                win.close_display()
+        super().closeEvent(event)
+
+
+# ================== Tournament standings ==================
+class StandingsGroup:
+    """
+    Bảng xếp hạng 1 bảng đấu, cập nhật tăng dần.
+
+    _order luôn được sắp theo key (tốt nhất trước); ghi 1 trận chỉ đụng 2 đội:
+    bisect tìm key cũ -> xoá, cập nhật số liệu, insort key mới. Hạng = bisect_left + 1.
+    Tie-break: điểm trận, số trận thắng tuyệt đối, tổng điểm, số kim cương, ít lỗi hơn, tên.
+    """
+
+    POINTS_WIN = 3
+    POINTS_DRAW = 1
+    FIELDS = ("played", "won", "drawn", "lost", "points", "abs_wins",
+              "score", "score_against", "diamonds", "penalties", "bonuses")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows: dict[str, dict] = {}
+        self._keys: dict[str, tuple] = {}
+        self._order: list[tuple] = []
+
+    @staticmethod
+    def _key(team: str, row: dict) -> tuple:
+        return (-row["points"], -row["abs_wins"], -row["score"], -row["diamonds"],
+                row["penalties"], team.casefold(), team)
+
+    def _row(self, team: str) -> dict:
+        row = self.rows.get(team)
+        if row is None:
+            row = self.rows[team] = dict.fromkeys(self.FIELDS, 0)
+            key = self._keys[team] = self._key(team, row)
+            bisect.insort(self._order, key)
+        return row
+
+    def apply(self, record: dict, sign: int = 1):
+        """Cộng (sign=1) hoặc gỡ (sign=-1) 1 trận đã ghi."""
+        winner = record["winner"]
+        for side, other in ((1, 2), (2, 1)):
+            t = record["teams"][side - 1]
+            team = record["team1"] if side == 1 else record["team2"]
+            row = self._row(team)
+            old = self._keys[team]
+            del self._order[bisect.bisect_left(self._order, old)]
+
+            row["played"] += sign
+            if winner == side:
+                row["won"] += sign
+                row["points"] += sign * self.POINTS_WIN
+            elif winner == 0:
+                row["drawn"] += sign
+                row["points"] += sign * self.POINTS_DRAW
+            else:
+                row["lost"] += sign
+            if record["abs_winner"] == side:
+                row["abs_wins"] += sign
+            row["score"] += sign * t["score"]
+            row["score_against"] += sign * record["teams"][other - 1]["score"]
+            row["diamonds"] += sign * t["diamonds"]
+            row["penalties"] += sign * t["penalty_minus5"]
+            row["bonuses"] += sign * t["bonus_plus5"]
+
+            key = self._keys[team] = self._key(team, row)
+            bisect.insort(self._order, key)
+
+    def rank(self, team: str) -> int | None:
+        key = self._keys.get(team)
+        if key is None:
+            return None
+        return bisect.bisect_left(self._order, key) + 1
+
+    def table(self, limit: int | None = None) -> list[tuple[int, str, dict]]:
+        order = self._order if limit is None else self._order[:limit]
+        return [(i + 1, key[-1], self.rows[key[-1]]) for i, key in enumerate(order)]
+
+
+class Tournament(QObject):
+    """
+    Kết quả các trận đã kết thúc (JSON Lines append-only) + bảng xếp hạng theo bảng đấu.
+    Huỷ 1 trận ghi nhầm = thêm dòng {"void": n} rồi gỡ trận đó khỏi bảng (không ghi đè file).
+    """
+
+    standingsChanged = pyqtSignal(str)   # group
+    matchRecorded = pyqtSignal(object)   # record
+
+    def __init__(self, path: str | Path | None = None, parent=None):
+        super().__init__(parent)
+        self.path = Path(path) if path else self.default_path()
+        self.groups: dict[str, StandingsGroup] = {}
+        self.records: dict[int, dict] = {}
+        self._next = 1
+
+    @staticmethod
+    def default_path() -> Path:
+        return _exe_dir() / "tournament" / "results.jsonl"
+
+    def group(self, name: str) -> StandingsGroup:
+        g = self.groups.get(name)
+        if g is None:
+            g = self.groups[name] = StandingsGroup(name)
+        return g
+
+    def load(self) -> int:
+        """Đọc lại file kết quả (bỏ qua dòng hỏng); trả về số trận còn hiệu lực."""
+        try:
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return 0
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(entry, dict):
+                continue
+            if "void" in entry:
+                self._void(int(entry["void"]))
+            elif "n" in entry:
+                self._add(entry)
+        return len(self.records)
+
+    def _append(self, entry: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def _add(self, record: dict):
+        self.records[int(record["n"])] = record
+        self._next = max(self._next, int(record["n"]) + 1)
+        self.group(record["group"]).apply(record)
+
+    def _void(self, n: int) -> dict | None:
+        record = self.records.pop(n, None)
+        if record is not None:
+            self.group(record["group"]).apply(record, -1)
+        return record
+
+    def record(self, controller: "MatchController", group: str = "A") -> dict:
+        record = controller.match_result()
+        record["n"] = self._next
+        record["group"] = (group or "A").strip() or "A"
+        record["saved"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        self._append(record)
+        self._add(record)
+        self.matchRecorded.emit(record)
+        self.standingsChanged.emit(record["group"])
+        return record
+
+    def void_last(self) -> dict | None:
+        if not self.records:
+            return None
+        n = max(self.records)
+        self._append({"void": n})
+        record = self._void(n)
+        self.standingsChanged.emit(record["group"])
+        return record
+
+
+class StandingsView(QWidget):
+    """Trang bảng xếp hạng vẽ bằng QPainter, chiếu trên DisplayWindow (xem show_standings)."""
+
+    COLUMNS = (("#", 0.06), ("ĐỘI", 0.38), ("TRẬN", 0.08), ("T-H-B", 0.14),
+               ("ĐIỂM", 0.09), ("TĐ", 0.07), ("TỔNG", 0.11), ("💎", 0.07))
+    MAX_ROWS = 16
+
+    def __init__(self, tournament: Tournament, group: str, parent=None):
+        super().__init__(parent)
+        self.tournament = tournament
+        self.group = group
+        self._fonts: tuple | None = None
+        tournament.standingsChanged.connect(self._on_changed)
+
+    def set_group(self, group: str):
+        self.group = group
+        self.update()
+
+    def _on_changed(self, group: str):
+        if group == self.group:
+            self.update()
+
+    def resizeEvent(self, event):
+        self._fonts = None
+        super().resizeEvent(event)
+
+    def _layout_fonts(self, row_h: int) -> tuple:
+        if self._fonts is None or self._fonts[0] != row_h:
+            fam = DisplayWindow.FONT_FAMILY
+            title = QFont(fam)
+            title.setPixelSize(max(12, int(row_h * 0.9)))
+            title.setWeight(QFont.Weight.Black)
+            head = QFont(fam)
+            head.setPixelSize(max(9, int(row_h * 0.42)))
+            head.setWeight(QFont.Weight.Bold)
+            body = QFont(fam)
+            body.setPixelSize(max(10, int(row_h * 0.55)))
+            body.setWeight(QFont.Weight.Black)
+            self._fonts = (row_h, title, head, body)
+        return self._fonts
+
+    def paintEvent(self, event):
+        p = QPainter(self)
+        p.setRenderHint(QPainter.RenderHint.Antialiasing)
+        p.setRenderHint(QPainter.RenderHint.TextAntialiasing)
+        p.fillRect(self.rect(), QColor(DisplayWindow.BG))
+
+        g = self.tournament.groups.get(self.group)
+        rows = g.table(self.MAX_ROWS) if g is not None else []
+        w, h = self.width(), self.height()
+        mx = int(w * 0.04)
+        row_h = max(18, int((h * 0.92) / (max(8, len(rows)) + 2.6)))
+        _k, f_title, f_head, f_body = self._layout_fonts(row_h)
+
+        y = int(h * 0.03)
+        p.setFont(f_title)
+        p.setPen(QColor("#111"))
+        p.drawText(QRect(mx, y, w - 2 * mx, int(row_h * 1.3)), Qt.AlignmentFlag.AlignCenter,
+                   f"BẢNG XẾP HẠNG — BẢNG {self.group}")
+        y += int(row_h * 1.4)
+
+        xs = []
+        x = mx
+        for _title, frac in self.COLUMNS:
+            cw = int((w - 2 * mx) * frac)
+            xs.append((x, cw))
+            x += cw
+
+        p.setFont(f_head)
+        p.setPen(QColor("#334155"))
+        for (x, cw), (title, _f) in zip(xs, self.COLUMNS):
+            align = Qt.AlignmentFlag.AlignLeft if title == "ĐỘI" else Qt.AlignmentFlag.AlignHCenter
+            p.drawText(QRect(x, y, cw, row_h), align | Qt.AlignmentFlag.AlignVCenter, title)
+        y += row_h
+
+        p.setFont(f_body)
+        fm = p.fontMetrics()
+        radius = row_h * 0.25
+        for rank, team, row in rows:
+            band = QRectF(mx, y + 2, w - 2 * mx, row_h - 4)
+            p.setPen(Qt.PenStyle.NoPen)
+            p.setBrush(QColor("#ffffff") if rank % 2 else QColor("#e8f3ff"))
+            p.drawRoundedRect(band, radius, radius)
+            p.setPen(QColor("#111"))
+            cells = (str(rank), team, str(row["played"]),
+                     f'{row["won"]}-{row["drawn"]}-{row["lost"]}', str(row["points"]),
+                     str(row["abs_wins"]), str(row["score"]), str(row["diamonds"]))
+            for (x, cw), text, (title, _f) in zip(xs, cells, self.COLUMNS):
+                if title == "ĐỘI":
+                    text = fm.elidedText(text, Qt.TextElideMode.ElideRight, cw - 8)
+                    align = Qt.AlignmentFlag.AlignLeft
+                else:
+                    align = Qt.AlignmentFlag.AlignHCenter
+                p.drawText(QRect(x + 4, y, cw - 8, row_h), align | Qt.AlignmentFlag.AlignVCenter, text)
+            y += row_h
+        if not rows:
+            p.setFont(f_head)
+            p.setPen(QColor("#64748b"))
+            p.drawText(QRect(mx, y, w - 2 * mx, row_h * 2), Qt.AlignmentFlag.AlignCenter, "Chưa có trận nào")
+        p.end()
+
+
+# ================== Web scoreboard (LAN) ==================
+_WEB_PAGE = """<!doctype html>
+<html lang="vi"><head><meta charset="utf-8">
+<meta name="viewport" content="width=device-width,initial-scale=1">
+<title>Scoreboard</title>
+<style>
+ html,body{margin:0;height:100%;background:#CFE8FF;font-family:"Segoe UI",sans-serif;color:#111}
+ .row{display:flex;justify-content:space-around;padding:4vh 2vw 0}
+ .team{text-align:center;width:45%}
+ .card{border-radius:22px;color:#fff;font-weight:900;font-size:14vw;line-height:1.3}
+ .name{font-weight:900;font-size:5vw;white-space:nowrap;overflow:hidden;text-overflow:ellipsis}
+ #time{text-align:center;font-weight:900;font-size:24vw;font-variant-numeric:tabular-nums}
+ #off{position:fixed;top:6px;right:10px;font-size:12px;color:#a00}
+</style></head><body>
+<div class="row">
+ <div class="team"><div class="card" id="c1">0</div><div class="name" id="t1"></div></div>
+ <div class="team"><div class="card" id="c2">0</div><div class="name" id="t2"></div></div>
+</div>
+<div id="time">00:00</div><div id="off"></div>
+<script>
+var st={};
+function draw(d){
+ for(var k in d){st[k]=d[k];}
+ if("s1" in d)document.getElementById("c1").textContent=st.s1;
+ if("s2" in d)document.getElementById("c2").textContent=st.s2;
+ if("t1" in d)document.getElementById("t1").textContent=st.t1;
+ if("t2" in d)document.getElementById("t2").textContent=st.t2;
+ if("c1" in d)document.getElementById("c1").style.background=st.c1;
+ if("c2" in d)document.getElementById("c2").style.background=st.c2;
+ if("time" in d)document.getElementById("time").textContent=st.time;
+}
+function connect(){
+ var ws=new WebSocket((location.protocol=="https:"?"wss://":"ws://")+location.host+"/ws");
+ ws.onopen=function(){document.getElementById("off").textContent="";};
+ ws.onmessage=function(e){var m=JSON.parse(e.data);if(m.snap){st={};draw(m.snap);}else{draw(m.d);}};
+ ws.onclose=function(){document.getElementById("off").textContent="offline";setTimeout(connect,1000);};
+}
+connect();
+</script></body></html>
+"""
+
+
+def _ws_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    n = len(payload)
+    if n < 126:
+        head = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 65536:
+        head = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return head + payload
+
+
+class _WsClient:
+    __slots__ = ("writer", "stale", "stale_since")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.stale = False
+        self.stale_since = 0.0
+
+
+class ScoreboardServer:
+    """
+    HTTP + WebSocket (chỉ stdlib asyncio) chạy trên thread riêng cho điện thoại /
+    máy khác trong LAN: GET / = trang scoreboard, GET /state = JSON, /ws = push.
+
+    Mỗi thay đổi được encode thành 1 frame delta duy nhất rồi ghi cho mọi client
+    (không await từng client). Client vào sau nhận snapshot. Client chậm (buffer
+    ghi vượt HIGH_WATER) bị bỏ qua delta, khi drain xong nhận lại 1 snapshot;
+    kẹt quá STALE_TIMEOUT_S thì bị ngắt.
+    """
+
+    HIGH_WATER = 64 * 1024
+    STALE_TIMEOUT_S = 10.0
+    MAX_CLIENT_FRAME = 4096
+    HEADER_TIMEOUT_S = 10.0
+    _GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 8765):
+        self.host = host
+        self.port = int(port)
+        self._loop = None
+        self._stop = None
+        self._thread: threading.Thread | None = None
+        self._ready = threading.Event()
+        self._clients: set[_WsClient] = set()
+        self._tasks: set = set()
+
+        self._snap_seq = 0
+        self._snap_state: dict = {}
+        self._snap_frame: bytes | None = None
+
+        self.error: BaseException | None = None
+        self.sent = 0
+        self.skipped = 0
+        self.resyncs = 0
+        self.dropped_clients = 0
+
+    # -------- Qt thread --------
+    def start(self, timeout: float = 5.0):
+        self._thread = threading.Thread(target=self._run, name="ScoreboardServer", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout)
+        if self.error is not None:
+            raise OSError(f"web scoreboard: {self.error}")
+
+    def publish(self, seq: int, state: dict, delta: dict):
+        """Gọi từ GUI thread: encode 1 lần, phần gửi chạy trên loop của server."""
+        loop = self._loop
+        if loop is None:
+            return
+        frame = _ws_frame(json.dumps({"seq": seq, "d": delta}, separators=(",", ":")).encode("utf-8"))
+        loop.call_soon_threadsafe(self._broadcast, frame, seq, state)
+
+    def stop(self):
+        loop = self._loop
+        if loop is not None and self._stop is not None:
+            loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def url(self) -> str:
+        host = "127.0.0.1" if self.host in ("0.0.0.0", "") else self.host
+        return f"http://{host}:{self.port}/"
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self._clients),
+            "stale": sum(1 for cl in list(self._clients) if cl.stale),
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "resyncs": self.resyncs,
+            "dropped_clients": self.dropped_clients,
+        }
+
+    # -------- server thread --------
+    def _run(self):
+        import asyncio
+        try:
+            asyncio.run(self._main())
+        except BaseException as e:  # noqa: BLE001 - báo lỗi bind về start()
+            self.error = e
+            self._ready.set()
+
+    async def _main(self):
+        import asyncio
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        server = await asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        await self._stop.wait()
+        server.close()
+        for cl in list(self._clients):
+            cl.writer.transport.abort()
+        # để các handler tự thoát (EOF) thay vì bị asyncio.run() cancel giữa chừng
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=1.0)
+        self._clients.clear()
+        self._loop = None
+
+    def _snapshot_frame(self) -> bytes:
+        if self._snap_frame is None:
+            msg = {"seq": self._snap_seq, "snap": self._snap_state}
+            self._snap_frame = _ws_frame(json.dumps(msg, separators=(",", ":")).encode("utf-8"))
+        return self._snap_frame
+
+    def _broadcast(self, frame: bytes, seq: int, state: dict):
+        self._snap_seq = seq
+        self._snap_state = state
+        self._snap_frame = None
+        now = self._loop.time()
+        for cl in list(self._clients):
+            tr = cl.writer.transport
+            if tr.is_closing():
+                continue
+            if cl.stale:
+                self.skipped += 1
+                if now - cl.stale_since > self.STALE_TIMEOUT_S:
+                    self.dropped_clients += 1
+                    tr.abort()
+                continue
+            if tr.get_write_buffer_size() > self.HIGH_WATER:
+                # client không đọc kịp: bỏ delta, chờ drain rồi gửi snapshot mới nhất
+                cl.stale = True
+                cl.stale_since = now
+                self.skipped += 1
+                self._loop.create_task(self._resync(cl))
+                continue
+            cl.writer.write(frame)
+            self.sent += 1
+
+    async def _resync(self, cl: _WsClient):
+        try:
+            await cl.writer.drain()
+        except (ConnectionError, RuntimeError):
+            return
+        if cl in self._clients:
+            cl.stale = False
+            cl.writer.write(self._snapshot_frame())
+            self.resyncs += 1
+
+    async def _handle(self, reader, writer):
+        import asyncio
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.HEADER_TIMEOUT_S)
+            lines = head.decode("latin-1").split("\r\n")
+            method, path, _ver = lines[0].split(" ", 2)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError):
+            writer.transport.abort()
+            return
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                k, v = line.split(":", 1)
+                headers[k.strip().lower()] = v.strip()
+        path = path.split("?", 1)[0]
+
+        try:
+            if path == "/ws" and "websocket" in headers.get("upgrade", "").lower():
+                await self._websocket(reader, writer, headers)
+                return
+            if method != "GET":
+                self._http(writer, 405, "text/plain", b"method not allowed")
+            elif path in ("/", "/index.html"):
+                self._http(writer, 200, "text/html; charset=utf-8", _WEB_PAGE.encode("utf-8"))
+            elif path == "/state":
+                body = json.dumps({"seq": self._snap_seq, "snap": self._snap_state}, ensure_ascii=False)
+                self._http(writer, 200, "application/json; charset=utf-8", body.encode("utf-8"))
+            else:
+                self._http(writer, 404, "text/plain", b"not found")
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _http(writer, code: int, ctype: str, body: bytes):
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}.get(code, "")
+        writer.write(
+            f"HTTP/1.1 {code} {reason}\r\nContent-Type: {ctype}\r\nContent-Length: {len(body)}\r\n"
+            f"Cache-Control: no-store\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+
+    async def _websocket(self, reader, writer, headers: dict):
+        import base64
+        import hashlib
+        key = headers.get("sec-websocket-key")
+        if not key:
+            self._http(writer, 400, "text/plain", b"missing Sec-WebSocket-Key")
+            return
+        accept = base64.b64encode(hashlib.sha1((key + self._GUID).encode("latin-1")).digest()).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode("latin-1")
+        )
+        cl = _WsClient(writer)
+        self._clients.add(cl)
+        # client vào sau: nhận ngay trạng thái đầy đủ
+        writer.write(self._snapshot_frame())
+        try:
+            await self._read_loop(reader, cl)
+        finally:
+            self._clients.discard(cl)
+
+    async def _read_loop(self, reader, cl: _WsClient):
+        import asyncio
+        try:
+            while True:
+                b0, b1 = await reader.readexactly(2)
+                op = b0 & 0x0F
+                n = b1 & 0x7F
+                if n == 126:
+                    n = struct.unpack("!H", await reader.readexactly(2))[0]
+                elif n == 127:
+                    n = struct.unpack("!Q", await reader.readexactly(8))[0]
+                if n > self.MAX_CLIENT_FRAME:
+                    return
+                mask = await reader.readexactly(4) if b1 & 0x80 else b""
+                data = await reader.readexactly(n)
+                if mask:
+                    data = bytes(b ^ mask[i & 3] for i, b in enumerate(data))
+                if op == 0x8:
+                    cl.writer.write(_ws_frame(data[:2], 0x8))
+                    return
+                if op == 0x9:
+                    cl.writer.write(_ws_frame(data, 0xA))
+                # text/binary từ client: bỏ qua (kênh chỉ push 1 chiều)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+
+
+class ScoreboardFeed(QObject):
+    """
+    Lấy trạng thái hiển thị từ MatchController và đẩy delta sang ScoreboardServer.
+    Các signal trong cùng 1 vòng event loop được gom thành 1 delta (QTimer 0 ms).
+    """
+
+    def __init__(self, controller, server: ScoreboardServer, parent=None):
+        super().__init__(parent)
+        self.c = controller
+        self.server = server
+        self.seq = 0
+        self._last: dict = {}
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self.push)
+
+        controller.scoreboardChanged.connect(self._mark)
+        controller.timeTextChanged.connect(self._mark)
+        controller.teamColorChanged.connect(self._mark)
+        controller.stateChanged.connect(self._mark)
+        self.push()
+
+    def state(self) -> dict:
+        c = self.c
+        s1, s2 = c.get_display_scores()
+        return {
+            "t1": c.team1,
+            "t2": c.team2,
+            "s1": s1,
+            "s2": s2,
+            "c1": c.get_team_color(1),
+            "c2": c.get_team_color(2),
+            "time": c._fmt(c.seconds),
+            "run": int(bool(c.running)),
+            "pause": int(bool(c.paused)),
+        }
+
+    def _mark(self, *_args):
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def push(self):
+        st = self.state()
+        delta = {k: v for k, v in st.items() if self._last.get(k) != v}
+        if not delta:
+            return
+        self.seq += 1
+        self._last = st
+        self.server.publish(self.seq, st, delta)
+
+
+# ================== UDP state broadcast (display nodes) ==================
+UDP_GROUP = "239.255.42.99"
+UDP_PORT = 45454
+
+_UDP_MAGIC = b"TKB1"
+_UDP_RESYNC = b"TKR1"
+# magic, flags, session, seq, clock_ms, remaining_ms, seconds, s1, s2, color1, color2, names_ver
+_UDP_HEAD = struct.Struct("!4sBIIIiHhhIIH")
+
+_UF_RUNNING = 0x01
+_UF_PAUSED = 0x02
+_UF_HEARTBEAT = 0x04
+_UF_NAMES = 0x08
+
+
+def _utf8_clip(s: str, limit: int = 255) -> bytes:
+    b = s.encode("utf-8")[:limit]
+    # không cắt giữa 1 ký tự nhiều byte (tên tiếng Việt)
+    return b.decode("utf-8", "ignore").encode("utf-8")
+
+
+def encode_state_packet(session: int, seq: int, clock_ms: int, st: dict, flags: int = 0) -> bytes:
+    """
+    Gói trạng thái nhị phân (~38 byte + tên). Mỗi gói mang đủ điểm / thời gian / màu;
+    tên đội chỉ đính kèm khi đổi, trong heartbeat và khi trả lời resync (cờ _UF_NAMES).
+    """
+    if st["running"]:
+        flags |= _UF_RUNNING
+    if st["paused"]:
+        flags |= _UF_PAUSED
+    head = _UDP_HEAD.pack(
+        _UDP_MAGIC, flags, session & 0xFFFFFFFF, seq & 0xFFFFFFFF, clock_ms & 0xFFFFFFFF,
+        int(st["remaining_ms"]), int(st["seconds"]) & 0xFFFF,
+        max(-32768, min(32767, int(st["s1"]))), max(-32768, min(32767, int(st["s2"]))),
+        QColor(st["c1"]).rgb() & 0xFFFFFF, QColor(st["c2"]).rgb() & 0xFFFFFF,
+        int(st["names_ver"]) & 0xFFFF,
+    )
+    if not flags & _UF_NAMES:
+        return head
+    n1 = _utf8_clip(st["t1"])
+    n2 = _utf8_clip(st["t2"])
+    return head + bytes((len(n1),)) + n1 + bytes((len(n2),)) + n2
+
+
+def decode_state_packet(data: bytes) -> dict | None:
+    if len(data) < _UDP_HEAD.size or data[:4] != _UDP_MAGIC:
+        return None
+    (_m, flags, session, seq, clock_ms, remaining_ms, seconds,
+     s1, s2, c1, c2, names_ver) = _UDP_HEAD.unpack_from(data)
+    pkt = {
+        "flags": flags, "session": session, "seq": seq, "clock_ms": clock_ms,
+        "running": bool(flags & _UF_RUNNING), "paused": bool(flags & _UF_PAUSED),
+        "remaining_ms": remaining_ms, "seconds": seconds, "s1": s1, "s2": s2,
+        "c1": f"#{c1:06x}", "c2": f"#{c2:06x}", "names_ver": names_ver,
+    }
+    if flags & _UF_NAMES:
+        try:
+            i = _UDP_HEAD.size
+            n = data[i]
+            t1 = data[i + 1:i + 1 + n].decode("utf-8")
+            i += 1 + n
+            n = data[i]
+            t2 = data[i + 1:i + 1 + n].decode("utf-8")
+        except (IndexError, UnicodeDecodeError):
+            return None
+        pkt["t1"] = t1
+        pkt["t2"] = t2
+    return pkt
+
+
+class StateBroadcaster(QObject):
+    """
+    Phát trạng thái trận qua UDP multicast / broadcast, không giữ kết nối với từng máy.
+    Gửi ngay khi có thay đổi (gom trong 1 vòng event loop) + heartbeat HEARTBEAT_MS.
+    Máy nhận thiếu tên đội có thể gửi lại gói "TKR1" -> trả 1 gói đầy đủ (unicast).
+    """
+
+    HEARTBEAT_MS = 1000
+    RESYNC_MIN_INTERVAL_MS = 200
+
+    def __init__(self, controller, group: str = UDP_GROUP, port: int = UDP_PORT, ttl: int = 1, parent=None):
+        super().__init__(parent)
+        from PyQt6.QtNetwork import QUdpSocket, QHostAddress, QAbstractSocket
+
+        self.c = controller
+        self.group = QHostAddress(group)
+        self.port = int(port)
+        self.session = struct.unpack("!I", os.urandom(4))[0]
+        self.seq = 0
+        self.names_ver = 0
+        self._names = (controller.team1, controller.team2)
+        self._clock = QElapsedTimer()
+        self._clock.start()
+        self._resync_at: dict[tuple[str, int], int] = {}
+
+        self.sent = 0
+        self.heartbeats = 0
+        self.resyncs = 0
+
+        self.sock = QUdpSocket(self)
+        self.sock.bind(QHostAddress(QHostAddress.SpecialAddress.AnyIPv4), 0)
+        if self.group.isMulticast():
+            self.sock.setSocketOption(QAbstractSocket.SocketOption.MulticastTtlOption, int(ttl))
+            self.sock.setSocketOption(QAbstractSocket.SocketOption.MulticastLoopbackOption, 1)
+        self.sock.readyRead.connect(self._on_ready_read)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(lambda: self.send())
+
+        self._heartbeat = QTimer(self)
+        self._heartbeat.setInterval(self.HEARTBEAT_MS)
+        self._heartbeat.timeout.connect(self._on_heartbeat)
+        self._heartbeat.start()
+
+        controller.scoreboardChanged.connect(self._mark)
+        controller.timeTextChanged.connect(self._mark)
+        controller.teamColorChanged.connect(self._mark)
+        controller.stateChanged.connect(self._mark)
+        self.send(_UF_NAMES)
+
+    def state(self) -> dict:
+        c = self.c
+        names = (c.team1, c.team2)
+        if names != self._names:
+            self._names = names
+            self.names_ver = (self.names_ver + 1) & 0xFFFF
+        s1, s2 = c.get_display_scores()
+        return {
+            "t1": c.team1, "t2": c.team2, "s1": s1, "s2": s2,
+            "c1": c.get_team_color(1), "c2": c.get_team_color(2),
+            "seconds": c.seconds, "remaining_ms": c.remaining_now_ms(),
+            "running": c.running, "paused": c.paused,
+            "names_ver": self.names_ver,
+        }
+
+    def _mark(self, *_args):
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _packet(self, flags: int) -> bytes:
+        ver = self.names_ver
+        st = self.state()
+        if st["names_ver"] != ver:
+            flags |= _UF_NAMES
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        return encode_state_packet(self.session, self.seq, self._clock.elapsed(), st, flags)
+
+    def send(self, flags: int = 0):
+        self.sock.writeDatagram(self._packet(flags), self.group, self.port)
+        self.sent += 1
+
+    def _on_heartbeat(self):
+        self.heartbeats += 1
+        self.send(_UF_HEARTBEAT | _UF_NAMES)
+
+    def _on_ready_read(self):
+        now = self._clock.elapsed()
+        while self.sock.hasPendingDatagrams():
+            data, host, port = self.sock.readDatagram(max(64, self.sock.pendingDatagramSize()))
+            if not data or data[:4] != _UDP_RESYNC:
+                continue
+            key = (host.toString(), int(port))
+            if now - self._resync_at.get(key, -self.RESYNC_MIN_INTERVAL_MS) < self.RESYNC_MIN_INTERVAL_MS:
+                continue
+            self._resync_at[key] = now
+            # trả thẳng cho máy hỏi, seq vẫn tăng chung để các máy khác không thấy "gap" giả
+            self.sock.writeDatagram(self._packet(_UF_NAMES), host, port)
+            self.resyncs += 1
+
+    def stop(self):
+        self._heartbeat.stop()
+        self._timer.stop()
+        self.sock.close()
+
+
+class RemoteMatchView(QObject):
+    """
+    Bản chỉ-đọc của MatchController cho DisplayWindow ở máy nhận:
+    cùng các signal / accessor mà DisplayWindow dùng, dữ liệu lấy từ gói UDP.
+    """
+
+    scoreboardChanged = pyqtSignal(str, int, str, int)
+    timeTextChanged = pyqtSignal(str)
+    stateChanged = pyqtSignal(bool, bool)
+    teamColorChanged = pyqtSignal(int, str)
+
+    _fmt = staticmethod(MatchController._fmt)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.team1 = ""
+        self.team2 = ""
+        self.team_colors = {1: "#e74c3c", 2: "#1e73be"}
+        self.scores = (0, 0)
+        self.seconds = 0
+        self.remaining_ms = 0
+        self.running = False
+        self.paused = False
+
+    def get_display_scores(self) -> tuple[int, int]:
+        return self.scores
+
+    def get_team_color(self, team: int) -> str:
+        return str(self.team_colors.get(int(team), "#333333"))
+
+    def apply(self, pkt: dict):
+        if "t1" in pkt:
+            names = (pkt["t1"], pkt["t2"])
+        else:
+            names = (self.team1, self.team2)
+        scores = (pkt["s1"], pkt["s2"])
+        if names != (self.team1, self.team2) or scores != self.scores:
+            self.team1, self.team2 = names
+            self.scores = scores
+            self.scoreboardChanged.emit(self.team1, scores[0], self.team2, scores[1])
+        for team, key in ((1, "c1"), (2, "c2")):
+            if self.team_colors.get(team) != pkt[key]:
+                self.team_colors[team] = pkt[key]
+                self.teamColorChanged.emit(team, pkt[key])
+        self.remaining_ms = pkt["remaining_ms"]
+        if pkt["seconds"] != self.seconds:
+            self.seconds = pkt["seconds"]
+            self.timeTextChanged.emit(self._fmt(self.seconds))
+        if (pkt["running"], pkt["paused"]) != (self.running, self.paused):
+            self.running, self.paused = pkt["running"], pkt["paused"]
+            self.stateChanged.emit(self.running, self.paused)
+
+
+class StateReceiver(QObject):
+    """
+    Nhận gói từ StateBroadcaster và đẩy vào RemoteMatchView.
+    seq so theo kiểu serial 32-bit: gói cũ / trùng bị bỏ, nhảy cóc thì đếm "lost".
+    Điểm / giờ / màu có đủ trong mọi gói; chỉ tên đội có thể lỡ -> gửi "TKR1" xin gói đầy đủ.
+    Im lặng quá SILENCE_MS (mất heartbeat, máy phát khởi động lại) cũng xin resync.
+    """
+
+    SILENCE_MS = 3000
+    RESYNC_RETRY_MS = 500
+
+    def __init__(self, view: RemoteMatchView, group: str = UDP_GROUP, port: int = UDP_PORT, parent=None):
+        super().__init__(parent)
+        from PyQt6.QtNetwork import QUdpSocket, QHostAddress, QAbstractSocket
+
+        self.view = view
+        self.group = QHostAddress(group)
+        self.port = int(port)
+        self.session: int | None = None
+        self.seq: int | None = None
+        self.names_ver: int | None = None
+        self.clock_ms = 0
+        self._sender = None
+        self._clock = QElapsedTimer()
+        self._clock.start()
+        self._last_rx = 0
+        self._last_resync = -self.RESYNC_RETRY_MS
+
+        self.received = 0
+        self.lost = 0
+        self.stale = 0
+        self.bad = 0
+        self.resync_requests = 0
+        self.sessions = 0
+
+        self.sock = QUdpSocket(self)
+        mode = (QAbstractSocket.BindFlag.ShareAddress | QAbstractSocket.BindFlag.ReuseAddressHint)
+        if not self.sock.bind(QHostAddress(QHostAddress.SpecialAddress.AnyIPv4), self.port, mode):
+            raise OSError(f"udp receiver: bind {self.port}: {self.sock.errorString()}")
+        if self.group.isMulticast() and not self.sock.joinMulticastGroup(self.group):
+            raise OSError(f"udp receiver: join {group}: {self.sock.errorString()}")
+        self.sock.readyRead.connect(self._on_ready_read)
+
+        self._watchdog = QTimer(self)
+        self._watchdog.setInterval(self.SILENCE_MS // 2)
+        self._watchdog.timeout.connect(self._check_silence)
+        self._watchdog.start()
+
+    def _on_ready_read(self):
+        while self.sock.hasPendingDatagrams():
+            data, host, port = self.sock.readDatagram(max(64, self.sock.pendingDatagramSize()))
+            pkt = decode_state_packet(data) if data else None
+            if pkt is None:
+                self.bad += 1
+                continue
+            self._on_packet(pkt, host, port)
+
+    def _on_packet(self, pkt: dict, host, port: int):
+        self._last_rx = self._clock.elapsed()
+        if pkt["session"] != self.session:
+            # máy phát mới / khởi động lại: nhận luôn, bỏ mốc seq cũ
+            self.session = pkt["session"]
+            self.seq = None
+            self.names_ver = None
+            self.sessions += 1
+        if self.seq is not None:
+            diff = (pkt["seq"] - self.seq) & 0xFFFFFFFF
+            if diff == 0 or diff >= 0x80000000:
+                self.stale += 1
+                return
+            self.lost += diff - 1
+        self.seq = pkt["seq"]
+        self.clock_ms = pkt["clock_ms"]
+        self._sender = (host, int(port))
+
+        if "t1" in pkt:
+            self.names_ver = pkt["names_ver"]
+        elif pkt["names_ver"] != self.names_ver:
+            # lỡ gói đổi tên: vẫn cập nhật điểm / giờ, tên giữ cũ đến khi resync
+            self.request_resync()
+        self.received += 1
+        self.view.apply(pkt)
+
+    def request_resync(self):
+        now = self._clock.elapsed()
+        if self._sender is None or now - self._last_resync < self.RESYNC_RETRY_MS:
+            return
+        self._last_resync = now
+        host, port = self._sender
+        self.sock.writeDatagram(_UDP_RESYNC, host, port)
+        self.resync_requests += 1
+
+    def _check_silence(self):
+        if self._sender is not None and self._clock.elapsed() - self._last_rx > self.SILENCE_MS:
+            self.request_resync()
+
+    def stats(self) -> dict:
+        return {
+            "session": self.session, "seq": self.seq, "clock_ms": self.clock_ms,
+            "received": self.received, "lost": self.lost, "stale": self.stale, "bad": self.bad,
+            "resync_requests": self.resync_requests, "sessions": self.sessions,
+        }
+
+    def stop(self):
+        self._watchdog.stop()
+        self.sock.close()
+
+
+# ================== Startup profiling ==================
+class StartupProfiler(QObject):
+    """Ghi các mốc khởi động (ms kể từ lúc bắt đầu import Qt) + lần paint đầu tiên."""
+
+    def __init__(self):
+        super().__init__()
+        self.t0 = _T_IMPORT_START
+        self.marks: list[tuple[str, float]] = [("import qt", _T_IMPORT_END)]
+        self._watch: dict[QObject, str] = {}
+
+    def mark(self, label: str):
+        self.marks.append((label, time.perf_counter()))
+
+    def watch_first_paint(self, widget: QWidget, label: str = "first paint"):
+        self._watch[widget] = label
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint and obj in self._watch:
+            self.mark(self._watch.pop(obj))
+            obj.removeEventFilter(self)
+        return False
+
+    def report(self, extra: dict | None = None) -> dict:
+        out = {"marks_ms": {}, "steps_ms": {}}
+        prev = self.t0
+        for label, t in self.marks:
+            out["marks_ms"][label] = round((t - self.t0) * 1000.0, 2)
+            out["steps_ms"][label] = round((t - prev) * 1000.0, 2)
+            prev = t
+        if extra:
+            out.update(extra)
+        return out
+
+    def dump(self, extra: dict | None = None) -> str:
+        text = json.dumps(self.report(extra), indent=2, ensure_ascii=False)
+        print(text, file=sys.stderr)
+        try:
+            (_exe_dir() / "startup_profile.json").write_text(text, encoding="utf-8")
+        except OSError:
+            pass
+        return text
+
+
+def _parse_cli(argv: list[str]):
+    import argparse
+
+    ap = argparse.ArgumentParser(add_help=True)
+    ap.add_argument("--timing", action="store_true", help="bật đo độ trễ timer/cue ngay từ đầu")
+    ap.add_argument("--profile-startup", action="store_true",
+                    help="in thời gian import / dựng cửa sổ / paint đầu tiên (stderr + startup_profile.json)")
+    ap.add_argument("--no-journal", action="store_true", help="không ghi journal trận đấu")
+    ap.add_argument("--no-restore", action="store_true", help="không khôi phục snapshot trận trước")
+    ap.add_argument("--replay", metavar="FILE", help="mở journal .tkj để xem lại")
+    ap.add_argument("--at", type=float, default=None, metavar="SEC",
+                    help="với --replay: thời điểm (giây kể từ đầu journal), mặc định = cuối")
+    ap.add_argument("--display-renderer", choices=DisplayWindow.RENDERERS, default="widgets",
+                    help="cách vẽ màn hình Display (Ctrl+Shift+R trên Display để đổi khi đang chạy)")
+    ap.add_argument("--web", type=int, default=None, metavar="PORT",
+                    help="bật web scoreboard (HTTP + WebSocket) cho điện thoại / máy khác trong LAN")
+    ap.add_argument("--web-host", default="0.0.0.0", metavar="HOST")
+    ap.add_argument("--rules", metavar="FILE", default=None,
+                    help="luật chấm điểm (JSON: loại kho báu, điểm, quota, điều kiện tuyệt đối); mặc định luật 2025")
+    ap.add_argument("--rules-report", action="store_true",
+                    help="in số trạng thái hợp lệ, điểm tối đa, các trạng thái tuyệt đối của luật rồi thoát")
+    ap.add_argument("--auto-absolute", action="store_true",
+                    help="tự xử thắng tuyệt đối + chốt giờ ngay khi 1 đội đủ điều kiện (bật/tắt được trên control)")
+    ap.add_argument("--arenas", type=int, default=1, metavar="N",
+                    help="chạy N sân song song trong 1 cửa sổ (mỗi sân 1 tab control + display riêng)")
+    ap.add_argument("--udp", type=int, default=None, metavar="PORT", nargs="?", const=UDP_PORT,
+                    help="phát trạng thái trận qua UDP multicast cho các máy Display trong LAN")
+    ap.add_argument("--udp-receive", type=int, default=None, metavar="PORT", nargs="?", const=UDP_PORT,
+                    help="chạy làm máy Display: chỉ hiện màn hình, nhận trạng thái qua UDP")
+    ap.add_argument("--udp-group", default=UDP_GROUP, metavar="ADDR",
+                    help="địa chỉ multicast (hoặc broadcast, vd 255.255.255.255)")
+    ap.add_argument("--write-asset-manifest", metavar="DIR", default=None,
+                    help="ghi manifest.json cho thư mục assets (trước khi build PyInstaller) rồi thoát")
+    args, _qt_args = ap.parse_known_args(argv[1:])
+    return args
+
+
+def _load_rules(path: str | None) -> Ruleset:
+    if not path:
+        return Ruleset.default()
+    try:
+        return Ruleset.load(path)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(2)
 
 
 if __name__ == "__main__":
+    args = _parse_cli(sys.argv)
+    if args.write_asset_manifest:
+        print(AssetIndex.write_manifest(args.write_asset_manifest))
+        sys.exit(0)
+    if args.rules_report:
+        table = _load_rules(args.rules).table()
+        if table is None:
+            print("rules report needs numpy (and a ruleset with <= "
+                  f"{StateTable.MAX_STATES} legal states per team)", file=sys.stderr)
+            sys.exit(2)
+        print(json.dumps(table.summary(), ensure_ascii=False, indent=2))
+        sys.exit(0)
+    prof = StartupProfiler() if args.profile_startup else None
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
+    if prof:
+        prof.mark("QApplication")
 
     pal = QPalette()
     pal.setColor(QPalette.ColorRole.Window, QColor("#f3f6fb"))
@@ -1391,11 +5593,126 @@ if __name__ == "__main__":
     icon_path = find_asset_first("timer.ico")
     if icon_path:
         app.setWindowIcon(QIcon(icon_path))
+    if prof:
+        prof.mark("palette + icon")
 
-    c = MatchController()
-    c.set_time_seconds(3 * 60 + 30)
-
-    win = ControlWindow(c)
-    win.show()
-
-    sys.exit(app.exec())
+    if args.udp_receive is not None:
+        # máy Display: không control panel / journal / snapshot / âm thanh
+        view = RemoteMatchView()
+        try:
+            rx = StateReceiver(view, args.udp_group, args.udp_receive)
+        except OSError as e:
+            print(e, file=sys.stderr)
+            sys.exit(2)
+        disp = DisplayWindow(view, renderer=args.display_renderer)
+        disp.showFullScreen()
+        code = app.exec()
+        rx.stop()
+        sys.exit(code)
+
+    rules = _load_rules(args.rules)
+
+    # --arenas N: N trận độc lập trong 1 process (xem ArenaWindow); replay luôn 1 trận
+    n_arenas = 1 if args.replay else max(1, int(args.arenas))
+    controllers: list[MatchController] = []
+    stores: list[SnapshotStore] = []
+    for arena in (range(1, n_arenas + 1) if n_arenas > 1 else (None,)):
+        c = MatchController(rules=rules)
+        c.set_time_seconds(3 * 60 + 30)
+        if args.timing:
+            c.enable_timing_probe()
+        c.set_auto_absolute(args.auto_absolute)
+
+        if args.replay:
+            # xem lại: dựng trạng thái tại thời điểm --at, không ghi journal mới
+            reader = JournalReader(args.replay)
+            at_ms = None if args.at is None else int(args.at * 1000)
+            reader.replay_into(c, at_ms)
+        else:
+            # khôi phục trận đang dở (máy khởi động lại) trước khi vẽ cửa sổ đầu tiên
+            if not args.no_restore:
+                snap = SnapshotStore.load(SnapshotStore.default_path(arena))
+                if snap is not None:
+                    SnapshotStore.restore(c, snap)
+            snapshots = SnapshotStore(c, SnapshotStore.default_path(arena))
+            snapshots.start()
+            stores.append(snapshots)
+
+        if not args.replay and not args.no_journal:
+            try:
+                c.attach_journal(MatchJournal(MatchJournal.default_path(arena)))
+            except OSError:
+                try:
+                    c.attach_journal(MatchJournal(Path.cwd() / "journal" / MatchJournal.default_path(arena).name))
+                except OSError:
+                    pass
+        controllers.append(c)
+    # web / UDP: phát trận đầu tiên (sân 1)
+    c = controllers[0]
+    if prof:
+        prof.mark("controller + restore + journal")
+
+    web: ScoreboardServer | None = None
+    if args.web is not None:
+        web = ScoreboardServer(args.web_host, args.web)
+        try:
+            web.start()
+        except OSError as e:
+            print(e, file=sys.stderr)
+            web = None
+        else:
+            feed = ScoreboardFeed(c, web)
+            print(f"[web] scoreboard: {web.url()}", file=sys.stderr)
+
+    udp: StateBroadcaster | None = None
+    if args.udp is not None:
+        udp = StateBroadcaster(c, args.udp_group, args.udp)
+
+    arenas: ArenaWindow | None = None
+    if n_arenas > 1:
+        arenas = ArenaWindow(controllers, renderer=args.display_renderer)
+        arenas.show()
+        win = arenas.control(0)
+        if prof:
+            prof.mark("arena window")
+    else:
+        # hiện khung CONTROL PANEL trước, team panel dựng dần sau đó
+        win = ControlWindow(c, deferred=True)
+        win.display_renderer = args.display_renderer
+        if prof:
+            prof.mark("control window (shell)")
+            prof.watch_first_paint(win)
+        win.show()
+        if prof:
+            prof.mark("show")
+
+    def _after_build():
+        if prof:
+            prof.mark("team panels built")
+        # QtMultimedia chỉ được import ở đây, sau khi UI đã lên
+        if arenas is not None:
+            arenas.load_sounds()
+        else:
+            c.load_sounds()
+        if prof:
+            prof.mark("sounds loaded")
+            QTimer.singleShot(0, lambda: prof.dump({
+                "build_steps_ms": {k: round(v, 2) for k, v in win.build_times},
+                "qtmultimedia_loaded": "PyQt6.QtMultimedia" in sys.modules,
+            }))
+
+    win.buildFinished.connect(_after_build)
+
+    code = app.exec()
+    if web is not None:
+        web.stop()
+    if udp is not None:
+        udp.stop()
+    if c.audio is not None:
+        c.audio.shutdown()
+    for snapshots in stores:
+        snapshots.close()
+    for c in controllers:
+        if c.journal is not None:
+            c.journal.close()
+    sys.exit(code)